@@ -1,12 +1,23 @@
 # File: app/main.py
+import os
+import time
+import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
 # Import router API
 from app.routes.chat import router as chat_router
+from app.services import llm_providers, warmup
+from app.services.metrics import render_metrics, HTTP_REQUEST_SECONDS
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("app")
 
 # Inisialisasi aplikasi FastAPI
 app = FastAPI(
@@ -25,12 +36,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Middleware logging (opsional, untuk debug)
+# Middleware logging + histogram durasi request (label route memakai template path, bukan URL mentah)
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f"📥 Request: {request.method} {request.url}")
+    start = time.perf_counter()
     response = await call_next(request)
-    print(f"📤 Response status: {response.status_code}")
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        elapsed, method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    logger.debug("%s %s -> %s (%.1f ms)", request.method, request.url.path, response.status_code, elapsed * 1000)
     return response
 
 # Static files & templates
@@ -40,6 +56,36 @@ templates = Jinja2Templates(directory="app/templates")
 # API router
 app.include_router(chat_router)
 
+# Model embedding, vector store, dan klien LLM dimuat lewat warmup (default di latar belakang),
+# sehingga worker baru langsung bisa menjawab "/" sementara /ready menunggu warmup selesai
+@app.on_event("startup")
+async def start_warmup():
+    if warmup.WARMUP_MODE == "blocking":
+        await warmup.warmup()
+    elif warmup.WARMUP_MODE != "off":
+        warmup.start_background_warmup()
+
+# Tutup connection pool klien LLM agar koneksi keep-alive dilepas dengan rapi
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await llm_providers.aclose_clients()
+
+# Metrik format Prometheus (latensi per tahap, token, cache, status penyedia LLM)
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Status"])
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Readiness: 200 setelah warmup selesai (untuk health check load balancer / autoscaler)
+@app.get("/ready", tags=["Status"])
+def get_readiness():
+    return JSONResponse(warmup.state.to_dict(), status_code=200 if warmup.is_ready() else 503)
+
+# Jalankan warmup secara eksplisit (mis. WARMUP_MODE=off); menunggu sampai selesai
+@app.post("/warmup", tags=["Status"])
+async def run_warmup():
+    result = await warmup.warmup()
+    return JSONResponse(result, status_code=200 if warmup.is_ready() else 503)
+
 # Webview UI
 @app.get("/web", response_class=HTMLResponse, tags=["Webview UI"])
 async def get_webview_ui(request: Request):
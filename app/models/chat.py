@@ -1,7 +1,7 @@
 # File: app/models/chat.py
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from enum import Enum
 from datetime import datetime
 
@@ -37,3 +37,13 @@ class SyncStatus(BaseModel):
     """Model untuk status hasil sinkronisasi."""
     status: str
     message: str
+
+
+class SyncJobStatus(SyncStatus):
+    """Model untuk status job sinkronisasi yang berjalan di latar belakang."""
+    job_id: str
+    progress: Dict[str, Union[int, Dict[str, float]]] = Field(
+        default_factory=dict, description="Halaman di-crawl, chunk di-embed, statistik ukuran chunk, dll."
+    )
+    elapsed_seconds: float = 0.0
+    coalesced: bool = Field(False, description="True jika trigger digabung ke job yang sudah ada.")
@@ -1,9 +1,13 @@
 # File: app/routes/chat.py
 # Deskripsi: Endpoint API untuk chatbot, mendukung multi-user dan multi-turn
 
-from fastapi import APIRouter, HTTPException
-from ..models.chat import ChatRequest, Answer, SyncStatus, ChatMessage, Role
-from ..services import llm_generator, notion_sync
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from ..models.chat import ChatRequest, Answer, SyncJobStatus, ChatMessage, Role
+from ..services import admission, llm_generator, sync_jobs
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,40 +17,105 @@ router = APIRouter(
     tags=["Chatbot API"]
 )
 
+async def _session_history(session_id: str):
+    """Ambil session history dan konversi ke ChatMessage Pydantic (store dibaca di thread, bukan di event loop)."""
+    messages = await asyncio.to_thread(llm_generator.get_session_messages, session_id)
+    session_history_chatmessage = []
+    for msg in messages:
+        if isinstance(msg, llm_generator.HumanMessage):
+            session_history_chatmessage.append(ChatMessage(role=Role.user, content=msg.content))
+        elif isinstance(msg, llm_generator.AIMessage):
+            session_history_chatmessage.append(ChatMessage(role=Role.assistant, content=msg.content))
+    return session_history_chatmessage
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _admit(http_request: Request, request: ChatRequest) -> admission.Admission:
+    """Admission control: 429 jika session/IP melebihi laju, 503 jika antrean penuh atau terlalu lama."""
+    try:
+        return await admission.admit(
+            http_request, request.session_id, request.question, image_url=request.image_url
+        )
+    except admission.Rejected as e:
+        logger.warning(f"Request ditolak admission control ({e.reason}), Retry-After {e.retry_after}s")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+
 @router.post("/ask", response_model=Answer)
-async def ask_question(request: ChatRequest):
+async def ask_question(request: ChatRequest, http_request: Request):
     """
     Endpoint untuk menerima pertanyaan dari user.
     - Mendukung multi-user dengan session_id
     - Mendukung multi-turn dengan history
+    - Dibatasi admission control (429/503 + Retry-After saat overload)
     """
     if not request.question:
         raise HTTPException(status_code=400, detail="Teks pertanyaan tidak boleh kosong.")
 
+    admitted = await _admit(http_request, request)
+    answered = False
     try:
         # Generate jawaban
-        answer_text = llm_generator.generate_answer(
+        answer_text = await llm_generator.generate_answer_async(
             question=request.question,
             session_id=request.session_id,
             history=request.history or [],
             image_url=request.image_url
         )
 
-        # Ambil session history dan konversi ke ChatMessage Pydantic
-        session_data = llm_generator.SESSION_HISTORIES.get(request.session_id, {})
-        messages = session_data.get("messages", [])
-        session_history_chatmessage = []
-        for msg in messages:
-            if isinstance(msg, llm_generator.HumanMessage):
-                session_history_chatmessage.append(ChatMessage(role=Role.user, content=msg.content))
-            elif isinstance(msg, llm_generator.AIMessage):
-                session_history_chatmessage.append(ChatMessage(role=Role.assistant, content=msg.content))
-
-        return Answer(text=answer_text, history=session_history_chatmessage)
+        answered = True
+        return Answer(text=answer_text, history=await _session_history(request.session_id))
 
     except Exception as e:
         logger.error(f"Error saat memproses pertanyaan: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Terjadi kesalahan internal pada server.")
+    finally:
+        admitted.release(answered=answered)
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: ChatRequest, http_request: Request):
+    """
+    Sama seperti /ask, tetapi jawaban dikirim sebagai Server-Sent Events:
+    - event `token`: potongan jawaban, dikirim segera saat LLM memproduksinya
+    - event `done`: jawaban lengkap + session history
+    - event `error`: jika terjadi kesalahan di tengah stream
+    Admission control dicek sebelum stream dibuka, jadi penolakan tetap berupa 429/503 biasa.
+    """
+    if not request.question:
+        raise HTTPException(status_code=400, detail="Teks pertanyaan tidak boleh kosong.")
+
+    admitted = await _admit(http_request, request)
+
+    async def event_stream():
+        parts = []
+        answered = False
+        try:
+            async for token in llm_generator.stream_answer(
+                question=request.question,
+                session_id=request.session_id,
+                history=request.history or [],
+                image_url=request.image_url
+            ):
+                parts.append(token)
+                yield _sse_event("token", {"text": token})
+
+            history = [msg.model_dump(mode="json") for msg in await _session_history(request.session_id)]
+            answered = True
+            yield _sse_event("done", {"text": "".join(parts), "history": history})
+        except Exception as e:
+            logger.error(f"Error saat streaming jawaban: {e}", exc_info=True)
+            yield _sse_event("error", {"detail": "Terjadi kesalahan internal pada server."})
+        finally:
+            # Slot dilepas saat stream selesai atau klien memutus koneksi
+            admitted.release(answered=answered)
+
+    # Cadangan: jika generator tidak pernah dijalankan (koneksi putus sebelum body dikirim)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(admitted.release),
+    )
 
 # Endpoint reset session (tombol bersihkan chat)
 @router.post("/reset-session/{session_id}")
@@ -55,19 +124,43 @@ async def reset_session(session_id: str):
     Endpoint untuk menghapus riwayat session tertentu.
     Bisa dipanggil dari tombol 'Bersihkan Chat' atau otomatis saat idle.
     """
-    llm_generator.reset_session(session_id)
+    await asyncio.to_thread(llm_generator.reset_session, session_id)
     return {"status": "success", "message": f"Session {session_id} berhasil dihapus."}
 
-@router.post("/sync-notion", response_model=SyncStatus)
-async def sync_data():
+@router.post("/sync-notion", response_model=SyncJobStatus, status_code=202)
+async def sync_data(full: bool = False):
     """
-    Memicu proses sinkronisasi data dari Notion ke vector store.
+    Memicu proses sinkronisasi data dari Notion ke vector store di latar belakang.
+    Langsung mengembalikan job_id; pantau lewat /sync-notion/{job_id} atau /sync-notion/{job_id}/events.
+    Jika sync sedang berjalan, trigger digabung ke satu job antrean berikutnya.
     """
-    try:
-        result = notion_sync.sync_notion_to_vector_store()
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
-        return SyncStatus(status=result["status"], message=result["message"])
-    except Exception as e:
-        logger.error(f"Error saat sinkronisasi Notion: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Gagal melakukan sinkronisasi data.")
+    job, coalesced = sync_jobs.start_sync(full=full)
+    return SyncJobStatus(**job.to_dict(), coalesced=coalesced)
+
+@router.get("/sync-notion/{job_id}", response_model=SyncJobStatus)
+async def sync_status(job_id: str):
+    """Status dan progres job sinkronisasi."""
+    job = sync_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job sinkronisasi tidak ditemukan.")
+    return SyncJobStatus(**job.to_dict())
+
+@router.get("/sync-notion/{job_id}/events")
+async def sync_events(job_id: str):
+    """Stream progres job sinkronisasi sebagai Server-Sent Events sampai job selesai."""
+    job = sync_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job sinkronisasi tidak ditemukan.")
+
+    async def event_stream():
+        while True:
+            yield _sse_event("done" if job.done else "progress", job.to_dict())
+            if job.done:
+                return
+            await asyncio.sleep(1)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
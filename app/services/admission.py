@@ -0,0 +1,355 @@
+# File: app/services/admission.py
+# Deskripsi: Admission control & backpressure untuk endpoint jawaban (/api/ask, /api/ask/stream):
+#            - token bucket per session dan per IP (429 + Retry-After jika habis)
+#            - batas konkurensi per tahap (ADMISSION_MAX_CONCURRENCY_<TAHAP>) dengan antrean
+#              berprioritas: "answer" (pintu masuk, antrean dibatasi & bisa menolak) serta tahap dalam
+#              pipeline "retrieval" (embedding/FAISS/BM25) dan "llm" (panggilan LLM) yang hanya
+#              mengantre menurut prioritas request (stage_slot), tanpa menolak request yang sudah diterima
+#            - prioritas: pertanyaan yang baru saja dijawab / sedang dijawab (hampir pasti kena cache
+#              jawaban atau single-flight) > pertanyaan pendek > sisanya (pertanyaan panjang, gambar)
+#            - jika perkiraan waktu tunggu antrean melebihi ADMISSION_QUEUE_SLO_SECONDS, request langsung
+#              ditolak 503 + Retry-After, jadi request yang diterima tetap punya latensi yang bisa ditebak;
+#              token laju session/IP dikembalikan untuk request yang ditolak
+#            Status berlaku per proses/worker (sama seperti semaphore penyedia LLM di concurrency.py).
+
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from .concurrency import CPU_EXECUTOR_WORKERS
+from .metrics import Counter, Gauge, Histogram, register_collector
+from .rate_limit import AsyncTokenBucket
+from .singleflight import normalize_question
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Batas default pipeline jawaban yang berjalan bersamaan per worker; override per tahap,
+# mis. ADMISSION_MAX_CONCURRENCY_ANSWER=16, ADMISSION_MAX_CONCURRENCY_RETRIEVAL=4, ADMISSION_MAX_CONCURRENCY_LLM=8
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+# Default tahap dalam: retrieval sebanyak thread executor CPU (antrean prioritas menggantikan FIFO executor)
+STAGE_DEFAULT_CONCURRENCY = {"retrieval": CPU_EXECUTOR_WORKERS}
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_SLO_SECONDS = float(os.getenv("ADMISSION_QUEUE_SLO_SECONDS", "5"))
+ADMISSION_DEFAULT_SERVICE_SECONDS = float(os.getenv("ADMISSION_DEFAULT_SERVICE_SECONDS", "3"))  # sebelum ada sampel
+ADMISSION_EWMA_ALPHA = float(os.getenv("ADMISSION_EWMA_ALPHA", "0.2"))
+ADMISSION_SHORT_QUESTION_WORDS = int(os.getenv("ADMISSION_SHORT_QUESTION_WORDS", "8"))
+ADMISSION_RECENT_QUESTIONS = int(os.getenv("ADMISSION_RECENT_QUESTIONS", "1000"))
+
+# Token bucket: laju (pertanyaan/detik) dan kapasitas burst; laju 0 = tanpa batas
+SESSION_RATE_LIMIT = float(os.getenv("SESSION_RATE_LIMIT", "0.5"))
+SESSION_RATE_BURST = float(os.getenv("SESSION_RATE_BURST", "5"))
+IP_RATE_LIMIT = float(os.getenv("IP_RATE_LIMIT", "5"))
+IP_RATE_BURST = float(os.getenv("IP_RATE_BURST", "30"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Di belakang reverse proxy/router (mis. Heroku), IP klien diambil dari entri terakhir X-Forwarded-For
+ADMISSION_TRUST_FORWARDED_FOR = os.getenv("ADMISSION_TRUST_FORWARDED_FOR", "0") == "1"
+
+PRIORITY_LIKELY_CACHED, PRIORITY_SHORT, PRIORITY_NORMAL = 0, 1, 2
+PRIORITY_NAMES = {PRIORITY_LIKELY_CACHED: "likely_cached", PRIORITY_SHORT: "short", PRIORITY_NORMAL: "normal"}
+
+ADMISSION_REQUESTS = Counter(
+    "chatbot_admission_requests_total", "Keputusan admission control per tahap.", ("stage", "result")
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "chatbot_admission_queue_seconds", "Waktu tunggu di antrean admission sebelum diproses.", ("stage", "priority")
+)
+ADMISSION_ACTIVE = Gauge("chatbot_admission_active", "Request yang sedang diproses per tahap.", ("stage",))
+ADMISSION_QUEUED = Gauge("chatbot_admission_queued", "Request yang menunggu di antrean per tahap.", ("stage",))
+
+
+class Rejected(Exception):
+    """Request ditolak admission control; status_code 429 (laju) atau 503 (beban), retry_after dalam detik."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+# ---------------- Token bucket per kunci ----------------
+class KeyedRateLimiter:
+    """Token bucket per kunci (session/IP), LRU dibatasi RATE_LIMIT_MAX_KEYS agar memori tidak tumbuh."""
+
+    def __init__(self, rate: float, capacity: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, AsyncTokenBucket]" = OrderedDict()
+
+    def try_acquire(self, key: Optional[str]) -> float:
+        """0 jika diizinkan (satu token diambil), selain itu detik sampai kunci ini boleh mengirim lagi."""
+        if self.rate <= 0 or not key:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = AsyncTokenBucket(self.rate, self.capacity)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.try_acquire()
+
+    def refund(self, key: Optional[str]):
+        bucket = self._buckets.get(key) if key else None
+        if bucket is not None:
+            bucket.refund()
+
+
+session_limiter = KeyedRateLimiter(SESSION_RATE_LIMIT, SESSION_RATE_BURST)
+ip_limiter = KeyedRateLimiter(IP_RATE_LIMIT, IP_RATE_BURST)
+
+
+# ---------------- Antrean berprioritas per tahap ----------------
+class Ticket:
+    """Izin memproses satu request; release() idempoten dan mencatat durasi layanan."""
+
+    def __init__(self, limiter: "StageLimiter"):
+        self._limiter = limiter
+        self._started = time.monotonic()
+        self._released = False
+        limiter._tickets.add(self)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._tickets.discard(self)
+            self._limiter._release(time.monotonic() - self._started)
+
+
+class StageLimiter:
+    """
+    Maksimal max_concurrency request aktif; sisanya menunggu di heap (prioritas, urutan datang).
+    Perkiraan waktu tunggu: sisa kerja tiap slot aktif (EWMA durasi layanan - waktu berjalan), lalu
+    request di depan mengisi slot yang paling cepat kosong masing-masing selama satu EWMA.
+    """
+
+    def __init__(self, stage: str, max_concurrency: int, max_queue: int, queue_slo: float):
+        self.stage = stage
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_slo = queue_slo
+        self.active = 0
+        self.service_seconds = ADMISSION_DEFAULT_SERVICE_SECONDS
+        self._waiters = []  # heap (prioritas, urutan, future)
+        self._sequence = itertools.count()
+        self._tickets = set()  # slot aktif yang sudah dipegang (untuk sisa waktu layanan)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def estimated_wait(self, priority: int) -> float:
+        if self.active < self.max_concurrency and not self.queued:
+            return 0.0
+        ahead = sum(1 for p, _, future in self._waiters if p <= priority and not future.done())
+        now = time.monotonic()
+        # Kapan tiap slot kosong. Slot yang sudah melewati EWMA (penyedia lambat) dianggap segera kosong;
+        # batas tunggu sebenarnya tetap queue_slo (queue_timeout). Slot yang baru diserahkan ke penunggu
+        # tetapi belum punya tiket dihitung penuh.
+        free_at = [max(0.0, self.service_seconds - (now - ticket._started)) for ticket in self._tickets]
+        free_at += [self.service_seconds] * max(0, self.active - len(free_at))
+        free_at += [0.0] * max(0, self.max_concurrency - len(free_at))
+        heapq.heapify(free_at)
+        for _ in range(ahead):
+            heapq.heapreplace(free_at, free_at[0] + self.service_seconds)
+        return free_at[0]
+
+    def _reject(self, reason: str, retry_after: float) -> Rejected:
+        ADMISSION_REQUESTS.inc(stage=self.stage, result=reason)
+        return Rejected(503, reason, retry_after, "Server sedang sibuk, silakan coba beberapa saat lagi.")
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL, reject: bool = True) -> Ticket:
+        """
+        Tunggu giliran (maksimal queue_slo detik) atau langsung tolak jika antrean penuh/terlalu lama.
+        reject=False (tahap dalam pipeline): selalu menunggu giliran, tanpa batas antrean dan timeout.
+        """
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            ADMISSION_REQUESTS.inc(stage=self.stage, result="admitted")
+            ADMISSION_QUEUE_SECONDS.observe(0.0, stage=self.stage, priority=PRIORITY_NAMES[priority])
+            return Ticket(self)
+
+        if reject:
+            wait = self.estimated_wait(priority)
+            if self.queued >= self.max_queue:
+                raise self._reject("queue_full", wait)
+            if wait > self.queue_slo:
+                raise self._reject("over_slo", wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_slo if reject else None)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Slot diberikan tepat saat timeout -> tetap dipakai
+                pass
+            else:
+                future.cancel()
+                raise self._reject("queue_timeout", self.service_seconds)
+        except asyncio.CancelledError:
+            # Klien pergi saat menunggu; jika slot sudah telanjur diberikan, kembalikan
+            if future.done() and not future.cancelled():
+                self._release(None)
+            else:
+                future.cancel()
+            raise
+        ADMISSION_REQUESTS.inc(stage=self.stage, result="admitted_after_wait")
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - started, stage=self.stage, priority=PRIORITY_NAMES[priority])
+        return Ticket(self)
+
+    def _release(self, service_seconds: Optional[float]):
+        if service_seconds is not None:
+            self.service_seconds += ADMISSION_EWMA_ALPHA * (service_seconds - self.service_seconds)
+        # Serahkan slot langsung ke penunggu berikutnya (yang belum batal)
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.active -= 1
+
+
+def stage_concurrency(stage: str) -> int:
+    """Batas konkurensi untuk tahap tertentu (env ADMISSION_MAX_CONCURRENCY_<TAHAP>)."""
+    value = os.getenv(f"ADMISSION_MAX_CONCURRENCY_{stage.upper()}")
+    return int(value) if value else STAGE_DEFAULT_CONCURRENCY.get(stage, ADMISSION_MAX_CONCURRENCY)
+
+
+_stages: Dict[str, StageLimiter] = {}
+
+
+def stage_limiter(stage: str) -> StageLimiter:
+    if stage not in _stages:
+        _stages[stage] = StageLimiter(stage, stage_concurrency(stage), ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_SLO_SECONDS)
+    return _stages[stage]
+
+
+# Prioritas request yang sedang diproses; ikut terbawa ke task pipeline (single-flight, HyDE spekulatif)
+_request_priority: contextvars.ContextVar[int] = contextvars.ContextVar("admission_priority", default=PRIORITY_NORMAL)
+
+
+@asynccontextmanager
+async def stage_slot(stage: str):
+    """Slot di tahap dalam pipeline ("retrieval", "llm"); antre menurut prioritas request, tidak pernah menolak."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    ticket = await stage_limiter(stage).acquire(_request_priority.get(), reject=False)
+    try:
+        yield
+    finally:
+        ticket.release()
+
+
+# ---------------- Prioritas ----------------
+_recent_questions: "OrderedDict[str, None]" = OrderedDict()
+_inflight_questions: Dict[str, int] = {}
+
+
+def _remember_question(normalized: str):
+    _recent_questions[normalized] = None
+    _recent_questions.move_to_end(normalized)
+    if len(_recent_questions) > ADMISSION_RECENT_QUESTIONS:
+        _recent_questions.popitem(last=False)
+
+
+def request_priority(question: str, image_url: Optional[str] = None) -> int:
+    """Prioritas antrean: makin kecil makin didahulukan."""
+    if image_url:
+        return PRIORITY_NORMAL
+    normalized = normalize_question(question)
+    if normalized in _recent_questions or normalized in _inflight_questions:
+        return PRIORITY_LIKELY_CACHED
+    if len(normalized.split()) <= ADMISSION_SHORT_QUESTION_WORDS:
+        return PRIORITY_SHORT
+    return PRIORITY_NORMAL
+
+
+def client_ip(request) -> Optional[str]:
+    if ADMISSION_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else None
+
+
+class Admission:
+    """Hasil admit(): pegang sampai jawaban selesai (termasuk stream), lalu panggil release()."""
+
+    def __init__(self, ticket: Optional[Ticket], normalized: Optional[str]):
+        self._ticket = ticket
+        self._normalized = normalized
+        self._released = False
+
+    def release(self, answered: bool = False):
+        if self._released:
+            return
+        self._released = True
+        if self._ticket is not None:
+            self._ticket.release()
+        if self._normalized is not None:
+            remaining = _inflight_questions.get(self._normalized, 1) - 1
+            if remaining > 0:
+                _inflight_questions[self._normalized] = remaining
+            else:
+                _inflight_questions.pop(self._normalized, None)
+            if answered:
+                _remember_question(self._normalized)
+
+
+async def admit(request, session_id: str, question: str, image_url: Optional[str] = None,
+                stage: str = "answer") -> Admission:
+    """Cek laju per session & IP, lalu antre di tahap `stage`. Melempar Rejected jika ditolak."""
+    if not ADMISSION_ENABLED:
+        return Admission(None, None)
+
+    taken = []  # token laju yang sudah diambil; dikembalikan jika request akhirnya ditolak
+    try:
+        for limiter, key, reason in (
+            (session_limiter, session_id, "rate_limited_session"),
+            (ip_limiter, client_ip(request), "rate_limited_ip"),
+        ):
+            retry_after = limiter.try_acquire(key)
+            if retry_after:
+                ADMISSION_REQUESTS.inc(stage=stage, result=reason)
+                raise Rejected(429, reason, retry_after, "Terlalu banyak pertanyaan, silakan tunggu sebentar.")
+            taken.append((limiter, key))
+
+        priority = request_priority(question, image_url)
+        ticket = await stage_limiter(stage).acquire(priority)
+    except BaseException:
+        # Ditolak (429 dari bucket lain, 503 dari antrean) atau klien pergi saat menunggu: tidak dihitung ke laju
+        for limiter, key in taken:
+            limiter.refund(key)
+        raise
+    _request_priority.set(priority)
+    normalized = None if image_url else normalize_question(question)
+    if normalized is not None:
+        _inflight_questions[normalized] = _inflight_questions.get(normalized, 0) + 1
+    return Admission(ticket, normalized)
+
+
+def _collect_admission_metrics():
+    for stage, limiter in _stages.items():
+        ADMISSION_ACTIVE.set(limiter.active, stage=stage)
+        ADMISSION_QUEUED.set(limiter.queued, stage=stage)
+
+
+register_collector(_collect_admission_metrics)
@@ -0,0 +1,201 @@
+# File: app/services/ann_index.py
+# Deskripsi: Pemilihan dan pembuatan index FAISS saat sync, sesuai ukuran korpus / konfigurasi:
+#            - "flat": pencarian eksak (default untuk korpus kecil, mendukung hapus per ID)
+#            - "ivf_flat": inverted file, vektor utuh; nprobe mengatur recall vs kecepatan
+#            - "hnsw": graf HNSW; efSearch mengatur recall vs kecepatan
+#            - "ivf_pq": inverted file + product quantization, RAM jauh lebih kecil
+#            Index non-flat dibangun ulang penuh dari vektor (cache embedding) setiap sync, dan
+#            recall@k-nya terhadap index eksak dilaporkan supaya parameter bisa di-tuning.
+
+import os
+import math
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import faiss
+from dotenv import load_dotenv
+from langchain.docstore.document import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+load_dotenv()
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+ANN_INDEX_FILE = "ann_index.json"
+
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "auto").lower()  # auto | flat | ivf_flat | hnsw | ivf_pq
+# Ambang mode auto (jumlah vektor): flat di bawah ANN_FLAT_MAX, ivf_pq mulai ANN_PQ_MIN, hnsw di antaranya
+ANN_FLAT_MAX = int(os.getenv("ANN_FLAT_MAX", "20000"))
+ANN_PQ_MIN = int(os.getenv("ANN_PQ_MIN", "500000"))
+
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0 = otomatis (~4 * sqrt(N))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", "80"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))  # jumlah sub-quantizer; dimensi harus habis dibagi
+ANN_PQ_NBITS = int(os.getenv("ANN_PQ_NBITS", "8"))
+# Pencarian terbatas ke subset (metadata scope) sampai ukuran ini dihitung eksak dari vektor tersimpan
+ANN_EXACT_SCOPE_MAX = int(os.getenv("ANN_EXACT_SCOPE_MAX", "4096"))
+ANN_RECALL_K = int(os.getenv("ANN_RECALL_K", "10"))
+ANN_RECALL_QUERIES = int(os.getenv("ANN_RECALL_QUERIES", "200"))
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Jenis index untuk korpus berisi n_vectors (ANN_INDEX_TYPE menimpa pilihan otomatis)."""
+    if ANN_INDEX_TYPE != "auto":
+        if ANN_INDEX_TYPE not in INDEX_TYPES:
+            raise ValueError(f"ANN_INDEX_TYPE tidak valid. Pilih 'auto' atau salah satu dari {INDEX_TYPES}.")
+        return ANN_INDEX_TYPE
+    if n_vectors < ANN_FLAT_MAX:
+        return "flat"
+    if n_vectors < ANN_PQ_MIN:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def index_type_of(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def supports_incremental(index) -> bool:
+    """Hanya index flat yang aman untuk hapus/tambah per ID (posisi tetap rapat seperti asumsi langchain)."""
+    return index_type_of(index) == "flat"
+
+
+def _nlist(n_vectors: int) -> int:
+    if ANN_NLIST:
+        return ANN_NLIST
+    # ~4*sqrt(N) list, minimal ~39 vektor latih per centroid
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _train_sample(vectors: np.ndarray, n: int) -> np.ndarray:
+    if len(vectors) <= n:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[rng.choice(len(vectors), n, replace=False)]
+
+
+def build_index(vectors: np.ndarray, index_type: str):
+    """Bangun index FAISS (metrik L2, sama dengan default langchain) berisi vectors pada posisi 0..N-1."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    if index_type == "ivf_pq" and n_vectors < 2 ** ANN_PQ_NBITS * 39:
+        # Codebook PQ butuh cukup banyak vektor latih; korpus sekecil ini tidak perlu kompresi
+        print(f"WARNING: {n_vectors} vektor terlalu sedikit untuk ivf_pq, memakai ivf_flat.")
+        index_type = "ivf_flat"
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, ANN_HNSW_M)
+        index.hnsw.efConstruction = ANN_EF_CONSTRUCTION
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = _nlist(n_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            if dim % ANN_PQ_M:
+                raise ValueError(f"Dimensi {dim} harus habis dibagi ANN_PQ_M ({ANN_PQ_M}).")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, ANN_PQ_M, ANN_PQ_NBITS)
+        index.train(_train_sample(vectors, max(nlist * 64, 2 ** ANN_PQ_NBITS * 64)))
+    else:
+        raise ValueError(f"Jenis index tidak dikenal: {index_type}")
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        # Direct map (posisi -> list) agar reconstruct() bisa dipakai untuk probe & pencarian per scope.
+        # Dibuat setelah add: varian hashtable yang diisi saat add paralel bisa kehilangan entri.
+        index.make_direct_map()
+    configure_search(index)
+    return index
+
+
+def configure_search(index):
+    """Terapkan parameter pencarian (nprobe / efSearch) dari konfigurasi; dipanggil setelah build/load."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(ANN_NPROBE, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ANN_EF_SEARCH
+    return index
+
+
+def build_vector_store(texts: List[str], vectors: np.ndarray, metadatas: List[dict], ids: List[str],
+                       embedding_function, index_type: Optional[str] = None) -> FAISS:
+    """Vector store langchain dengan index pilihan; docstore & pemetaan posisi sama seperti FAISS.from_embeddings."""
+    index = build_index(vectors, index_type or choose_index_type(len(texts)))
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(embedding_function, index, docstore, dict(enumerate(ids)))
+
+
+def restricted_search(index, query: np.ndarray, k: int, positions: List[int]) -> List[int]:
+    """
+    k posisi terdekat di antara `positions`. Index flat memakai IDSelector; index ANN menghitung
+    jarak eksak dari vektor tersimpan bila subset kecil (graf/list ANN bisa melewatkan subset kecil),
+    selain itu memakai selector dengan cakupan penuh.
+    """
+    index = faiss.downcast_index(index)
+    selector = faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+    if isinstance(index, faiss.IndexFlat):
+        _, indices = index.search(query, k, params=faiss.SearchParameters(sel=selector))
+        return [int(i) for i in indices[0] if i != -1]
+
+    if len(positions) <= ANN_EXACT_SCOPE_MAX:
+        scope = np.asarray(positions, dtype=np.int64)
+        vectors = index.reconstruct_batch(scope)
+        distances = ((vectors - query[0]) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return [int(scope[i]) for i in order]
+
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nlist)
+    else:
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(ANN_EF_SEARCH, k * 4))
+    _, indices = index.search(query, k, params=params)
+    return [int(i) for i in indices[0] if i != -1]
+
+
+def recall_at_k(index, vectors: np.ndarray, k: int = ANN_RECALL_K, n_queries: int = ANN_RECALL_QUERIES) -> float:
+    """Recall@k index terhadap pencarian eksak, dengan query sampel dari vektor korpus (sedikit diberi noise)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        return 1.0
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(0, 0.01 * float(np.abs(queries).mean() or 1), queries.shape).astype(np.float32)
+
+    _, truth = faiss.knn(queries, vectors, k)  # brute force tanpa menyalin korpus ke index baru
+    _, found = index.search(queries, k)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / float(truth.size)
+
+
+def index_report(index, vectors: Optional[np.ndarray] = None, build_seconds: Optional[float] = None) -> Dict:
+    """Ringkasan index untuk log / ann_index.json (jenis, ukuran, parameter, recall@k)."""
+    index = faiss.downcast_index(index)
+    report = {"type": index_type_of(index), "ntotal": int(index.ntotal), "dim": int(index.d)}
+    if isinstance(index, faiss.IndexIVF):
+        report.update({"nlist": int(index.nlist), "nprobe": int(index.nprobe)})
+    if isinstance(index, faiss.IndexIVFPQ):
+        report.update({"pq_m": int(index.pq.M), "pq_nbits": int(index.pq.nbits)})
+    if isinstance(index, faiss.IndexHNSW):
+        report.update({"hnsw_m": ANN_HNSW_M, "ef_search": int(index.hnsw.efSearch)})
+    if build_seconds is not None:
+        report["build_seconds"] = round(build_seconds, 3)
+    if vectors is not None and report["type"] != "flat":
+        started = time.perf_counter()
+        report[f"recall_at_{ANN_RECALL_K}"] = round(recall_at_k(index, vectors), 4)
+        report["recall_seconds"] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,137 @@
+# File: app/services/answer_cache.py
+# Deskripsi: Cache jawaban semantik. Pertanyaan yang hampir sama (kemiripan kosinus embedding
+#            di atas ambang) langsung mendapat jawaban tersimpan tanpa panggilan LLM.
+#            Cache otomatis dikosongkan saat versi vector store berubah (setelah sync Notion).
+#            Jawaban hanya dipakai ulang untuk konteks percakapan yang sama (context_key = sidik jari
+#            ringkasan + history yang masuk prompt), karena pertanyaan lanjutan seperti "yang kedua
+#            bagaimana?" bergantung pada history.
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import faiss
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+
+class SemanticAnswerCache:
+    """
+    Cache LRU + TTL di atas index FAISS kecil (inner product atas vektor ternormalisasi), satu index
+    per context_key. Setiap entri terikat ke versi vector store tempat jawabannya dibuat.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, faiss.Index] = {}  # context_key -> index
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (jawaban, waktu dibuat, context_key)
+        self._next_id = 0
+        self._store_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _prepare(vector: List[float]) -> np.ndarray:
+        query = np.asarray([vector], dtype=np.float32)
+        faiss.normalize_L2(query)
+        return query
+
+    def _remove(self, entry_ids: List[int]):
+        by_context: Dict[str, List[int]] = {}
+        for entry_id in entry_ids:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                by_context.setdefault(entry[2], []).append(entry_id)
+        for context_key, ids in by_context.items():
+            index = self._indexes[context_key]
+            index.remove_ids(np.asarray(ids, dtype=np.int64))
+            if index.ntotal == 0:
+                del self._indexes[context_key]
+
+    def _sync_version(self, store_version: int):
+        """Kosongkan cache jika jawaban dibuat dari vector store versi lain."""
+        if self._store_version != store_version:
+            if self._entries:
+                logger.info("Cache jawaban dikosongkan (vector store versi %s).", store_version)
+            self._indexes.clear()
+            self._entries.clear()
+            self._store_version = store_version
+
+    def lookup(self, vector: List[float], store_version: int, context_key: str = "") -> Optional[str]:
+        """Cari jawaban untuk pertanyaan yang mirip dalam konteks yang sama. None jika tidak ada yang cukup dekat."""
+        with self._lock:
+            self._sync_version(store_version)
+            index = self._indexes.get(context_key)
+            if index is None:
+                self.misses += 1
+                return None
+
+            scores, ids = index.search(self._prepare(vector), 1)
+            entry_id, score = int(ids[0][0]), float(scores[0][0])
+            entry = self._entries.get(entry_id)
+            if entry is None or score < self.threshold:
+                self.misses += 1
+                return None
+
+            answer, created_at, _ = entry
+            if time.monotonic() - created_at > self.ttl_seconds:
+                self._remove([entry_id])
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return answer
+
+    def store(self, vector: List[float], answer: str, store_version: int, context_key: str = ""):
+        """Simpan jawaban untuk vektor pertanyaan; entri paling lama tidak dipakai dibuang jika penuh."""
+        with self._lock:
+            self._sync_version(store_version)
+            query = self._prepare(vector)
+
+            evicted = []
+            entries = iter(self._entries.items())
+            now = time.monotonic()
+            while len(self._entries) - len(evicted) >= self.max_entries:
+                oldest_id, _ = next(entries)
+                evicted.append(oldest_id)
+            # Buang juga entri kedaluwarsa di ujung LRU
+            for entry_id, (_, created_at, _) in entries:
+                if now - created_at <= self.ttl_seconds:
+                    break
+                evicted.append(entry_id)
+            self._remove(evicted)
+
+            index = self._indexes.get(context_key)
+            if index is None:
+                index = self._indexes[context_key] = faiss.IndexIDMap2(faiss.IndexFlatIP(query.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(query, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (answer, now, context_key)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._entries.clear()
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+)
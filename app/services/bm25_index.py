@@ -0,0 +1,156 @@
+# File: app/services/bm25_index.py
+# Deskripsi: Inverted index leksikal dengan skor BM25 (Okapi) atas page_content dokumen, selaras
+#            dengan posisi vektor di index FAISS. Dibangun saat sync dan disimpan di samping index.faiss
+#            (bm25_index.npz, array numpy tanpa pickle). Dipakai retriever untuk hybrid search
+#            (digabung dengan hasil vektor lewat reciprocal rank fusion) dan untuk mengukur seberapa
+#            yakin kecocokan kata kunci sebuah pertanyaan (HyDE dilewati jika sangat yakin).
+
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BM25_INDEX_FILE = "bm25_index.npz"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Kata yang muncul di lebih dari porsi dokumen ini dianggap kata umum dan tidak dihitung keyakinan
+BM25_COMMON_DF = float(os.getenv("BM25_COMMON_DF", "0.5"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Kata huruf kecil (huruf/angka/underscore); nama menu & field IOSS tetap utuh per kata."""
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Posting list dalam format CSR: kata ke-t punya dokumen postings[offsets[t]:offsets[t+1]]
+    dengan frekuensi freqs[...] yang sama. Skor dihitung hanya untuk dokumen yang memuat kata query.
+    """
+
+    def __init__(self, terms: Iterable[str], offsets: np.ndarray, postings: np.ndarray, freqs: np.ndarray,
+                 doc_lengths: np.ndarray):
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        df = np.diff(offsets).astype(np.float64)
+        self.idf = np.log1p((len(doc_lengths) - df + 0.5) / (df + 0.5))
+        # idf kata yang tidak ada di korpus (df = 0): bobot tertinggi yang mungkin
+        self.unknown_idf = float(np.log1p((len(doc_lengths) + 0.5) / 0.5))
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _query_terms(self, query: str) -> List[str]:
+        return list(dict.fromkeys(tokenize(query)))
+
+    def scores(self, query: str, positions: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(posisi, skor) dokumen yang memuat minimal satu kata query; opsional dibatasi ke positions."""
+        docs, contributions = [], []
+        for term in self._query_terms(query):
+            t = self.terms.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            term_docs, tf = self.postings[start:end], self.freqs[start:end].astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[term_docs] / (self.avg_length or 1.0))
+            docs.append(term_docs)
+            contributions.append(self.idf[t] * tf * (BM25_K1 + 1) / (tf + norm))
+        if not docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        unique_docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+        if positions is not None:
+            keep = np.isin(unique_docs, np.asarray(positions, dtype=unique_docs.dtype))
+            unique_docs, totals = unique_docs[keep], totals[keep]
+        return unique_docs.astype(np.int64), totals
+
+    def search(self, query: str, k: int, positions: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """k posisi dengan skor BM25 tertinggi (urut menurun)."""
+        docs, totals = self.scores(query, positions)
+        if not len(docs):
+            return []
+        top = np.argsort(-totals, kind="stable")[:k]
+        return [(int(docs[i]), float(totals[i])) for i in top]
+
+    def confidence(self, query: str) -> float:
+        """
+        Bagian bobot idf kata query yang seluruhnya ditemukan di dokumen BM25 teratas (0..1).
+        1.0 = semua kata (terutama kata langka seperti nama menu/field) muncul di satu dokumen.
+        Kata umum (df > BM25_COMMON_DF) diabaikan; query yang hanya berisi kata umum bernilai 0.
+        """
+        top = self.search(query, 1)
+        if not top:
+            return 0.0
+        position = top[0][0]
+        weights, matched = {}, 0.0
+        for term in self._query_terms(query):
+            t = self.terms.get(term)
+            if t is None:
+                weights[term] = self.unknown_idf
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            if end - start > BM25_COMMON_DF * len(self):
+                continue
+            weights[term] = float(self.idf[t])
+            # postings urut menurut posisi dokumen -> cek keberadaan dengan binary search
+            i = start + np.searchsorted(self.postings[start:end], position)
+            if i < end and self.postings[i] == position:
+                matched += weights[term]
+        total = sum(weights.values())
+        return matched / total if total else 0.0
+
+
+def build_bm25_index(vector_store) -> BM25Index:
+    """Bangun index BM25 dari docstore, selaras dengan posisi vektor di index FAISS."""
+    term_postings = defaultdict(list)
+    n_docs = vector_store.index.ntotal
+    doc_lengths = np.zeros(n_docs, dtype=np.int32)
+    for position, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+        doc = vector_store.docstore.search(doc_id)
+        tokens = tokenize(getattr(doc, "page_content", "") or "")
+        doc_lengths[position] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            term_postings[term].append((position, tf))
+
+    terms = sorted(term_postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(term_postings[term]) for term in terms])
+    postings = np.empty(offsets[-1], dtype=np.int32)
+    freqs = np.empty(offsets[-1], dtype=np.int32)
+    for t, term in enumerate(terms):
+        entries = np.asarray(term_postings[term], dtype=np.int32).reshape(-1, 2)
+        postings[offsets[t]:offsets[t + 1]] = entries[:, 0]
+        freqs[offsets[t]:offsets[t + 1]] = entries[:, 1]
+    return BM25Index(terms, offsets, postings, freqs, doc_lengths)
+
+
+def save_bm25_index(bm25_index: BM25Index, folder_path: str):
+    np.savez(
+        os.path.join(folder_path, BM25_INDEX_FILE),
+        terms=np.asarray(list(bm25_index.terms), dtype=str),
+        offsets=bm25_index.offsets,
+        postings=bm25_index.postings,
+        freqs=bm25_index.freqs,
+        doc_lengths=bm25_index.doc_lengths,
+    )
+
+
+def load_bm25_index(folder_path: str, vector_store) -> BM25Index:
+    """Muat index BM25 dari disk; vector store lama tanpa file index dibangun ulang di memori."""
+    path = os.path.join(folder_path, BM25_INDEX_FILE)
+    if not os.path.exists(path):
+        print(f"INFO: {BM25_INDEX_FILE} tidak ditemukan, membangun dari docstore...")
+        return build_bm25_index(vector_store)
+    with np.load(path, allow_pickle=False) as data:
+        return BM25Index(data["terms"].tolist(), data["offsets"], data["postings"], data["freqs"], data["doc_lengths"])
@@ -0,0 +1,308 @@
+# File: app/services/chunking.py
+# Deskripsi: Chunking blok Notion berbasis jumlah token (tiktoken, lihat tokenizer.py):
+#            - blok diratakan menjadi unit: heading, paragraf, item list (beserta sub-item), tabel
+#            - unit dikelompokkan per bagian (heading + isi sampai heading berikutnya)
+#            - bagian bersebelahan yang kecil (< CHUNK_MIN_TOKENS) digabung selama muat target,
+#              kecuali bagian berikutnya ber-heading lebih tinggi (mis. H3 tidak ditarik ke H1 baru)
+#            - bagian besar dipotong di batas unit sampai CHUNK_TARGET_TOKENS, dengan overlap unit
+#              terakhir (<= CHUNK_OVERLAP_TOKENS) dan heading bagian diulang di awal potongan lanjutan
+#              (heading yang terlalu panjang untuk diulang dipotong seperti paragraf biasa)
+#            - tabel & item list tidak dipotong kecuali tidak muat di bawah CHUNK_MAX_TOKENS
+#              (tabel dipotong per baris dengan baris header diulang, paragraf panjang per kalimat)
+#            - tidak ada chunk yang melebihi CHUNK_MAX_TOKENS
+#            ID chunk stabil: ID blok pertama (non-overlap) di chunk, + "#n" untuk potongan ke-n
+#            dari satu blok yang terlalu panjang.
+
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+from .tokenizer import count_tokens, get_encoding
+
+load_dotenv()
+
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "300"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "450"))  # batas keras satu chunk
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "80"))  # bagian lebih kecil digabung dengan tetangganya
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+HEADING_LEVELS = {"heading_1": 1, "heading_2": 2, "heading_3": 3}
+TEXT_BLOCK_TYPES = (
+    "paragraph", "heading_1", "heading_2", "heading_3",
+    "bulleted_list_item", "numbered_list_item", "toggle", "quote", "callout", "to_do",
+)
+LIST_BLOCK_TYPES = ("bulleted_list_item", "numbered_list_item", "to_do")
+SKIPPED_BLOCK_TYPES = ("child_page", "child_database")  # diproses crawler sebagai item tersendiri
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def is_heading(block: dict) -> bool:
+    """Memeriksa apakah sebuah blok adalah heading."""
+    return block.get("type") in HEADING_LEVELS
+
+
+def _rich_text(items: List[dict]) -> str:
+    return "".join(text.get("plain_text", "") for text in items)
+
+
+def get_text_from_block(block: dict) -> str:
+    """Mengekstrak teks dari berbagai jenis blok konten."""
+    block_type = block.get("type")
+    if block_type in TEXT_BLOCK_TYPES:
+        return _rich_text(block.get(block_type, {}).get("rich_text", []))
+    if block_type == "table_row":
+        return " | ".join(_rich_text(cell).strip() for cell in block.get("table_row", {}).get("cells", []))
+    return ""
+
+
+class Unit(NamedTuple):
+    block_id: str
+    text: str
+    tokens: int
+    heading_level: int = 0  # 0 = bukan heading
+    kind: str = "text"      # "text" | "list" | "table"
+
+
+class Chunk(NamedTuple):
+    chunk_id: str  # stabil per blok awal (tanpa prefix halaman)
+    text: str
+    tokens: int
+
+
+def _unit(block_id: str, text: str, heading_level: int = 0, kind: str = "text") -> Unit:
+    return Unit(block_id, text, count_tokens(text), heading_level, kind)
+
+
+# ---------------- Blok -> unit ----------------
+def _list_item_lines(block: dict, depth: int, number: Optional[int]) -> List[str]:
+    """Item list beserta sub-item/isi bersarangnya sebagai baris berindentasi."""
+    text = get_text_from_block(block).strip()
+    marker = f"{number}." if number is not None else "-"
+    lines = [f"{'  ' * depth}{marker} {text}"] if text else []
+    child_number = 0
+    for child in block.get("_children") or []:
+        if child.get("type") in SKIPPED_BLOCK_TYPES:
+            continue
+        if child.get("type") in LIST_BLOCK_TYPES:
+            child_number = child_number + 1 if child.get("type") == "numbered_list_item" else 0
+            lines.extend(_list_item_lines(child, depth + 1, child_number or None))
+        else:
+            child_text = get_text_from_block(child).strip()
+            if child_text:
+                lines.append(f"{'  ' * (depth + 1)}{child_text}")
+    return lines
+
+
+def _table_rows(block: dict) -> List[str]:
+    return [row for row in (get_text_from_block(child) for child in block.get("_children") or []) if row.strip(" |")]
+
+
+def blocks_to_units(blocks: List[dict]) -> List[Unit]:
+    """Ratakan blok (termasuk blok bersarang di '_children') menjadi unit berurutan."""
+    units, number = [], 0
+    for block in blocks:
+        block_type = block.get("type")
+        number = number + 1 if block_type == "numbered_list_item" else 0
+        if block_type in SKIPPED_BLOCK_TYPES:
+            continue
+        if block_type == "table":
+            rows = _table_rows(block)
+            if rows:
+                units.append(_unit(block["id"], "\n".join(rows), kind="table"))
+            continue
+        if block_type in LIST_BLOCK_TYPES:
+            lines = _list_item_lines(block, 0, number or None)
+            if lines:
+                units.append(_unit(block["id"], "\n".join(lines), kind="list"))
+            continue
+
+        text = get_text_from_block(block).strip()
+        if text:
+            units.append(_unit(block["id"], text, HEADING_LEVELS.get(block_type, 0)))
+        if block.get("_children"):
+            # Isi toggle/callout/kolom dll. adalah bagian dari bagian yang sama
+            units.extend(blocks_to_units(block["_children"]))
+    return units
+
+
+# ---------------- Pemotongan unit yang terlalu besar ----------------
+def _token_windows(text: str, limit: int) -> List[str]:
+    encoding = get_encoding()
+    if encoding is None:
+        size = limit * 4
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + limit]) for i in range(0, len(tokens), limit)]
+
+
+def _pack_pieces(pieces: List[str], limit: int, separator: str, prefix: str = "") -> List[str]:
+    """Gabungkan potongan berurutan selama <= limit token (potongan yang sendirian terlalu besar dipotong per token)."""
+    if prefix and count_tokens(prefix) > limit // 2:
+        prefix = ""  # header tabel yang sangat panjang tidak diulang
+    parts, current = [], []
+    budget = limit - count_tokens(prefix)
+    for piece in pieces:
+        if count_tokens(piece) > budget:
+            if current:
+                parts.append(current)
+                current = []
+            parts.extend([window] for window in _token_windows(piece, budget))
+            continue
+        if current and count_tokens(separator.join(current + [piece])) > budget:
+            parts.append(current)
+            current = []
+        current.append(piece)
+    if current:
+        parts.append(current)
+    return [prefix + separator.join(part) for part in parts]
+
+
+def split_unit(unit: Unit, limit: int = CHUNK_TARGET_TOKENS, max_tokens: int = CHUNK_MAX_TOKENS) -> List[Unit]:
+    """
+    Potong unit yang melebihi max_tokens menjadi potongan <= limit token: tabel per kelompok baris (header
+    diulang), list per baris, teks (termasuk heading) per kalimat (kalimat dikemas ulang saat chunking,
+    sehingga overlap bisa berupa kalimat terakhir).
+    """
+    if unit.tokens <= max_tokens:
+        return [unit]
+    if unit.kind == "table":
+        header, *rows = unit.text.split("\n")
+        texts = _pack_pieces(rows, limit, "\n", prefix=header + "\n") if rows else _token_windows(header, limit)
+    elif unit.kind == "list":
+        texts = _pack_pieces(unit.text.split("\n"), limit, "\n")
+    else:
+        texts = [
+            window for sentence in _SENTENCE_END.split(unit.text) if sentence.strip()
+            for window in (_token_windows(sentence, limit) if count_tokens(sentence) > limit else [sentence])
+        ]
+    return [
+        _unit(unit.block_id if i == 0 else f"{unit.block_id}#{i}", text, unit.heading_level, unit.kind)
+        for i, text in enumerate(texts)
+    ]
+
+
+# ---------------- Unit -> bagian -> chunk ----------------
+class _Section:
+    def __init__(self, units: List[Unit]):
+        self.units = units
+        self.level = units[0].heading_level if units else 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(unit.tokens for unit in self.units)
+
+
+def _sections(units: List[Unit]) -> List[_Section]:
+    sections: List[_Section] = []
+    for unit in units:
+        if unit.heading_level or not sections:
+            sections.append(_Section([unit]))
+        else:
+            sections[-1].units.append(unit)
+    return sections
+
+
+def merge_small_sections(sections: List[_Section]) -> List[_Section]:
+    """Gabungkan bagian bersebelahan yang kecil selama total <= CHUNK_TARGET_TOKENS."""
+    merged: List[_Section] = []
+    for section in sections:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and (previous.tokens < CHUNK_MIN_TOKENS or section.tokens < CHUNK_MIN_TOKENS)
+            and previous.tokens + section.tokens <= CHUNK_TARGET_TOKENS
+            # bagian dengan heading lebih tinggi memulai topik baru -> tidak ditarik ke bagian sebelumnya
+            and (not section.level or not previous.level or section.level >= previous.level)
+        ):
+            previous.units.extend(section.units)
+        else:
+            merged.append(section)
+    return merged
+
+
+def _chunk(units: List[Unit], chunk_id: str) -> Chunk:
+    parts = []
+    for i, unit in enumerate(units):
+        # Kalimat-kalimat dari paragraf yang sama disambung kembali dengan spasi
+        same_block = i and unit.kind == "text" and unit.block_id.split("#")[0] == units[i - 1].block_id.split("#")[0]
+        parts.append((" " if same_block else "\n") + unit.text if i else unit.text)
+    text = "".join(parts)
+    return Chunk(chunk_id, text, count_tokens(text))
+
+
+def _cost(units: List[Unit]) -> int:
+    """Batas atas token unit yang disambung _chunk (+1 per pemisah baris/spasi)."""
+    return sum(unit.tokens + 1 for unit in units)
+
+
+def _split_section(section: _Section) -> List[Chunk]:
+    """Potong bagian besar di batas unit; potongan lanjutan diawali heading + overlap unit sebelumnya."""
+    first = section.units[0]
+    # Heading hanya diulang jika masih menyisakan ruang satu potongan target; heading yang lebih panjang
+    # dipotong dan diperlakukan seperti isi biasa
+    repeat_heading = section.level and first.tokens + 1 <= CHUNK_MAX_TOKENS - CHUNK_TARGET_TOKENS
+    heading = [first] if repeat_heading else []
+    max_tokens = CHUNK_MAX_TOKENS - _cost(heading) - 1
+    body = [
+        piece for unit in section.units[len(heading):]
+        for piece in split_unit(unit, min(CHUNK_TARGET_TOKENS, max_tokens), max_tokens)
+    ]
+
+    chunks, current, context = [], [], list(heading)
+    for unit in body:
+        used = _cost(context) + _cost(current)
+        # Potongan yang masih kecil boleh melewati target (sampai batas keras) daripada jadi fragmen
+        limit = CHUNK_TARGET_TOKENS if used >= CHUNK_MIN_TOKENS else CHUNK_MAX_TOKENS
+        if current and used + unit.tokens > limit:
+            chunk_id = first.block_id if not chunks else current[0].block_id
+            chunks.append(_chunk(context + current, chunk_id))
+            # Overlap: unit terakhir potongan ini (selama muat CHUNK_OVERLAP_TOKENS) diulang di potongan berikutnya
+            overlap, overlap_tokens = [], 0
+            for previous in reversed(current[1:]):
+                if overlap_tokens + previous.tokens > CHUNK_OVERLAP_TOKENS:
+                    break
+                overlap.insert(0, previous)
+                overlap_tokens += previous.tokens
+            context, current = list(heading) + overlap, []
+        if not current:
+            # Overlap dikurangi dari depan jika bersama unit ini melewati batas keras
+            while len(context) > len(heading) and _cost(context) + unit.tokens > CHUNK_MAX_TOKENS:
+                del context[len(heading)]
+        current.append(unit)
+    if current or not chunks:
+        chunk_id = first.block_id if not chunks else current[0].block_id
+        chunks.append(_chunk(context + current, chunk_id))
+    return chunks
+
+
+def chunk_blocks(blocks: List[dict]) -> List[Chunk]:
+    """Blok halaman Notion (dengan '_children' bersarang) -> daftar chunk berukuran token terbatas."""
+    chunks = []
+    for section in merge_small_sections(_sections(blocks_to_units(blocks))):
+        chunk = _chunk(section.units, section.units[0].block_id)
+        if chunk.tokens <= CHUNK_MAX_TOKENS:
+            chunks.append(chunk)
+        else:
+            chunks.extend(_split_section(section))
+    return chunks
+
+
+def chunk_size_stats(token_counts: List[int]) -> Dict[str, float]:
+    """Ringkasan ukuran chunk (token) untuk laporan sync."""
+    if not token_counts:
+        return {"chunks": 0}
+    counts = np.asarray(token_counts)
+    return {
+        "chunks": int(len(counts)),
+        "total_tokens": int(counts.sum()),
+        "mean": round(float(counts.mean()), 1),
+        "min": int(counts.min()),
+        "p50": int(np.percentile(counts, 50)),
+        "p95": int(np.percentile(counts, 95)),
+        "max": int(counts.max()),
+        "below_min": int((counts < CHUNK_MIN_TOKENS).sum()),
+        "above_max": int((counts > CHUNK_MAX_TOKENS).sum()),
+    }
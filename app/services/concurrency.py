@@ -0,0 +1,50 @@
+# File: app/services/concurrency.py
+# Deskripsi: Executor terbatas untuk pekerjaan CPU-bound (embedding, pencarian FAISS)
+#            dan batas konkurensi per penyedia LLM, agar event loop tidak pernah diblokir.
+
+import os
+import asyncio
+import functools
+import contextvars
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Jumlah thread untuk embedding/FAISS. FAISS & torch melepas GIL, jadi thread cukup.
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(8, os.cpu_count() or 4))))
+# Batas default panggilan paralel ke satu penyedia LLM.
+# Bisa di-override per penyedia, mis. LLM_MAX_CONCURRENCY_QWEN_API=4
+DEFAULT_LLM_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-bound")
+
+# Semaphore asyncio terikat ke event loop, jadi disimpan per loop.
+_provider_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Jalankan fungsi blocking di executor CPU terbatas tanpa memblokir event loop."""
+    loop = asyncio.get_running_loop()
+    # Bawa contextvars (mis. trace request aktif) ke thread executor
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_cpu_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def provider_concurrency(provider: str) -> int:
+    """Batas konkurensi untuk penyedia tertentu (env LLM_MAX_CONCURRENCY_<PROVIDER>)."""
+    value = os.getenv(f"LLM_MAX_CONCURRENCY_{(provider or 'default').upper()}")
+    return int(value) if value else DEFAULT_LLM_CONCURRENCY
+
+
+def provider_limit(provider: str) -> asyncio.Semaphore:
+    """Semaphore pembatas panggilan paralel ke penyedia LLM pada event loop saat ini."""
+    loop = asyncio.get_running_loop()
+    semaphores = _provider_semaphores.setdefault(loop, {})
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(provider_concurrency(provider))
+    return semaphores[provider]
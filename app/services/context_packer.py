@@ -0,0 +1,148 @@
+# File: app/services/context_packer.py
+# Deskripsi: Menyusun konteks prompt jawaban dari dokumen hasil retrieval dengan batas token:
+#            - baris "Path: ..." di awal page_content dibuang (path sudah ada di header grup)
+#            - chunk yang hampir sama (Jaccard shingle kata >= CONTEXT_DEDUP_THRESHOLD) dilewati
+#            - chunk dimasukkan berurutan menurut relevansi sampai CONTEXT_TOKEN_BUDGET habis
+#            - chunk dikelompokkan per path; prefix path yang sama untuk semua grup ditulis sekali
+#            Token dihitung dengan tiktoken (lihat tokenizer.py).
+
+import os
+import re
+import zlib
+from typing import List, NamedTuple, Optional, Set
+from dotenv import load_dotenv
+
+from .tokenizer import count_tokens, get_encoding
+
+load_dotenv()
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))  # 0 = tanpa batas
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))  # > 1 = tanpa dedup
+CONTEXT_SHINGLE_SIZE = int(os.getenv("CONTEXT_SHINGLE_SIZE", "5"))  # jumlah kata per shingle
+
+PATH_SEPARATOR = " > "
+CHUNK_SEPARATOR = "\n---\n"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class PackedContext(NamedTuple):
+    text: str
+    raw_tokens: int      # token konteks format lama (semua chunk, header path ganda)
+    packed_tokens: int   # token konteks yang dikirim ke LLM
+    chunks_in: int
+    chunks_used: int
+    duplicates: int
+    over_budget: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.packed_tokens)
+
+
+def legacy_format(docs) -> str:
+    """Format konteks sebelum packing: '[path: ...]' + page_content utuh untuk tiap dokumen."""
+    return CHUNK_SEPARATOR.join(
+        f"[path: {doc.metadata.get('source', 'Tidak diketahui')}]\n{doc.page_content}" for doc in docs
+    )
+
+
+def strip_path_header(content: str) -> str:
+    """Buang baris 'Path: ...' yang ditambahkan saat chunking (sudah diwakili header grup)."""
+    if content.startswith("Path: "):
+        _, _, body = content.partition("\n")
+        return body.lstrip("\n")
+    return content
+
+
+def shingles(text: str, size: int = CONTEXT_SHINGLE_SIZE) -> Set[int]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def _common_prefix(paths: List[List[str]]) -> List[str]:
+    prefix = paths[0]
+    for path in paths[1:]:
+        length = 0
+        while length < min(len(prefix), len(path)) and prefix[length] == path[length]:
+            length += 1
+        prefix = prefix[:length]
+    return prefix
+
+
+def _render(groups: "dict[str, List[str]]") -> str:
+    paths = [path.split(PATH_SEPARATOR) for path in groups]
+    # Prefix bersama dipakai hanya jika ada >1 grup dan setiap grup masih punya sisa path
+    prefix = _common_prefix(paths) if len(paths) > 1 else []
+    if prefix and any(len(path) == len(prefix) for path in paths):
+        prefix = prefix[:-1]
+
+    parts = [f"[path dasar: {PATH_SEPARATOR.join(prefix)}]"] if prefix else []
+    for path, bodies in zip(paths, groups.values()):
+        label = PATH_SEPARATOR.join(path[len(prefix):])
+        label = f"... > {label}" if prefix else label
+        parts.append(f"[path: {label}]\n" + "\n\n".join(bodies))
+    return CHUNK_SEPARATOR.join(parts)
+
+
+def pack_context(docs, budget: Optional[int] = None) -> PackedContext:
+    """
+    Susun konteks dari docs (urut menurut relevansi, paling relevan dulu).
+    Chunk yang tidak muat dilewati (chunk berikutnya yang lebih kecil masih dicoba);
+    chunk pertama dipotong jika sendirian sudah melebihi budget.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    raw_tokens = count_tokens(legacy_format(docs))
+
+    groups: "dict[str, List[str]]" = {}
+    seen: List[Set[int]] = []
+    used_tokens, duplicates, over_budget = 0, 0, 0
+    for doc in docs:
+        path = doc.metadata.get("source") or "Tidak diketahui"
+        body = strip_path_header(doc.page_content).strip()
+        if not body:
+            continue
+
+        body_shingles = shingles(body)
+        if any(jaccard(body_shingles, other) >= CONTEXT_DEDUP_THRESHOLD for other in seen):
+            duplicates += 1
+            continue
+
+        # Perkiraan biaya: isi chunk + header grup baru (jika path belum muncul)
+        cost = count_tokens(body) + (0 if path in groups else count_tokens(f"[path: {path}]\n") + 2)
+        if budget and used_tokens + cost > budget:
+            if groups:
+                over_budget += 1
+                continue
+            body = truncate_to_tokens(body, max(1, budget - (cost - count_tokens(body))))
+            cost = budget
+
+        groups.setdefault(path, []).append(body)
+        seen.append(body_shingles)
+        used_tokens += cost
+
+    text = _render(groups) if groups else ""
+    return PackedContext(
+        text=text,
+        raw_tokens=raw_tokens,
+        packed_tokens=count_tokens(text),
+        chunks_in=len(docs),
+        chunks_used=len(seen),
+        duplicates=duplicates,
+        over_budget=over_budget,
+    )
@@ -0,0 +1,172 @@
+# File: app/services/doc_store.py
+# Deskripsi: Docstore berbasis file untuk vector store (pengganti index.pkl hasil pickle):
+#            - docstore.jsonl: satu record JSON {id, page_content, metadata} per baris,
+#              urutannya sama dengan posisi vektor di index FAISS
+#            - docstore.offsets.npy: tabel offset byte (N+1 int64) ke docstore.jsonl
+#            Kedua file di-mmap, jadi memuat store tidak bergantung ukuran korpus, beberapa worker
+#            uvicorn berbagi halaman yang sama lewat page cache OS, dan hanya dokumen top-k yang
+#            di-decode. Tidak ada pickle, jadi aman dimuat tanpa allow_dangerous_deserialization.
+
+import os
+import json
+import mmap
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_DATA_FILE = "docstore.jsonl"
+DOCSTORE_OFFSETS_FILE = "docstore.offsets.npy"
+
+
+def has_docstore(folder_path: str) -> bool:
+    return (
+        os.path.exists(os.path.join(folder_path, DOCSTORE_DATA_FILE))
+        and os.path.exists(os.path.join(folder_path, DOCSTORE_OFFSETS_FILE))
+    )
+
+
+def write_docstore(vector_store, folder_path: str) -> int:
+    """Tulis dokumen vector_store berurutan sesuai posisi FAISS. Mengembalikan jumlah dokumen."""
+    total = vector_store.index.ntotal
+    offsets = np.zeros(total + 1, dtype=np.int64)
+    with open(os.path.join(folder_path, DOCSTORE_DATA_FILE), "wb") as f:
+        for position in range(total):
+            doc_id = vector_store.index_to_docstore_id[position]
+            doc = vector_store.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Dokumen untuk posisi {position} ({doc_id}) tidak ditemukan di docstore.")
+            record = {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets[position + 1] = offsets[position] + len(line)
+    np.save(os.path.join(folder_path, DOCSTORE_OFFSETS_FILE), offsets)
+    return total
+
+
+class MmapDocstore(Docstore, AddableMixin):
+    """
+    Docstore read-mostly di atas docstore.jsonl yang di-mmap. Dokumen dibaca per posisi FAISS
+    (document_at) atau per ID (search; peta ID -> posisi dibangun saat pertama dibutuhkan).
+    add/delete (sync inkremental) dicatat di overlay memori; file di disk tidak pernah diubah,
+    penyimpanan berikutnya menulis file baru lewat write_docstore.
+    """
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self._offsets = np.load(os.path.join(folder_path, DOCSTORE_OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(folder_path, DOCSTORE_DATA_FILE), "rb") as f:
+            # mmap tidak bisa dibuat untuk file kosong (store tanpa dokumen)
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+        self._positions: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _record(self, position: int) -> dict:
+        if not 0 <= position < len(self):
+            raise KeyError(position)
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return json.loads(self._data[start:end])
+
+    def id_at(self, position: int) -> str:
+        return self._record(position)["id"]
+
+    def document_at(self, position: int) -> Document:
+        record = self._record(position)
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def _position_of(self, doc_id: str) -> Optional[int]:
+        if self._positions is None:
+            with self._lock:
+                if self._positions is None:
+                    self._positions = {self.id_at(position): position for position in range(len(self))}
+        return self._positions.get(doc_id)
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        position = None if search in self._deleted else self._position_of(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.document_at(position)
+
+    def _exists(self, doc_id: str) -> bool:
+        if doc_id in self._added:
+            return True
+        return doc_id not in self._deleted and self._position_of(doc_id) is not None
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = [doc_id for doc_id in texts if self._exists(doc_id)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        for doc_id, doc in texts.items():
+            self._deleted.discard(doc_id)
+            self._added[doc_id] = doc
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            if self._added.pop(doc_id, None) is None:
+                self._deleted.add(doc_id)
+
+
+class DocIdMap(MutableMapping):
+    """
+    Pengganti dict index_to_docstore_id milik langchain FAISS: posisi -> ID dibaca langsung dari
+    docstore yang di-mmap. Saat pertama diubah (add/delete sync inkremental) isinya disalin ke dict biasa.
+    """
+
+    def __init__(self, docstore: MmapDocstore):
+        self._docstore = docstore
+        self._materialized: Optional[Dict[int, str]] = None
+
+    @property
+    def positional(self) -> bool:
+        """True selama posisi i masih sama dengan record ke-i di file (belum ada add/delete)."""
+        return self._materialized is None
+
+    def _materialize(self) -> Dict[int, str]:
+        if self._materialized is None:
+            self._materialized = {position: self._docstore.id_at(position) for position in range(len(self._docstore))}
+        return self._materialized
+
+    def __getitem__(self, position: int) -> str:
+        if self._materialized is not None:
+            return self._materialized[position]
+        return self._docstore.id_at(int(position))
+
+    def __setitem__(self, position: int, doc_id: str):
+        self._materialize()[position] = doc_id
+
+    def __delitem__(self, position: int):
+        del self._materialize()[position]
+
+    def __iter__(self) -> Iterator[int]:
+        if self._materialized is not None:
+            return iter(self._materialized)
+        return iter(range(len(self._docstore)))
+
+    def __len__(self) -> int:
+        if self._materialized is not None:
+            return len(self._materialized)
+        return len(self._docstore)
+
+
+def open_docstore(folder_path: str):
+    """Buka docstore di folder_path. Mengembalikan (docstore, index_to_docstore_id) untuk langchain FAISS."""
+    docstore = MmapDocstore(folder_path)
+    return docstore, DocIdMap(docstore)
+
+
+def documents_at(vector_store, positions: List[int]) -> List[Document]:
+    """Dokumen pada posisi FAISS tertentu; docstore mmap dibaca langsung per posisi tanpa lookup ID."""
+    docstore = vector_store.docstore
+    id_map = vector_store.index_to_docstore_id
+    if isinstance(docstore, MmapDocstore) and isinstance(id_map, DocIdMap) and id_map.positional:
+        return [docstore.document_at(i) for i in positions]
+    return [docstore.search(id_map[i]) for i in positions]
@@ -1,31 +1,332 @@
 # File: app/services/embedding.py
 # Deskripsi: Mengelola model embedding dan penyimpanan/pemuatan vector store FAISS
+#            + handle vector store in-memory (dimuat sekali, di-swap atomik setelah sync; sync dari
+#              proses lain dideteksi lewat stat direktori store dan dimuat ulang di latar belakang;
+#              selama proses lain menukar direktori, pemuatan memakai direktori previous)
+#            Model embedding baru dimuat saat pertama dipakai atau saat warmup, bukan saat modul
+#            diimpor. EMBEDDING_BACKEND: "torch" (sentence-transformers, default) atau "onnx"
+#            (ONNX Runtime int8, lihat onnx_embeddings.py & scripts/export_onnx.py).
 
 import os
+import json
+import shutil
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional
+import faiss
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from .ann_index import configure_search
+from .bm25_index import BM25Index, build_bm25_index, save_bm25_index, load_bm25_index
+from .doc_store import has_docstore, open_docstore, write_docstore
+from .metadata_index import MetadataIndex, build_metadata_index, save_metadata_index, load_metadata_index
+
+load_dotenv()
 
 VECTOR_STORE_PATH = "app/db/vector_store_langchain"
+INDEX_FILE = "index.faiss"
+STAGING_PATH = VECTOR_STORE_PATH + ".staging"
+PREVIOUS_PATH = VECTOR_STORE_PATH + ".previous"
+SYNC_LOCK_PATH = VECTOR_STORE_PATH + ".lock"
 MODEL_NAME = "paraphrase-multilingual-mpnet-base-v2"
+EMBEDDING_BACKENDS = ("torch", "onnx")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Identitas vektor untuk cache embedding: vektor int8 sedikit berbeda, jadi tidak boleh tercampur
+EMBEDDING_ID = MODEL_NAME if EMBEDDING_BACKEND == "torch" else f"{MODEL_NAME}@{EMBEDDING_BACKEND}"
+# Jeda minimum (detik) antar pengecekan apakah proses lain (CLI, worker lain) sudah menukar store di disk;
+# negatif = tidak pernah dicek (store hanya berubah lewat sync di proses ini)
+STORE_CHECK_INTERVAL = float(os.getenv("VECTOR_STORE_CHECK_INTERVAL", "1"))
+# Berapa kali pemuatan diulang jika direktori store ditukar proses lain di tengah pemuatan
+STORE_LOAD_ATTEMPTS = 3
+
+_model_lock = threading.Lock()
+_model = None
+
+
+def get_embedding_model():
+    """Model embedding sesuai EMBEDDING_BACKEND, dimuat sekali per proses saat pertama dibutuhkan."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+                    raise ValueError(f"EMBEDDING_BACKEND tidak valid. Pilih salah satu dari {EMBEDDING_BACKENDS}.")
+                print(f"INFO: Memuat model embedding '{MODEL_NAME}' (backend {EMBEDDING_BACKEND})...")
+                started = time.perf_counter()
+                if EMBEDDING_BACKEND == "onnx":
+                    from .onnx_embeddings import OnnxEmbeddings
+
+                    _model = OnnxEmbeddings()
+                else:
+                    # Import di sini: langchain_community.embeddings memuat torch & sentence-transformers
+                    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+                    _model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+                print(f"INFO: Model embedding berhasil dimuat ({time.perf_counter() - started:.1f} detik).")
+    return _model
+
+
+def embedding_model_loaded() -> bool:
+    return _model is not None
+
+
+class LazyEmbeddings(Embeddings):
+    """Pengganti model embedding yang aman diimpor: model asli baru dimuat pada embed pertama."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embedding_model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_embedding_model().embed_query(text)
 
-print(f"INFO: Memuat model embedding '{MODEL_NAME}'...")
-embedding_model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
-print("INFO: Model embedding berhasil dimuat.")
 
-def save_vector_store(vector_store):
+embedding_model = LazyEmbeddings()
+
+# ---------------- Handle Vector Store Aktif ----------------
+# Query membaca snapshot (versi, store, metadata index, index BM25) yang aktif. Sync membangun store baru
+# di buffer terpisah (objek baru + direktori staging), lalu snapshot ditukar dalam satu assignment.
+# Query yang sedang berjalan tetap memegang store lama sampai selesai.
+# Direktori store selalu diganti lewat os.replace, jadi (inode, mtime) direktori berubah setiap kali
+# proses mana pun menyelesaikan sync; perubahan itu memicu reload di proses lain.
+class StoreSnapshot(NamedTuple):
+    version: int
+    store: Optional[FAISS]
+    metadata_index: MetadataIndex
+    bm25_index: Optional[BM25Index] = None
+
+
+_store_lock = threading.Lock()
+_load_lock = threading.Lock()
+_active_snapshot = StoreSnapshot(0, None, {})
+_store_loaded = False
+_active_marker = None  # penanda direktori store di disk yang sedang aktif di memori
+_next_check = 0.0
+
+
+def _store_marker(path: Optional[str] = None):
+    """(path, inode, mtime) direktori vector store di disk (default: current); None jika belum ada."""
+    path = path or VECTOR_STORE_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return path, stat.st_ino, stat.st_mtime_ns
+
+
+@contextmanager
+def sync_lock(on_wait: Optional[Callable[[], None]] = None):
+    """
+    Kunci eksklusif lintas proses (flock pada SYNC_LOCK_PATH) untuk seluruh sync + penukaran direktori.
+    Sync dari worker lain atau dari scripts/sync_notion.py menunggu sampai kunci dilepas, sehingga
+    STAGING_PATH/PREVIOUS_PATH tidak pernah ditulis dua sync sekaligus. on_wait dipanggil sekali
+    jika kunci sedang dipegang proses lain. Kunci lepas otomatis jika proses pemegangnya mati.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # Windows: tidak ada flock, hanya satu sync per proses yang dijamin (sync_jobs)
+        yield
+        return
+
+    os.makedirs(os.path.dirname(SYNC_LOCK_PATH) or ".", exist_ok=True)
+    with open(SYNC_LOCK_PATH, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("INFO: Sync lain sedang berjalan di proses lain, menunggu...")
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_vector_store(vector_store, extra_files: Optional[Dict[str, dict]] = None) -> int:
+    """
+    Simpan vector store ke disk secara atomik lalu aktifkan di memori. Mengembalikan versi baru.
+    extra_files (nama file -> isi JSON) ikut ditulis ke direktori yang sama, mis. manifest sync.
+    Pemanggil sync memegang sync_lock() agar tidak bertabrakan dengan sync di proses lain.
+    """
     print(f"INFO: Menyimpan vector store ke {VECTOR_STORE_PATH}...")
-    os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
-    vector_store.save_local(VECTOR_STORE_PATH)
+    shutil.rmtree(STAGING_PATH, ignore_errors=True)
+    os.makedirs(STAGING_PATH, exist_ok=True)
+    faiss.write_index(vector_store.index, os.path.join(STAGING_PATH, INDEX_FILE))
+    write_docstore(vector_store, STAGING_PATH)
+    metadata_index = build_metadata_index(vector_store)
+    save_metadata_index(metadata_index, STAGING_PATH)
+    bm25_index = build_bm25_index(vector_store)
+    save_bm25_index(bm25_index, STAGING_PATH)
+    for filename, content in (extra_files or {}).items():
+        with open(os.path.join(STAGING_PATH, filename), "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False)
+
+    # Tukar direktori: current -> previous, staging -> current
+    with _store_lock:
+        shutil.rmtree(PREVIOUS_PATH, ignore_errors=True)
+        if os.path.exists(VECTOR_STORE_PATH):
+            os.replace(VECTOR_STORE_PATH, PREVIOUS_PATH)
+        os.replace(STAGING_PATH, VECTOR_STORE_PATH)
+        marker = _store_marker()
+        # Store aktif membaca dokumen dari file yang baru ditulis (mmap), bukan salinan di memori
+        vector_store.docstore, vector_store.index_to_docstore_id = open_docstore(VECTOR_STORE_PATH)
     print("INFO: Vector store berhasil disimpan.")
 
+    return activate_vector_store(vector_store, metadata_index, bm25_index, marker=marker)
+
+
+def _read_store(path: str):
+    print(f"INFO: Memuat vector store dari {path}...")
+    if has_docstore(path):
+        index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        docstore, index_to_docstore_id = open_docstore(path)
+        vector_store = FAISS(embedding_model, index, docstore, index_to_docstore_id)
+    else:
+        # Format lama (index.pkl hasil pickle); sync berikutnya menulis ulang ke format docstore baru
+        print("INFO: Docstore format lama (index.pkl) terdeteksi, dimuat lewat pickle.")
+        vector_store = FAISS.load_local(
+            path,
+            embedding_model,
+            allow_dangerous_deserialization=True
+        )
+    # nprobe / efSearch mengikuti konfigurasi saat ini (bisa di-tuning tanpa build ulang)
+    configure_search(vector_store.index)
+    return vector_store
+
+
+def _load_consistently(load: Callable[[str], object]) -> Optional[tuple]:
+    """
+    Jalankan load(direktori) pada direktori store yang bisa dibaca; kembalikan (penanda, hasil) atau
+    None jika belum ada store. save_vector_store di proses lain menukar direktori dengan dua os.replace
+    (current -> previous, staging -> current): di antara keduanya hanya PREVIOUS_PATH yang ada dan
+    masih utuh, jadi itu yang dimuat. Jika direktori ditukar selama pemuatan (file hilang atau penanda
+    berubah), pemuatan diulang agar index dan docstore tidak berasal dari dua versi berbeda.
+    """
+    for _ in range(STORE_LOAD_ATTEMPTS):
+        path = next((p for p in (VECTOR_STORE_PATH, PREVIOUS_PATH) if os.path.exists(p)), None)
+        if path is None:
+            return None
+        marker = _store_marker(path)
+        try:
+            result = load(path)
+        except FileNotFoundError:
+            continue
+        if marker is not None and _store_marker(path) == marker:
+            return marker, result
+    raise RuntimeError(f"Vector store terus ditukar selama dimuat ({STORE_LOAD_ATTEMPTS} percobaan).")
+
+
 def load_vector_store():
-    if not os.path.exists(VECTOR_STORE_PATH):
+    """Baca vector store dari disk (selalu membaca ulang, tidak memakai cache)."""
+    loaded = _load_consistently(_read_store)
+    if loaded is None:
         print("INFO: Vector store belum dibuat.")
         return None
+    return loaded[1]
+
+
+def load_store_file(filename: str) -> Optional[dict]:
+    """Baca file JSON pendamping dari direktori vector store aktif (None jika tidak ada)."""
+    path = os.path.join(VECTOR_STORE_PATH, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def activate_vector_store(
+    vector_store, metadata_index: Optional[MetadataIndex] = None, bm25_index: Optional[BM25Index] = None,
+    marker=None,
+) -> int:
+    """
+    Jadikan vector_store sebagai store aktif dan naikkan nomor versinya.
+    marker: penanda direktori di disk yang diwakili store ini (default: direktori saat ini).
+    """
+    global _active_snapshot, _store_loaded, _active_marker
+    if marker is None:
+        marker = _store_marker()
+    if metadata_index is None:
+        metadata_index = build_metadata_index(vector_store) if vector_store is not None else {}
+    if bm25_index is None and vector_store is not None:
+        bm25_index = build_bm25_index(vector_store)
+    with _store_lock:
+        version = _active_snapshot.version + 1
+        _active_snapshot = StoreSnapshot(version, vector_store, metadata_index, bm25_index)
+        _active_marker = marker
+        _store_loaded = True
+    print(f"INFO: Vector store versi {version} aktif.")
+    return version
+
+
+def get_store_snapshot() -> StoreSnapshot:
+    """
+    Kembalikan snapshot (versi, store, metadata index, index BM25) yang konsisten.
+    Store dimuat dari disk saat pertama dipakai; setelah itu hanya dimuat ulang jika direktori store
+    di disk diganti proses lain (dicek paling sering tiap STORE_CHECK_INTERVAL detik).
+    """
+    if not _store_loaded:
+        with _load_lock:
+            if not _store_loaded:
+                reload_vector_store()
+    elif STORE_CHECK_INTERVAL >= 0:
+        _check_store_changed()
+    return _active_snapshot
+
 
-    print(f"INFO: Memuat vector store dari {VECTOR_STORE_PATH}...")
-    return FAISS.load_local(
-        VECTOR_STORE_PATH,
-        embedding_model,
-        allow_dangerous_deserialization=True
-    )
+def _check_store_changed():
+    global _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return
+    _next_check = now + STORE_CHECK_INTERVAL
+    marker = _store_marker()
+    if marker is None or marker == _active_marker:
+        return
+    # Reload berat (baca index dari disk) -> di thread terpisah; query tetap memakai snapshot lama
+    if _load_lock.acquire(blocking=False):
+        threading.Thread(target=_reload_in_background, daemon=True, name="vector-store-reload").start()
+
+
+def _reload_in_background():
+    try:
+        if _store_marker() != _active_marker:
+            print("INFO: Vector store di disk diperbarui proses lain, memuat ulang...")
+            reload_vector_store()
+    except Exception as e:
+        print(f"WARNING: Gagal memuat ulang vector store: {e}")
+    finally:
+        _load_lock.release()
+
+
+def vector_store_loaded() -> bool:
+    return _store_loaded
+
+
+def get_vector_store():
+    """Store aktif di memori (None jika belum ada vector store)."""
+    return get_store_snapshot().store
+
+
+def get_store_version() -> int:
+    return get_store_snapshot().version
+
+
+def _read_store_with_indexes(path: str):
+    vector_store = _read_store(path)
+    return vector_store, load_metadata_index(path, vector_store), load_bm25_index(path, vector_store)
+
+
+def reload_vector_store() -> int:
+    """Muat ulang vector store dari disk dan aktifkan (mis. setelah sync dari proses lain)."""
+    loaded = _load_consistently(_read_store_with_indexes)
+    if loaded is None:
+        print("INFO: Vector store belum dibuat.")
+        return activate_vector_store(None, {}, marker=_store_marker())
+    # Penanda direktori yang dimuat: jika itu PREVIOUS_PATH (sync lain sedang menukar direktori),
+    # penanda tidak pernah sama dengan current, jadi pengecekan berikutnya memuat store yang baru
+    marker, (vector_store, metadata_index, bm25_index) = loaded
+    return activate_vector_store(vector_store, metadata_index, bm25_index, marker=marker)
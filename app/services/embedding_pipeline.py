@@ -0,0 +1,181 @@
+# File: app/services/embedding_pipeline.py
+# Deskripsi: Tahap embedding untuk sync: batch berukuran tetap yang diurutkan per panjang teks
+#            (padding minimal), opsional dibagi ke beberapa proses, dan cache hash-isi -> vektor
+#            di disk sehingga teks yang sama tidak pernah di-encode ulang antar sync / restart.
+#            Setelah sync berhasil, entri untuk teks yang tidak lagi ada di store (chunk yang diubah/
+#            dihapus, model embedding lama) dibuang agar cache tidak tumbuh tanpa batas.
+
+import os
+import sqlite3
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from .metrics import CACHE_REQUESTS
+
+load_dotenv()
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # > 1 = process pool, satu salinan model per proses
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "app/db/embedding_cache.sqlite")
+EMBED_CACHE_PRUNE = os.getenv("EMBED_CACHE_PRUNE", "1") == "1"
+
+# Model di dalam proses worker (hanya terisi di proses anak)
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int, backend: str = "torch"):
+    """Initializer proses worker: muat model sekali per proses dan batasi jumlah thread."""
+    global _worker_model
+    if backend == "onnx":
+        from .onnx_embeddings import OnnxEmbeddings
+
+        _worker_model = OnnxEmbeddings(threads=threads)
+        return
+
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    torch.set_num_threads(threads)
+    # Kelas yang sama dengan proses utama (get_embedding_model), jadi praproses teks juga sama
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": EMBED_BATCH_SIZE})
+
+
+def _encode_documents(model, texts: List[str]) -> np.ndarray:
+    """
+    Satu jalur encode untuk proses utama dan worker. embed_documents mengganti baris baru dengan
+    spasi sebelum encode; tanpa itu vektor di cache berbeda tergantung EMBED_WORKERS.
+    """
+    return np.asarray(model.embed_documents(texts), dtype=np.float32)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _encode_documents(_worker_model, texts)
+
+
+def _cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache persisten hash(model + teks) -> vektor float32 di SQLite."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), 500):  # batas jumlah parameter SQLite
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", chunk)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+            [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+        )
+        self._conn.commit()
+
+    def retain_only(self, keys: Iterable[str]) -> int:
+        """Hapus semua entri selain keys. Mengembalikan jumlah entri yang dihapus."""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (key TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM keep")
+        self._conn.executemany("INSERT OR IGNORE INTO keep (key) VALUES (?)", ((key,) for key in keys))
+        deleted = self._conn.execute("DELETE FROM vectors WHERE key NOT IN (SELECT key FROM keep)").rowcount
+        self._conn.execute("DROP TABLE keep")
+        self._conn.commit()
+        return deleted
+
+    def close(self):
+        self._conn.close()
+
+
+def _length_sorted_batches(texts: List[str], batch_size: int) -> List[List[int]]:
+    """Kelompokkan indeks teks ke batch berisi teks dengan panjang serupa (padding lebih sedikit)."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def embed_texts(texts: List[str], progress: Optional[dict] = None) -> np.ndarray:
+    """
+    Embed daftar teks untuk sync. Mengembalikan matriks float32 (urutan sama dengan input).
+    Teks yang sudah ada di cache tidak di-encode ulang; progress["chunks_embedded"] diperbarui per batch.
+    """
+    from .embedding import embedding_model, MODEL_NAME, EMBEDDING_ID, EMBEDDING_BACKEND
+
+    progress = progress if progress is not None else {}
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    cache = EmbeddingCache(EMBED_CACHE_PATH)
+    try:
+        keys = [_cache_key(EMBEDDING_ID, text) for text in texts]
+        cached = cache.get_many(sorted(set(keys)))
+
+        # Hanya teks unik yang belum ada di cache yang di-encode
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        missing_keys, missing_texts = list(missing.keys()), list(missing.values())
+        print(f"[INFO] Embedding: {len(texts)} chunk, {len(missing_texts)} teks unik di-encode, sisanya dari cache "
+              f"(batch {EMBED_BATCH_SIZE}, worker {EMBED_WORKERS}).")
+        progress["chunks_embedded"] = len(texts) - len(missing_texts)
+        CACHE_REQUESTS.inc(len(texts) - len(missing_texts), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(missing_texts), cache="embedding", result="miss")
+
+        batches = _length_sorted_batches(missing_texts, EMBED_BATCH_SIZE)
+
+        def store_batch(batch: List[int], vectors: np.ndarray):
+            encoded = {missing_keys[i]: vector for i, vector in zip(batch, vectors)}
+            cache.put_many(encoded)
+            cached.update(encoded)
+            progress["chunks_embedded"] += len(batch)
+
+        if EMBED_WORKERS > 1 and len(batches) > 1:
+            threads = max(1, (os.cpu_count() or 1) // EMBED_WORKERS)
+            # spawn: fork setelah torch dimuat bisa deadlock
+            with ProcessPoolExecutor(
+                max_workers=EMBED_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(MODEL_NAME, threads, EMBEDDING_BACKEND),
+            ) as pool:
+                batch_texts = [[missing_texts[i] for i in batch] for batch in batches]
+                for batch, vectors in zip(batches, pool.map(_encode_in_worker, batch_texts)):
+                    store_batch(batch, vectors)
+        else:
+            for batch in batches:
+                vectors = _encode_documents(embedding_model, [missing_texts[i] for i in batch])
+                store_batch(batch, vectors)
+
+        return np.vstack([cached[key] for key in keys])
+    finally:
+        cache.close()
+
+
+def prune_embedding_cache(texts: Iterable[str]) -> int:
+    """
+    Sisakan hanya vektor untuk texts (isi store setelah sync) dengan model embedding saat ini.
+    Halaman SQLite yang kosong dipakai ulang oleh entri berikutnya, jadi ukuran file berhenti tumbuh.
+    """
+    from .embedding import EMBEDDING_ID
+
+    if not EMBED_CACHE_PRUNE or not os.path.exists(EMBED_CACHE_PATH):
+        return 0
+    cache = EmbeddingCache(EMBED_CACHE_PATH)
+    try:
+        deleted = cache.retain_only(_cache_key(EMBEDDING_ID, text) for text in texts)
+    finally:
+        cache.close()
+    if deleted:
+        print(f"[INFO] Cache embedding: {deleted} vektor usang dihapus.")
+    return deleted
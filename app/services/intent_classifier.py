@@ -0,0 +1,98 @@
+# File: app/services/intent_classifier.py
+# Deskripsi: Klasifikasi niat lokal berbasis kemiripan embedding terhadap contoh berlabel.
+#            Dipakai pipeline mode "fast" agar tidak perlu satu round-trip LLM per pertanyaan;
+#            jika keyakinan rendah, pemanggil tetap jatuh ke classify_intent (LLM).
+
+import os
+import threading
+from typing import Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+from .embedding import embedding_model
+
+load_dotenv()
+
+# Skor kosinus minimum contoh terdekat, dan selisih minimum dengan label kedua
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.05"))
+
+INTENT_EXEMPLARS = {
+    "sapaan": [
+        "halo", "hai", "selamat pagi", "selamat siang", "selamat sore", "selamat malam",
+        "assalamualaikum", "permisi", "hi bot", "halo, apa kabar?",
+    ],
+    "terima_kasih": [
+        "terima kasih", "makasih", "terima kasih banyak", "thanks", "oke makasih ya",
+        "sip, terima kasih atas bantuannya", "mantap, thank you",
+    ],
+    "pertanyaan_umum": [
+        "kamu siapa?", "apa yang bisa kamu lakukan?", "kamu bisa bantu apa saja?",
+        "ini chatbot apa?", "bagaimana cara memakai asisten ini?", "siapa yang membuat kamu?",
+    ],
+    "tidak_relevan": [
+        "siapa presiden indonesia?", "resep nasi goreng enak", "bagaimana cuaca hari ini?",
+        "ceritakan lelucon", "siapa pemenang piala dunia?", "rekomendasi film terbaru",
+        "berapa harga bitcoin sekarang?",
+    ],
+    "pertanyaan_spesifik": [
+        "bagaimana cara membuat laporan aktual modis toko?",
+        "di mana menu untuk input stok barang?",
+        "apa arti status pending pada transaksi?",
+        "cara reset password akun IOSS",
+        "langkah mengisi form kunjungan toko",
+        "kenapa foto tidak bisa diunggah di aplikasi?",
+        "bagaimana cara melihat riwayat laporan?",
+        "apa fungsi tombol sinkronisasi di IOSS?",
+        "cara menghapus foto yang salah diambil",
+    ],
+}
+
+_exemplar_lock = threading.Lock()
+_exemplar_matrix: Optional[np.ndarray] = None
+_exemplar_labels: list = []
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _load_exemplars():
+    """Embed contoh berlabel sekali per proses (memakai embedding_model yang sudah dimuat)."""
+    global _exemplar_matrix, _exemplar_labels
+    if _exemplar_matrix is not None:
+        return _exemplar_matrix, _exemplar_labels
+    with _exemplar_lock:
+        if _exemplar_matrix is None:
+            labels, texts = [], []
+            for label, examples in INTENT_EXEMPLARS.items():
+                labels += [label] * len(examples)
+                texts += examples
+            vectors = np.asarray(embedding_model.embed_documents(texts), dtype=np.float32)
+            _exemplar_labels = labels
+            _exemplar_matrix = _normalize(vectors)
+    return _exemplar_matrix, _exemplar_labels
+
+
+def classify_intent_local(question_vector) -> Tuple[Optional[str], float]:
+    """
+    Klasifikasi niat dari vektor pertanyaan. Mengembalikan (intent, skor).
+    intent bernilai None jika keyakinan di bawah ambang -> pemanggil sebaiknya memakai LLM.
+    """
+    matrix, labels = _load_exemplars()
+    query = _normalize(np.asarray(question_vector, dtype=np.float32))
+    similarities = matrix @ query
+
+    # Skor per label = kemiripan contoh terdekat dari label tersebut
+    best_per_label = {}
+    for label, score in zip(labels, similarities):
+        best_per_label[label] = max(best_per_label.get(label, -1.0), float(score))
+    ranked = sorted(best_per_label.items(), key=lambda item: item[1], reverse=True)
+
+    top_label, top_score = ranked[0]
+    margin = top_score - ranked[1][1] if len(ranked) > 1 else top_score
+    if top_score < INTENT_CONFIDENCE_THRESHOLD or margin < INTENT_MIN_MARGIN:
+        return None, top_score
+    return top_label, top_score
@@ -3,57 +3,101 @@
 # Catatan: Semua fungsi lama tetap ada, ditambah session relevansi multi-turn dan fallback jawaban untuk pertanyaan tidak relevan
 
 import os
+import time
+import asyncio
+import logging
+import threading
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.llms import Ollama
-from langchain_openai import ChatOpenAI
-from langchain_mistralai.chat_models import ChatMistralAI
-from .retriever import search_relevant_context
-from typing import List, Dict, Optional
+from .retriever import search_relevant_context, probe_similarity, lexical_confidence
+from .concurrency import run_blocking
+from .llm_providers import get_llm
+from .llm_router import router
+from .metrics import span, start_trace, finish_trace, current_trace, annotate, LLM_TOKENS, CACHE_REQUESTS, INTENTS, ANSWERS
+from .tokenizer import count_tokens
+from .embedding import embedding_model, get_store_version
+from .intent_classifier import classify_intent_local, INTENT_EXEMPLARS
+from .answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from .session_store import create_session_store, new_session, add_message, history_fingerprint
+from .singleflight import single_flight, flight_key, SINGLEFLIGHT_ENABLED
+from .admission import stage_slot
+from typing import List, Dict, Optional, AsyncIterator
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from datetime import datetime, timedelta
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 MAX_HISTORY = 6  # jumlah turn terakhir yang diingat
 SESSION_TIMEOUT_MINUTES = 30  # hapus session jika idle lebih dari 30 menit
 
+# ---------------- Mode Pipeline ----------------
+# "standard": klasifikasi LLM -> HyDE LLM -> jawaban (3 round-trip berurutan)
+# "fast": klasifikasi lokal via embedding (LLM hanya jika ragu), HyDE spekulatif
+#         paralel dengan klasifikasi LLM, dan HyDE dilewati jika query mentah sudah relevan
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "standard").lower()
+HYDE_SPECULATIVE = os.getenv("HYDE_SPECULATIVE", "1") == "1"
+HYDE_SKIP_SIMILARITY = float(os.getenv("HYDE_SKIP_SIMILARITY", "0.65"))  # > 1 = tidak pernah skip
+# Pertanyaan kata kunci pendek (nama menu/field IOSS) yang cocok kuat di index BM25 tidak butuh HyDE,
+# di kedua mode pipeline. Keyakinan = porsi bobot idf kata pertanyaan yang ada di dokumen BM25 teratas.
+HYDE_SKIP_LEXICAL = float(os.getenv("HYDE_SKIP_LEXICAL", "0.9"))  # > 1 = tidak pernah skip
+HYDE_SKIP_LEXICAL_MAX_TERMS = int(os.getenv("HYDE_SKIP_LEXICAL_MAX_TERMS", "8"))
+
 # ---------------- Session Management ----------------
-SESSION_HISTORIES: Dict[str, Dict] = {}  # session_id -> {"messages": List[HumanMessage|AIMessage], "last_active": datetime}
+# Backend dipilih lewat SESSION_BACKEND ("memory" / "sqlite"), lihat session_store.py.
+# Dibuat saat pertama dipakai: koneksi SQLite tidak boleh ikut terbawa fork worker (scripts/serve_prefork.py)
+# Dari kode async, panggil store lewat asyncio.to_thread: backend SQLite bisa menunggu lock sampai 10 detik.
+_session_store = None
+_session_store_lock = threading.Lock()
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = create_session_store(ttl_seconds=SESSION_TIMEOUT_MINUTES * 60)
+    return _session_store
 
 def clean_expired_sessions():
     """Hapus session yang idle lebih dari SESSION_TIMEOUT_MINUTES."""
-    now = datetime.now()
-    for sid, data in list(SESSION_HISTORIES.items()):
-        if data["last_active"] + timedelta(minutes=SESSION_TIMEOUT_MINUTES) < now:
-            del SESSION_HISTORIES[sid]
+    get_session_store().purge_expired()
+
+def get_session_messages(session_id: str) -> List:
+    """Jendela riwayat pesan (HumanMessage/AIMessage) dari session yang masih aktif, ukurannya terbatas."""
+    session = get_session_store().get(session_id)
+    return list(session["messages"]) if session else []
+
+def remember_turn(session: Dict, question: str, answer_text: str):
+    """Catat satu giliran tanya-jawab ke session history."""
+    add_message(session, HumanMessage(content=question))
+    add_message(session, AIMessage(content=answer_text))
 
 def reset_session(session_id: str):
     """Hapus riwayat session tertentu."""
-    if session_id in SESSION_HISTORIES:
-        del SESSION_HISTORIES[session_id]
+    get_session_store().delete(session_id)
 
 # ---------------- Helper LLM ----------------
 def get_llm_instance():
-    provider = os.getenv("LLM_PROVIDER")
-    if provider == "ollama":
-        print("INFO: Menginisialisasi LLM dari Ollama...")
-        return Ollama(model=os.getenv("OLLAMA_MODEL"), base_url=os.getenv("OLLAMA_BASE_URL"))
-    elif provider == "mistral_api":
-        print("INFO: Menginisialisasi LLM dari Mistral API...")
-        return ChatMistralAI(model=os.getenv("MISTRAL_API_MODEL"), api_key=os.getenv("MISTRAL_API_KEY"))
-    elif provider == "qwen_api":
-        print("INFO: Menginisialisasi LLM dari Qwen API (via OpenAI compatible endpoint)...")
-        return ChatOpenAI(
-            model=os.getenv("QWEN_API_MODEL"),
-            api_key=os.getenv("QWEN_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
-            temperature=0.7,
-            max_tokens=512
-        )
-    else:
-        raise ValueError("LLM_PROVIDER tidak valid. Pilih 'ollama', 'mistral_api', atau 'qwen_api'.")
+    """Kompatibilitas: LLM tahap jawaban dari registry (tidak lagi dibuat ulang per request)."""
+    return get_llm("answer")
+
+def _message_content(response) -> str:
+    """LLM chat mengembalikan AIMessage, LLM teks (Ollama) mengembalikan str."""
+    return response.content if hasattr(response, "content") else str(response)
+
+async def _astream(stage: str, payload) -> AsyncIterator[str]:
+    """Stream potongan teks dari penyedia LLM yang dipilih router (deadline, hedging, fallback)."""
+    async with stage_slot("llm"):
+        async for chunk in router.astream(stage, lambda llm: llm, payload):
+            text = _message_content(chunk)
+            if text:
+                yield text
+
+async def _retrieve(func, *args):
+    """Kerja retrieval CPU-bound (embedding, FAISS, BM25) di executor, antre menurut prioritas request."""
+    async with stage_slot("retrieval"):
+        return await run_blocking(func, *args)
 
 def normalize_history(raw_history, max_history: int = MAX_HISTORY):
     """
@@ -84,68 +128,137 @@ def normalize_history(raw_history, max_history: int = MAX_HISTORY):
 
     return normalized
 
-def classify_intent(question: str, llm) -> str:
+async def classify_intent(question: str) -> str:
     """Menggunakan LLM untuk mengklasifikasikan niat pengguna."""
-    print(f"INFO: Mengklasifikasikan niat untuk: '{question}'")
+    logger.debug("Mengklasifikasikan niat untuk: '%s'", question)
     classifier_prompt = ChatPromptTemplate.from_template(
         "Klasifikasikan input pengguna berikut ke dalam salah satu kategori ini: 'sapaan', 'pertanyaan_spesifik', 'pertanyaan_umum', 'terima_kasih', 'tidak_relevan'. "
         "Jawab HANYA dengan satu kata.\n\n"
         "Input Pengguna: {question}\nOutput:"
     )
-    classifier_chain = classifier_prompt | llm | StrOutputParser()
-    intent = classifier_chain.invoke({"question": question}).strip().lower().split()[0]
-    print(f"INFO: Niat terdeteksi: '{intent}'")
+    async with stage_slot("llm"):
+        intent = await router.ainvoke(
+            "classifier", lambda llm: classifier_prompt | llm | StrOutputParser(), {"question": question}
+        )
+    intent = intent.strip().lower().split()[0]
+    logger.debug("Niat terdeteksi: '%s'", intent)
     return intent
 
-def generate_hypothetical_document(question: str, llm) -> str:
+async def generate_hypothetical_document(question: str) -> str:
     """Membuat dokumen hipotetis untuk pencarian (HyDE)."""
-    print(f"INFO: Membuat dokumen hipotetis untuk query: '{question}'")
+    logger.debug("Membuat dokumen hipotetis untuk query: '%s'", question)
     hyde_prompt = ChatPromptTemplate.from_template(
         "Tulis paragraf jawaban ideal untuk pertanyaan pengguna berikut. Anggap ini ada di dokumen knowledge base. "
         "Tulis langsung, tanpa pembukaan.\n\nPertanyaan: {question}\nJawaban:"
     )
-    hyde_chain = hyde_prompt | llm | StrOutputParser()
-    hypothetical_document = hyde_chain.invoke({"question": question})
-    print(f"INFO: Dokumen hipotetis dibuat: '{hypothetical_document[:100]}...'")
+    with span("hyde"):
+        async with stage_slot("llm"):
+            hypothetical_document = await router.ainvoke(
+                "hyde", lambda llm: hyde_prompt | llm | StrOutputParser(), {"question": question}
+            )
+    LLM_TOKENS.observe(count_tokens(hypothetical_document), stage="hyde", kind="completion")
+    logger.debug("Dokumen hipotetis dibuat: '%s...'", hypothetical_document[:100])
     return hypothetical_document
 
-# ---------------- Main ----------------
-def generate_answer(
-    question: str,
-    session_id: str,
-    history: Optional[List[Dict[str, str]]] = None,
-    image_url: Optional[str] = None
-) -> str:
-    """Fungsi utama multi-turn, mendukung teks atau multimodal + session management + handling pesan pertama."""
-    try:
-        llm = get_llm_instance()
-        chat_history_messages = normalize_history(history)
+def keyword_confidence(question: str) -> float:
+    """Keyakinan kecocokan leksikal pertanyaan; 0 untuk pertanyaan panjang (bukan query kata kunci)."""
+    if HYDE_SKIP_LEXICAL > 1 or len(question.split()) > HYDE_SKIP_LEXICAL_MAX_TERMS:
+        return 0.0
+    return lexical_confidence(question)
 
-        # --- Inisialisasi session jika belum ada ---
-        if session_id not in SESSION_HISTORIES:
-            SESSION_HISTORIES[session_id] = {"messages": [], "last_active": datetime.now()}
-        else:
-            SESSION_HISTORIES[session_id]["last_active"] = datetime.now()
+def _embed_question(question: str, with_store_version: bool):
+    """
+    Vektor pertanyaan (+ versi store untuk cache jawaban). Dijalankan di executor: pemanggilan pertama
+    get_store_version() memuat store dari disk dan tidak boleh menahan event loop.
+    """
+    store_version = get_store_version() if with_store_version else 0
+    return embedding_model.embed_query(question), store_version
 
-        # --- Tambahkan history dari frontend ---
-        if chat_history_messages:
-            SESSION_HISTORIES[session_id]["messages"] += chat_history_messages
+def _classify_and_probe(question: str, question_vector):
+    """Pakai vektor pertanyaan untuk klasifikasi lokal dan probe retrieval query mentah (vektor & BM25)."""
+    local_intent, score = classify_intent_local(question_vector)
+    raw_similarity = probe_similarity(question_vector)
+    return local_intent, score, raw_similarity, keyword_confidence(question)
 
-        clean_expired_sessions()
+async def _fast_intent(question: str, question_vector):
+    """
+    Mode fast: kembalikan (intent, raw_similarity, lexical, hyde_task).
+    hyde_task terisi jika HyDE sudah dimulai secara spekulatif selama klasifikasi LLM.
+    """
+    intent, score, raw_similarity, lexical = await _retrieve(_classify_and_probe, question, question_vector)
+    logger.debug(
+        "Klasifikasi lokal: '%s' (skor %.2f), kemiripan query mentah %.2f, keyakinan leksikal %.2f",
+        intent, score, raw_similarity, lexical,
+    )
 
-        # --- Mode Multimodal ---
-        if image_url:
-            message_content = [
-                {"type": "text", "text": question},
-                {"type": "image_url", "image_url": {"url": image_url}},
-            ]
-            user_message = HumanMessage(content=message_content)
-            response = llm.invoke(SESSION_HISTORIES[session_id]["messages"] + [user_message])
-            SESSION_HISTORIES[session_id]["messages"].append(user_message)
-            return response.content
+    hyde_task = None
+    if intent is None:
+        # Tidak yakin -> jatuh ke LLM; HyDE bisa berjalan paralel jika kemungkinan dibutuhkan
+        if HYDE_SPECULATIVE and raw_similarity < HYDE_SKIP_SIMILARITY and lexical < HYDE_SKIP_LEXICAL:
+            hyde_task = asyncio.create_task(generate_hypothetical_document(question))
+        try:
+            intent = await classify_intent(question)
+        except BaseException:
+            if hyde_task is not None:
+                hyde_task.cancel()
+            raise
+    return intent, raw_similarity, lexical, hyde_task
 
-        # --- Mode Teks Multi-turn (RAG + HyDE) ---
-        intent = classify_intent(question, llm)
+# ---------------- Main ----------------
+SYSTEM_PROMPT = """
+            Anda adalah asisten AI untuk sistem IOSS.
+Jawaban Anda HARUS selalu berdasarkan teks yang diberikan pada bagian 'Konteks Dokumen'. 
+Pertimbangkan pertanyaan dan jawaban sebelumnya agar memahami konteks percakapan.
+Jangan menebak atau menggunakan pengetahuan luar.
+
+### ATURAN:
+1. Jawab hanya dari 'Konteks Dokumen'. Jika tidak relevan, katakan: 
+   "Maaf, saya tidak menemukan informasi tersebut dalam dokumen IOSS."
+2. Jawaban ringkas, jelas, profesional. Gunakan format point bila perlu.
+3. Jangan ulangi pertanyaan pengguna.
+4. Jangan menambahkan detail yang tidak ada dalam konteks.
+5. Bahasa Indonesia profesional, langsung ke inti, tanpa sapaan.
+"""
+
+async def _answer_pipeline(
+    question: str, summary: str, history_window: List, context_key: str, result: Dict
+) -> AsyncIterator[str]:
+    """
+    Bagian pipeline teks (RAG + HyDE) yang hanya bergantung pada pertanyaan dan history yang masuk prompt,
+    sehingga bisa dibagi antar request identik (singleflight.py). Tidak menyentuh session: hasil akhir
+    ditulis ke result (outcome, answer, record = "turn" | "question") dan dicatat oleh tiap pemanggil.
+    context_key: history_fingerprint(summary, history_window); cache jawaban hanya berlaku dalam konteks yang sama.
+    """
+    trace = current_trace()
+    pipeline_started = time.perf_counter()
+    result["outcome"] = "error"
+    hyde_task = None
+    try:
+        question_vector, store_version, raw_similarity, lexical = None, 0, 0.0, None
+        if ANSWER_CACHE_ENABLED or PIPELINE_MODE == "fast":
+            with span("query_embedding"):
+                question_vector, store_version = await _retrieve(_embed_question, question, ANSWER_CACHE_ENABLED)
+
+        # --- Cache jawaban semantik: pertanyaan serupa dijawab tanpa LLM ---
+        if ANSWER_CACHE_ENABLED:
+            with span("answer_cache"):
+                cached_answer = answer_cache.lookup(question_vector, store_version, context_key)
+            CACHE_REQUESTS.inc(cache="answer", result="miss" if cached_answer is None else "hit")
+            if cached_answer is not None:
+                logger.debug("Jawaban diambil dari cache semantik.")
+                yield cached_answer
+                result.update(outcome="cache_hit", answer=cached_answer, record="turn")
+                return
+
+        with span("intent_classification"):
+            if PIPELINE_MODE == "fast":
+                intent, raw_similarity, lexical, hyde_task = await _fast_intent(question, question_vector)
+            else:
+                intent = await classify_intent(question)
+        INTENTS.inc(intent=intent if intent in INTENT_EXEMPLARS else "lainnya")
+        annotate(intent=intent)
+        streamed = False
+        result["outcome"] = "static"
 
         # --- Respons default ---
         if "sapaan" in intent:
@@ -158,36 +271,46 @@ def generate_answer(
             # --- Ditambahkan fallback multi-turn ---
             answer_text = "Maaf, saya hanya dapat memberikan informasi yang berkaitan dengan panduan sistem IOSS."
         elif "pertanyaan_spesifik" in intent:
-            hypothetical_document = generate_hypothetical_document(question, llm)
-            context_text = search_relevant_context(hypothetical_document)
+            if lexical is None:
+                lexical = await _retrieve(keyword_confidence, question)
+            if question_vector is not None and raw_similarity >= HYDE_SKIP_SIMILARITY:
+                # Query mentah sudah menemukan dokumen yang relevan -> HyDE tidak diperlukan
+                logger.debug("HyDE dilewati, memakai query mentah.")
+                annotate(hyde="skipped")
+                context_text = await _retrieve(search_relevant_context, question, question_vector)
+            elif lexical >= HYDE_SKIP_LEXICAL:
+                # Kata kunci pertanyaan cocok kuat di index BM25 -> HyDE (satu round-trip LLM) tidak diperlukan
+                logger.debug("HyDE dilewati, keyakinan leksikal %.2f.", lexical)
+                annotate(hyde="skipped_lexical")
+                context_text = await _retrieve(search_relevant_context, question, question_vector)
+            else:
+                if hyde_task is not None:
+                    hypothetical_document, hyde_task = await hyde_task, None
+                else:
+                    hypothetical_document = await generate_hypothetical_document(question)
+                # Embedding + FAISS bersifat CPU-bound -> jalankan di executor terbatas
+                context_text = await _retrieve(
+                    search_relevant_context, hypothetical_document, None, question
+                )
 
             # --- Jika context kosong ---
             if not context_text.strip():
-                SESSION_HISTORIES[session_id]["messages"].append(HumanMessage(content=question))
-                return "Maaf, saya tidak menemukan informasi tersebut dalam dokumen IOSS."
+                yield "Maaf, saya tidak menemukan informasi tersebut dalam dokumen IOSS."
+                result.update(outcome="no_context", record="question")
+                return
 
             # --- Jika context ada, bangun multi-turn messages ---
-            system_prompt = """
-            Anda adalah asisten AI untuk sistem IOSS.
-Jawaban Anda HARUS selalu berdasarkan teks yang diberikan pada bagian 'Konteks Dokumen'. 
-Pertimbangkan pertanyaan dan jawaban sebelumnya agar memahami konteks percakapan.
-Jangan menebak atau menggunakan pengetahuan luar.
-
-### ATURAN:
-1. Jawab hanya dari 'Konteks Dokumen'. Jika tidak relevan, katakan: 
-   "Maaf, saya tidak menemukan informasi tersebut dalam dokumen IOSS."
-2. Jawaban ringkas, jelas, profesional. Gunakan format point bila perlu.
-3. Jangan ulangi pertanyaan pengguna.
-4. Jangan menambahkan detail yang tidak ada dalam konteks.
-5. Bahasa Indonesia profesional, langsung ke inti, tanpa sapaan.
-"""
             messages = [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": f"Gunakan hanya konteks berikut:\n\n{context_text}"}
             ]
 
+            # --- Ringkasan percakapan lama yang sudah keluar dari jendela history ---
+            if summary:
+                messages.append({"role": "system", "content": f"Ringkasan pertanyaan sebelumnya:\n{summary}"})
+
             # --- Tambahkan history yang relevan (MAX_HISTORY terakhir) ---
-            for msg in SESSION_HISTORIES[session_id]["messages"][-MAX_HISTORY:]:
+            for msg in history_window:
                 if isinstance(msg, HumanMessage):
                     messages.append({"role": "user", "content": msg.content})
                 elif isinstance(msg, AIMessage):
@@ -196,19 +319,127 @@ Jangan menebak atau menggunakan pengetahuan luar.
             # --- Pertanyaan terbaru ---
             messages.append({"role": "user", "content": question})
 
-            answer_obj = llm.invoke(messages)
-            answer_text = answer_obj.content
+            # --- Stream jawaban token demi token ---
+            LLM_TOKENS.observe(sum(count_tokens(m["content"]) for m in messages), stage="answer", kind="prompt")
+            answer_parts = []
+            with span("answer_generation"):
+                async for token in _astream("answer", messages):
+                    if not answer_parts:
+                        started = trace.started if trace is not None else pipeline_started
+                        annotate(first_token_ms=round((time.perf_counter() - started) * 1000, 2))
+                    answer_parts.append(token)
+                    yield token
+            answer_text = "".join(answer_parts)
+            LLM_TOKENS.observe(count_tokens(answer_text), stage="answer", kind="completion")
+            streamed = True
+            result["outcome"] = "rag"
+            if ANSWER_CACHE_ENABLED:
+                answer_cache.store(question_vector, answer_text, store_version, context_key)
 
         else:
             # --- Fallback jika intent tidak dikenali ---
             answer_text = "Maaf, saya kurang mengerti. Bisa coba tanyakan dengan cara lain?"
 
-        # --- Update session history ---
-        SESSION_HISTORIES[session_id]["messages"].append(HumanMessage(content=question))
-        SESSION_HISTORIES[session_id]["messages"].append(AIMessage(content=answer_text))
+        # --- Jawaban statis dikirim sebagai satu potongan ---
+        if not streamed:
+            yield answer_text
+
+        result.update(answer=answer_text, record="turn")
+    except Exception as e:
+        logger.exception("ERROR saat generate_answer: %s", e)
+        yield "Terjadi kesalahan internal saat memproses permintaan Anda."
+    finally:
+        # --- HyDE spekulatif tidak terpakai (atau pipeline dibatalkan) ---
+        if hyde_task is not None:
+            hyde_task.cancel()
+
+def generate_answer(
+    question: str,
+    session_id: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    image_url: Optional[str] = None
+) -> str:
+    """Versi sinkron dari generate_answer_async untuk skrip/CLI. Jangan dipanggil dari dalam event loop."""
+    return asyncio.run(generate_answer_async(question, session_id, history, image_url))
+
+async def generate_answer_async(
+    question: str,
+    session_id: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    image_url: Optional[str] = None
+) -> str:
+    """Fungsi utama multi-turn, mendukung teks atau multimodal + session management + handling pesan pertama."""
+    parts = [token async for token in stream_answer(question, session_id, history, image_url)]
+    return "".join(parts)
+
+async def stream_answer(
+    question: str,
+    session_id: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    image_url: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Pipeline yang sama dengan generate_answer_async, tetapi menghasilkan potongan jawaban (token) saat LLM memproduksinya."""
+    # --- Inisialisasi session jika belum ada (disimpan kembali di akhir, apa pun hasilnya) ---
+    trace = start_trace("answer")
+    session = await asyncio.to_thread(get_session_store().get, session_id) or new_session()
+    outcome = "error"
+    try:
+        chat_history_messages = normalize_history(history)
+
+        # --- Tambahkan history dari frontend (pesan yang sudah tercatat di session diabaikan) ---
+        for message in chat_history_messages:
+            add_message(session, message, dedup=True)
+
+        await asyncio.to_thread(clean_expired_sessions)
+
+        # --- Mode Multimodal ---
+        if image_url:
+            message_content = [
+                {"type": "text", "text": question},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ]
+            user_message = HumanMessage(content=message_content)
+            async for token in _astream("answer", list(session["messages"]) + [user_message]):
+                yield token
+            add_message(session, user_message)
+            outcome = "multimodal"
+            return
+
+        # --- Mode Teks Multi-turn (RAG + HyDE) ---
+        # Request identik yang sedang berjalan (pertanyaan + history prompt sama) berbagi satu eksekusi
+        history_window = list(session["messages"])[-MAX_HISTORY:]
+        summary = session["summary"]
+        context_key = history_fingerprint(summary, history_window)
+
+        def producer(result: Dict) -> AsyncIterator[str]:
+            return _answer_pipeline(question, summary, history_window, context_key, result)
+
+        if SINGLEFLIGHT_ENABLED:
+            key = flight_key(question, [context_key])
+            flight, leader = single_flight.join(key, producer)
+            annotate(singleflight="leader" if leader else "follower")
+            async for token in flight.subscribe():
+                yield token
+            result = flight.result
+        else:
+            result = {}
+            async for token in producer(result):
+                yield token
 
-        return answer_text
+        # --- Update session history (per pemanggil) ---
+        outcome = result.get("outcome", "error")
+        if result.get("record") == "turn":
+            remember_turn(session, question, result["answer"])
+        elif result.get("record") == "question":
+            add_message(session, HumanMessage(content=question))
 
     except Exception as e:
-        print(f"ERROR saat generate_answer: {e}")
-        return "Terjadi kesalahan internal saat memproses permintaan Anda."
+        logger.exception("ERROR saat generate_answer: %s", e)
+        yield "Terjadi kesalahan internal saat memproses permintaan Anda."
+    finally:
+        with span("session_update"):
+            # Sudah dikirim ke thread -> tetap tersimpan walaupun stream dibatalkan saat menunggu
+            await asyncio.to_thread(get_session_store().save, session_id, session)
+        ANSWERS.inc(outcome=outcome)
+        annotate(outcome=outcome)
+        finish_trace(trace)
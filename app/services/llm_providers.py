@@ -0,0 +1,172 @@
+# File: app/services/llm_providers.py
+# Deskripsi: Registry klien LLM. Klien dibuat sekali per proses (per event loop untuk klien async)
+#            dan dipakai ulang antar request, dengan connection pool HTTP keep-alive bersama
+#            sehingga tidak ada handshake TLS baru ke OpenRouter/Mistral di setiap pertanyaan.
+#            Tiap tahap pipeline (classifier / hyde / answer) bisa memakai model berbeda.
+
+import os
+import asyncio
+import importlib
+import threading
+import weakref
+from typing import Dict, Optional
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_STAGES = ("classifier", "hyde", "answer")
+
+# Model per tahap: <PREFIX>_MODEL_<TAHAP>, mis. QWEN_API_MODEL_CLASSIFIER; jika kosong pakai <PREFIX>_MODEL
+MODEL_ENV_PREFIX = {"ollama": "OLLAMA", "mistral_api": "MISTRAL_API", "qwen_api": "QWEN_API"}
+# Panjang keluaran per tahap: classifier cukup satu kata, HyDE satu paragraf
+STAGE_MAX_TOKENS = {"classifier": 16, "hyde": 256, "answer": 512}
+STAGE_TEMPERATURE = {"classifier": 0.0, "hyde": 0.7, "answer": 0.7}
+
+# Modul SDK per penyedia; diimpor saat klien pertama dibuat (atau saat warmup), bukan saat startup
+PROVIDER_SDK_MODULES = {
+    "ollama": "langchain_community.llms",
+    "mistral_api": "langchain_mistralai.chat_models",
+    "qwen_api": "langchain_openai",
+}
+
+QWEN_API_BASE_URL = os.getenv("QWEN_API_BASE_URL", "https://openrouter.ai/api/v1")
+MISTRAL_API_BASE_URL = os.getenv("MISTRAL_API_BASE_URL", "https://api.mistral.ai/v1")
+
+# Connection pool bersama untuk semua tahap pada satu penyedia
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+
+_lock = threading.Lock()
+# Klien sync aman dipakai lintas thread/loop -> satu per penyedia per proses
+_sync_http_clients: Dict[str, httpx.Client] = {}
+# Klien async (dan instance LLM yang memegangnya) terikat ke event loop -> disimpan per loop
+_loop_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_no_loop_registry: dict = {"llms": {}, "http": {}}
+
+
+def current_provider() -> str:
+    return os.getenv("LLM_PROVIDER", "")
+
+
+def stage_model(provider: str, stage: str) -> Optional[str]:
+    """Nama model untuk tahap tertentu (fallback ke model utama penyedia)."""
+    prefix = MODEL_ENV_PREFIX[provider]
+    return os.getenv(f"{prefix}_MODEL_{stage.upper()}") or os.getenv(f"{prefix}_MODEL")
+
+
+def _registry() -> dict:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _no_loop_registry
+    registry = _loop_registries.get(loop)
+    if registry is None:
+        registry = _loop_registries.setdefault(loop, {"llms": {}, "http": {}})
+    return registry
+
+
+def _http_options(provider: str) -> dict:
+    options = {
+        "limits": httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_HTTP_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT),
+    }
+    if provider == "mistral_api":
+        # ChatMistralAI memakai klien apa adanya -> base_url dan header auth harus dipasang di sini
+        options["base_url"] = MISTRAL_API_BASE_URL
+        options["headers"] = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {os.getenv('MISTRAL_API_KEY')}",
+        }
+    return options
+
+
+def _sync_http_client(provider: str) -> httpx.Client:
+    client = _sync_http_clients.get(provider)
+    if client is None:
+        client = _sync_http_clients.setdefault(provider, httpx.Client(**_http_options(provider)))
+    return client
+
+
+def _async_http_client(registry: dict, provider: str) -> httpx.AsyncClient:
+    client = registry["http"].get(provider)
+    if client is None:
+        client = registry["http"].setdefault(provider, httpx.AsyncClient(**_http_options(provider)))
+    return client
+
+
+def import_provider_sdk(provider: str):
+    """Impor SDK penyedia (bisa berat, mis. langchain_openai) tanpa membuat klien."""
+    if provider not in PROVIDER_SDK_MODULES:
+        raise ValueError("LLM_PROVIDER tidak valid. Pilih 'ollama', 'mistral_api', atau 'qwen_api'.")
+    return importlib.import_module(PROVIDER_SDK_MODULES[provider])
+
+
+def _build_llm(provider: str, stage: str, registry: dict):
+    model = stage_model(provider, stage)
+    print(f"INFO: Menginisialisasi LLM {provider} untuk tahap '{stage}' (model {model})...")
+    sdk = import_provider_sdk(provider)
+    if provider == "ollama":
+        # Ollama lokal: tidak ada TLS, cukup instance-nya yang dipakai ulang
+        return sdk.Ollama(model=model, base_url=os.getenv("OLLAMA_BASE_URL"), temperature=STAGE_TEMPERATURE[stage])
+    if provider == "mistral_api":
+        return sdk.ChatMistralAI(
+            model=model,
+            api_key=os.getenv("MISTRAL_API_KEY"),
+            temperature=STAGE_TEMPERATURE[stage],
+            max_tokens=STAGE_MAX_TOKENS[stage],
+            client=_sync_http_client(provider),
+            async_client=_async_http_client(registry, provider),
+        )
+    if provider == "qwen_api":
+        return sdk.ChatOpenAI(
+            model=model,
+            api_key=os.getenv("QWEN_API_KEY"),
+            base_url=QWEN_API_BASE_URL,
+            temperature=STAGE_TEMPERATURE[stage],
+            max_tokens=STAGE_MAX_TOKENS[stage],
+            http_client=_sync_http_client(provider),
+            http_async_client=_async_http_client(registry, provider),
+        )
+
+
+def get_llm(stage: str = "answer", provider: Optional[str] = None):
+    """
+    Instance LLM untuk tahap `stage` ("classifier", "hyde", "answer").
+    Dibuat sekali lalu dipakai ulang; klien async disimpan per event loop.
+    """
+    if stage not in LLM_STAGES:
+        raise ValueError(f"Tahap LLM tidak dikenal: {stage}")
+    provider = provider or current_provider()
+    if provider not in MODEL_ENV_PREFIX:
+        raise ValueError("LLM_PROVIDER tidak valid. Pilih 'ollama', 'mistral_api', atau 'qwen_api'.")
+
+    registry = _registry()
+    key = (provider, stage)
+    llm = registry["llms"].get(key)
+    if llm is None:
+        with _lock:
+            llm = registry["llms"].get(key)
+            if llm is None:
+                llm = registry["llms"][key] = _build_llm(provider, stage, registry)
+    return llm
+
+
+async def aclose_clients():
+    """Tutup connection pool milik event loop saat ini dan klien sync (dipanggil saat shutdown)."""
+    registry = _loop_registries.pop(asyncio.get_running_loop(), None)
+    if registry is not None:
+        for client in registry["http"].values():
+            await client.aclose()
+    with _lock:
+        for client in _sync_http_clients.values():
+            client.close()
+        _sync_http_clients.clear()
@@ -0,0 +1,324 @@
+# File: app/services/llm_router.py
+# Deskripsi: Lapisan routing di atas beberapa penyedia LLM (LLM_PROVIDERS).
+#            - Deadline per panggilan (per tahap pipeline).
+#            - Pemilihan penyedia berdasarkan EWMA latensi terbaru.
+#            - Hedged request: penyedia kedua ditembak jika yang pertama belum menjawab sampai p95.
+#            - Circuit breaker per penyedia + fallback ke penyedia berikutnya saat gagal.
+#            Untuk streaming, penyedia dianggap "menjawab" saat token pertama tiba; setelah itu
+#            stream tidak dipindah ke penyedia lain.
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from .concurrency import provider_limit
+from . import llm_providers
+from . import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Urutan penyedia; default hanya LLM_PROVIDER (perilaku lama, tanpa hedging)
+LLM_PROVIDERS = [
+    p.strip() for p in os.getenv("LLM_PROVIDERS", os.getenv("LLM_PROVIDER", "")).split(",") if p.strip()
+]
+# Deadline per tahap (detik). Untuk streaming: batas waktu sampai token pertama.
+STAGE_DEADLINE_SECONDS = {
+    "classifier": float(os.getenv("LLM_DEADLINE_CLASSIFIER", "10")),
+    "hyde": float(os.getenv("LLM_DEADLINE_HYDE", "20")),
+    "answer": float(os.getenv("LLM_DEADLINE_ANSWER", "30")),
+}
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))  # jeda maksimum antar token
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "1") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))  # sebelum sampel cukup
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", "0.2"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+LATENCY_WINDOW = 200  # sampel latensi terakhir per penyedia/tahap untuk menghitung p95
+MIN_PERCENTILE_SAMPLES = 20
+
+
+class LLMUnavailableError(RuntimeError):
+    """Semua penyedia gagal, melewati deadline, atau sedang diputus circuit breaker."""
+
+
+class LatencyStats:
+    """EWMA + jendela sampel latensi untuk satu (penyedia, tahap)."""
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self._update_ewma(seconds)
+
+    def penalize(self, seconds: float):
+        """Kegagalan menggeser EWMA (urutan pemilihan) tanpa mengotori sampel p95."""
+        self._update_ewma(seconds)
+
+    def _update_ewma(self, seconds: float):
+        self.ewma = seconds if self.ewma is None else LLM_EWMA_ALPHA * seconds + (1 - LLM_EWMA_ALPHA) * self.ewma
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < MIN_PERCENTILE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    closed -> (LLM_BREAKER_FAILURES kegagalan berturut-turut) -> open
+    open -> (setelah LLM_BREAKER_RESET_SECONDS) -> half-open: satu panggilan percobaan
+    half-open -> sukses: closed, gagal: open lagi
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= LLM_BREAKER_RESET_SECONDS:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_in_flight)
+
+    def on_start(self):
+        if self.state == "half_open":
+            self.trial_in_flight = True
+
+    def on_success(self):
+        self.failures, self.opened_at, self.trial_in_flight = 0, None, False
+
+    def on_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= LLM_BREAKER_FAILURES:
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def on_abandon(self):
+        """Panggilan dibatalkan (kalah hedge) -> bukan sukses maupun gagal."""
+        self.trial_in_flight = False
+
+
+class LLMRouter:
+    """Memilih penyedia per panggilan dan menjalankan deadline, hedging, fallback, dan circuit breaker."""
+
+    def __init__(self, providers: List[str]):
+        self.providers = providers
+        self.breakers: Dict[str, CircuitBreaker] = {p: CircuitBreaker() for p in providers}
+        self.latency: Dict[Tuple[str, str], LatencyStats] = {}
+
+    def _stats(self, provider: str, stage: str) -> LatencyStats:
+        key = (provider, stage)
+        if key not in self.latency:
+            self.latency[key] = LatencyStats()
+        return self.latency[key]
+
+    def ranked(self, stage: str) -> List[str]:
+        """Penyedia yang boleh dipanggil, tercepat (EWMA) lebih dulu; yang belum punya data ikut urutan konfigurasi."""
+        allowed = [p for p in self.providers if self.breakers[p].allow()]
+        return sorted(allowed, key=lambda p: self._stats(p, stage).ewma or 0.0)
+
+    def hedge_delay(self, provider: str, stage: str) -> float:
+        stats = self._stats(provider, stage)
+        delay = stats.percentile(LLM_HEDGE_PERCENTILE)
+        if delay is None:
+            delay = 2 * stats.ewma if stats.ewma is not None else LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, delay)
+
+    async def _attempt(self, provider: str, stage: str, call: Callable):
+        """Satu panggilan ke satu penyedia dengan pencatatan latensi dan status breaker."""
+        breaker = self.breakers[provider]
+        breaker.on_start()
+        start = time.monotonic()
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            # Kalah hedge / deadline: penyedia ini setidaknya selambat waktu yang sudah berjalan
+            breaker.on_abandon()
+            self._stats(provider, stage).penalize(time.monotonic() - start)
+            LLM_CALLS.inc(provider=provider, stage=stage, outcome="abandoned")
+            raise
+        except Exception as e:
+            breaker.on_failure()
+            self._stats(provider, stage).penalize(STAGE_DEADLINE_SECONDS.get(stage, STAGE_DEADLINE_SECONDS["answer"]))
+            LLM_CALLS.inc(provider=provider, stage=stage, outcome="failure")
+            logger.warning("Penyedia LLM '%s' gagal pada tahap '%s': %s", provider, stage, e)
+            raise
+        elapsed = time.monotonic() - start
+        self._stats(provider, stage).record(elapsed)
+        breaker.on_success()
+        LLM_CALLS.inc(provider=provider, stage=stage, outcome="success")
+        LLM_LATENCY.observe(elapsed, provider=provider, stage=stage)
+        return result
+
+    async def _race(self, stage: str, call: Callable, cleanup: Optional[Callable] = None):
+        """
+        Jalankan `call(provider)` pada penyedia terbaik; tembak penyedia berikutnya saat hedge delay lewat
+        atau saat penyedia yang berjalan gagal. Mengembalikan (provider, hasil) pertama yang sukses.
+        `cleanup(hasil)` dipanggil untuk hasil sukses lain yang tidak terpakai.
+        """
+        candidates = self.ranked(stage)
+        if not candidates:
+            raise LLMUnavailableError("Tidak ada penyedia LLM yang tersedia (circuit breaker terbuka).")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STAGE_DEADLINE_SECONDS.get(stage, STAGE_DEADLINE_SECONDS["answer"])
+        pending: Dict[asyncio.Task, str] = {}
+        hedge_at: Optional[float] = None
+
+        def launch():
+            nonlocal hedge_at
+            provider = candidates.pop(0)
+            pending[asyncio.ensure_future(self._attempt(provider, stage, call))] = provider
+            hedge_at = loop.time() + self.hedge_delay(provider, stage) if LLM_HEDGE_ENABLED and candidates else None
+
+        launch()
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    for provider in pending.values():
+                        self.breakers[provider].on_failure()
+                    raise LLMUnavailableError(f"Deadline tahap '{stage}' terlewati.")
+                wait_until = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = None
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        continue
+                    if winner is None:
+                        winner = (provider, task.result())
+                    elif cleanup is not None:
+                        cleanup(task.result())  # hedge yang ikut selesai bersamaan
+                if winner is not None:
+                    return winner
+                if done and not pending and candidates:
+                    launch()  # fallback: semua yang berjalan gagal
+                elif not done and hedge_at is not None and loop.time() >= hedge_at and candidates:
+                    logger.info("Hedging tahap '%s' ke penyedia '%s'.", stage, candidates[0])
+                    LLM_HEDGES.inc(stage=stage)
+                    launch()
+            raise LLMUnavailableError(f"Semua penyedia LLM gagal pada tahap '{stage}'.")
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None and cleanup is not None:
+                    cleanup(task.result())
+
+    async def ainvoke(self, stage: str, build: Callable, payload):
+        """Panggil runnable `build(llm)` dengan payload; hasil dari penyedia tercepat yang sukses."""
+
+        async def call(provider: str):
+            runnable = build(llm_providers.get_llm(stage, provider))
+            async with provider_limit(provider):
+                return await runnable.ainvoke(payload)
+
+        _, result = await self._race(stage, call)
+        return result
+
+    async def astream(self, stage: str, build: Callable, payload) -> AsyncIterator:
+        """
+        Stream dari runnable `build(llm)`. Penyedia dipilih (dan di-hedge / fallback) sampai token
+        pertama tiba; setelah itu potongan berikutnya datang dari penyedia yang sama.
+        """
+
+        async def call(provider: str):
+            runnable = build(llm_providers.get_llm(stage, provider))
+            semaphore = provider_limit(provider)
+            await semaphore.acquire()
+            stream = runnable.astream(payload).__aiter__()
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                semaphore.release()
+                return None, None, None
+            except BaseException:
+                semaphore.release()
+                await stream.aclose()
+                raise
+            return stream, first, semaphore
+
+        def discard(result):
+            stream, _, semaphore = result
+            if stream is not None:
+                semaphore.release()
+                asyncio.ensure_future(stream.aclose())
+
+        provider, (stream, first, semaphore) = await self._race(stage, call, discard)
+        if stream is None:
+            return
+        try:
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), LLM_STREAM_IDLE_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except Exception:
+            self.breakers[provider].on_failure()
+            raise
+        finally:
+            semaphore.release()
+            await stream.aclose()
+
+    def snapshot(self) -> dict:
+        """Status breaker dan latensi per penyedia (untuk debug/metrik)."""
+        return {
+            provider: {
+                "state": self.breakers[provider].state,
+                "failures": self.breakers[provider].failures,
+                "ewma_seconds": {
+                    stage: round(stats.ewma, 4)
+                    for (p, stage), stats in self.latency.items()
+                    if p == provider and stats.ewma is not None
+                },
+            }
+            for provider in self.providers
+        }
+
+
+LLM_CALLS = metrics.Counter(
+    "chatbot_llm_calls_total", "Panggilan ke penyedia LLM menurut hasilnya.", ("provider", "stage", "outcome")
+)
+LLM_LATENCY = metrics.Histogram(
+    "chatbot_llm_latency_seconds", "Latensi panggilan LLM yang sukses (streaming: sampai token pertama).",
+    ("provider", "stage"),
+)
+LLM_HEDGES = metrics.Counter("chatbot_llm_hedges_total", "Jumlah hedged request yang ditembakkan.", ("stage",))
+LLM_CIRCUIT_OPEN = metrics.Gauge(
+    "chatbot_llm_circuit_open", "1 jika circuit breaker penyedia sedang terbuka (open/half-open).", ("provider",)
+)
+
+router = LLMRouter(LLM_PROVIDERS)
+
+
+def _collect_router_metrics():
+    for provider, breaker in router.breakers.items():
+        LLM_CIRCUIT_OPEN.set(0 if breaker.state == "closed" else 1, provider=provider)
+
+
+metrics.register_collector(_collect_router_metrics)
@@ -0,0 +1,43 @@
+# File: app/services/metadata_index.py
+# Deskripsi: Inverted index metadata -> posisi vektor FAISS.
+#            Dibangun saat sync dan disimpan di samping index.faiss, sehingga retriever bisa
+#            mengambil semua dokumen dalam satu category/subcategory/topic tanpa pencarian vektor kedua.
+
+import os
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+METADATA_INDEX_FILE = "metadata_index.json"
+INDEXED_LEVELS = ("category", "subcategory", "topic")
+
+# level -> nilai -> daftar posisi vektor di index FAISS
+MetadataIndex = Dict[str, Dict[str, List[int]]]
+
+
+def build_metadata_index(vector_store) -> MetadataIndex:
+    """Bangun inverted index dari docstore, selaras dengan posisi vektor di index FAISS."""
+    index = {level: defaultdict(list) for level in INDEXED_LEVELS}
+    for position, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+        doc = vector_store.docstore.search(doc_id)
+        metadata = getattr(doc, "metadata", None) or {}
+        for level in INDEXED_LEVELS:
+            value = metadata.get(level)
+            if value:
+                index[level][value].append(int(position))
+    return {level: dict(values) for level, values in index.items()}
+
+
+def save_metadata_index(metadata_index: MetadataIndex, folder_path: str):
+    with open(os.path.join(folder_path, METADATA_INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata_index, f, ensure_ascii=False)
+
+
+def load_metadata_index(folder_path: str, vector_store) -> MetadataIndex:
+    """Muat inverted index dari disk; vector store lama tanpa file index dibangun ulang di memori."""
+    path = os.path.join(folder_path, METADATA_INDEX_FILE)
+    if not os.path.exists(path):
+        print("INFO: metadata_index.json tidak ditemukan, membangun dari docstore...")
+        return build_metadata_index(vector_store)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,227 @@
+# File: app/services/metrics.py
+# Deskripsi: Metrik dan tracing per request tanpa dependensi tambahan.
+#            - Counter / Gauge / Histogram sederhana dengan label, dirender ke format teks
+#              Prometheus (text exposition 0.0.4) oleh endpoint /metrics.
+#            - Trace per request disimpan di contextvar; span() mencatat durasi tiap tahap
+#              ke histogram dan ke trace, lalu finish_trace() menulis satu baris log JSON.
+
+import time
+import json
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], None]] = []
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label: [jumlah per bucket..., +Inf], total
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {self._sums[key]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def register_collector(func: Callable[[], None]):
+    """Fungsi yang dipanggil tepat sebelum render, untuk memperbarui gauge dari status modul lain."""
+    _collectors.append(func)
+
+
+def render_metrics() -> str:
+    """Semua metrik dalam format teks Prometheus."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            logger.warning("Collector metrik gagal: %s", e)
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Metrik aplikasi ----------------
+HTTP_REQUEST_SECONDS = Histogram(
+    "chatbot_http_request_duration_seconds", "Durasi request HTTP sampai header respons.", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram("chatbot_stage_duration_seconds", "Durasi tiap tahap pipeline jawaban.", ("stage",))
+LLM_TOKENS = Histogram(
+    "chatbot_llm_tokens", "Jumlah token per panggilan LLM.", ("stage", "kind"), buckets=TOKEN_BUCKETS
+)
+CACHE_REQUESTS = Counter("chatbot_cache_requests_total", "Lookup cache menurut hasilnya.", ("cache", "result"))
+INTENTS = Counter("chatbot_intents_total", "Jumlah pertanyaan per niat terdeteksi.", ("intent",))
+ANSWERS = Counter("chatbot_answers_total", "Jumlah jawaban menurut hasil pipeline.", ("outcome",))
+CONTEXT_TOKENS = Histogram(
+    "chatbot_context_tokens", "Token konteks per retrieval (raw = tanpa packing, packed = dikirim ke LLM).",
+    ("kind",), buckets=TOKEN_BUCKETS,
+)
+
+
+# ---------------- Tracing ----------------
+class Trace:
+    """Span satu request (daftar (tahap, detik)) plus atribut bebas."""
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, object] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": [{"stage": stage, "ms": round(seconds * 1000, 2)} for stage, seconds in self.spans],
+            **self.attributes,
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("chatbot_trace", default=None)
+
+
+def start_trace(name: str) -> Trace:
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def annotate(**attributes):
+    """Tambahkan atribut ke trace aktif (jika ada)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def finish_trace(trace: Trace):
+    """Tulis trace sebagai satu baris log JSON dan lepaskan dari konteks."""
+    _current_trace.set(None)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("trace %s", json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+
+
+@contextmanager
+def span(stage: str):
+    """Ukur durasi satu tahap: masuk histogram STAGE_SECONDS dan trace aktif."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((stage, elapsed))
@@ -1,169 +1,404 @@
 # File: app/services/notion_sync.py
 # Deskripsi: Versi dengan kategori & subkategori di metadata + path diisi ke content
+#            + sync inkremental: hanya halaman yang berubah (last_edited_time) yang diambil ulang,
+#              hanya chunk yang hash-nya berubah yang di-embed ulang
+#            + crawler konkuren (AsyncClient + antrean kerja) dengan pembatas laju token bucket
+#            + chunking berbasis token (lihat chunking.py), statistik ukuran chunk di akhir sync
 
 import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from notion_client import Client
-from notion_client.helpers import collect_paginated_api
+from notion_client import AsyncClient
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
 from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
 
 # Impor dari file embedding kita
-from .embedding import embedding_model, save_vector_store
+from .embedding import embedding_model, save_vector_store, load_vector_store, load_store_file, sync_lock
+from .rate_limit import AsyncTokenBucket
+from .embedding_pipeline import embed_texts, prune_embedding_cache
+from .chunking import chunk_blocks, chunk_size_stats
+from .ann_index import (
+    ANN_INDEX_FILE, choose_index_type, index_type_of, supports_incremental, build_vector_store, index_report,
+)
 
 # --- Konfigurasi Awal ---
 load_dotenv()
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
 TOP_LEVEL_ID = os.getenv("NOTION_PAGE_ID")
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com")  # ganti ke server lokal untuk pengujian
+NOTION_MAX_CONCURRENCY = int(os.getenv("NOTION_MAX_CONCURRENCY", "8"))
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))  # request/detik (batas resmi Notion ~3)
+NOTION_RATE_BURST = float(os.getenv("NOTION_RATE_BURST", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+MANIFEST_FILE = "sync_manifest.json"
 
-# --- Variabel Global ---
-all_documents = []
-processed_ids = set()
+PAGE_BLOCK_TYPES = {"child_page": "page", "child_database": "database"}
 
 
-def is_heading(block: dict) -> bool:
-    """Memeriksa apakah sebuah blok adalah heading."""
-    return block.get("type") in ["heading_1", "heading_2", "heading_3"]
-
-
-def get_text_from_block(block: dict) -> str:
-    """Mengekstrak teks dari berbagai jenis blok konten."""
-    block_type = block.get("type")
-    text_holding_blocks = [
-        "paragraph", "heading_1", "heading_2", "heading_3",
-        "bulleted_list_item", "numbered_list_item", "toggle", "quote", "callout"
-    ]
-    if block_type in text_holding_blocks:
-        return "".join([text.get("plain_text", "") for text in block.get(block_type, {}).get("rich_text", [])])
+def get_page_title(page_obj: dict) -> str:
+    for prop_value in page_obj.get("properties", {}).values():
+        if prop_value.get("type") == "title":
+            return "".join([t.get("plain_text", "") for t in prop_value.get("title", [])])
     return ""
 
 
-def save_chunk(path, title, category, subcategory, texts):
-    """Helper untuk simpan chunk dengan path ke page_content."""
-    if not texts:
-        return
-    joined_path = " > ".join(path)
-    content_text = "\n".join(texts)  # bikin dulu
-    all_documents.append(
-        Document(
-            page_content=f"Path: {joined_path}\n\n{content_text}",
-            metadata={
-                "source": joined_path,
-                "title": title,
-                "category": category,
-                "subcategory": subcategory
-            }
-        )
-    )
-
-
-def process_item_recursively(item_id: str, path: list):
-    """Fungsi penjelajah utama dengan kategori & subkategori."""
-    if item_id in processed_ids:
-        return
-    processed_ids.add(item_id)
-    print(f"-> Memproses Item: {item_id[:8]} | Path: {'/'.join(path) if path else 'ROOT'}")
+def content_hash(doc: Document) -> str:
+    """Hash isi + metadata chunk; chunk dengan hash sama tidak perlu di-embed ulang."""
+    payload = doc.page_content + "\0" + json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NotionCrawler:
+    """
+    Penjelajah workspace Notion secara konkuren.
+    - Antrean kerja berisi (id, path, jenis) diproses oleh NOTION_MAX_CONCURRENCY worker.
+    - Semua request melewati token bucket; balasan 429 menahan bucket sesuai Retry-After.
+    - Endpoint dipilih dari jenis blok (child_page -> pages, child_database -> databases),
+      sehingga tidak ada lagi probe databases.query yang pasti gagal.
+    """
+
+    def __init__(self, client: AsyncClient, previous_manifest: Dict[str, dict], stats: Optional[dict] = None):
+        self.client = client
+        self.previous_manifest = previous_manifest
+        self.manifest: Dict[str, dict] = {}
+        self.documents: List[tuple] = []  # (page_id, chunk_id, hash, Document) dari halaman yang diambil ulang
+        self.limiter = AsyncTokenBucket(NOTION_RATE_LIMIT, NOTION_RATE_BURST)
+        # Dict progres bisa dibagikan dengan pemanggil (mis. job sync) agar terbaca saat crawl berjalan
+        self.stats = stats if stats is not None else {}
+        self.stats.update({"pages_crawled": 0, "pages_unchanged": 0, "requests": 0, "rate_limited": 0})
+        self._inflight = asyncio.Semaphore(NOTION_MAX_CONCURRENCY)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._seen_ids = set()
+
+    # ---------------- Request ----------------
+    async def _call(self, func, **kwargs):
+        """Panggil endpoint Notion dengan pembatas laju dan retry untuk 429/timeout."""
+        for attempt in range(NOTION_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            try:
+                async with self._inflight:
+                    self.stats["requests"] += 1
+                    return await func(**kwargs)
+            except HTTPResponseError as e:
+                if e.status != 429 or attempt == NOTION_MAX_RETRIES:
+                    raise
+                retry_after = float(e.headers.get("retry-after", 1))
+                self.stats["rate_limited"] += 1
+                print(f"WARNING: Notion rate limit, menunggu {retry_after:.1f} detik...")
+                self.limiter.pause(retry_after)
+            except RequestTimeoutError:
+                if attempt == NOTION_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    async def _paginate(self, func, **kwargs) -> List[dict]:
+        results, cursor = [], None
+        while True:
+            response = await self._call(func, **kwargs, **({"start_cursor": cursor} if cursor else {}))
+            results.extend(response.get("results", []))
+            if not response.get("has_more"):
+                return results
+            cursor = response.get("next_cursor")
+
+    # ---------------- Antrean kerja ----------------
+    def _enqueue(self, item_id: str, path: list, kind: Optional[str], page_obj: Optional[dict] = None):
+        if item_id in self._seen_ids:
+            return
+        self._seen_ids.add(item_id)
+        self._queue.put_nowait((item_id, path, kind, page_obj))
 
-    # Coba perlakukan sebagai DATABASE
-    try:
-        db_pages = collect_paginated_api(notion.databases.query, database_id=item_id)
+    async def crawl(self, root_id: str):
+        self._enqueue(root_id, [], None)
+        workers = [asyncio.create_task(self._worker()) for _ in range(NOTION_MAX_CONCURRENCY)]
+        try:
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            item_id, path, kind, page_obj = await self._queue.get()
+            try:
+                await self._process_item(item_id, path, kind, page_obj)
+            except Exception as e:
+                print(f"WARNING: Gagal memproses {item_id[:8]}: {e}")
+                # Jangan hapus isi halaman hanya karena request gagal: pakai hasil sync sebelumnya
+                self._keep_previous(item_id)
+            finally:
+                self._queue.task_done()
+
+    # ---------------- Pemrosesan item ----------------
+    async def _process_item(self, item_id: str, path: list, kind: Optional[str], page_obj: Optional[dict]):
+        print(f"-> Memproses Item: {item_id[:8]} | Path: {'/'.join(path) if path else 'ROOT'}")
+        if kind == "database":
+            await self._process_database(item_id, path)
+            return
+        if kind is None and page_obj is None:
+            # Jenis root belum diketahui: coba sebagai halaman, lalu sebagai database
+            try:
+                page_obj = await self._call(self.client.pages.retrieve, page_id=item_id)
+            except APIResponseError:
+                await self._process_database(item_id, path)
+                return
+        await self._process_page(item_id, path, page_obj)
+
+    async def _process_database(self, database_id: str, path: list):
+        db_pages = await self._paginate(self.client.databases.query, database_id=database_id)
         print(f"  -> Ditemukan Database. Memproses {len(db_pages)} halaman...")
+        # Database dicatat tanpa chunk agar halaman-halamannya tetap ditelusuri (_keep_previous) jika query gagal nanti
+        self.manifest[database_id] = {
+            "last_edited_time": None, "path": path, "chunks": {}, "chunk_tokens": {},
+            "children": [[page["id"], "page"] for page in db_pages],
+        }
         for page in db_pages:
-            process_item_recursively(page["id"], path)
-        return
-    except Exception:
-        pass
-
-    try:
-        # Ambil judul halaman
-        current_title = ""
-        try:
-            page_obj = notion.pages.retrieve(page_id=item_id)
-            properties = page_obj.get("properties", {})
-            for prop_value in properties.values():
-                if prop_value.get("type") == "title":
-                    current_title = "".join([t.get("plain_text", "") for t in prop_value.get("title", [])])
-                    break
-
-            # Proses relation
-            for prop_value in properties.values():
-                if prop_value.get("type") == "relation":
-                    for relation in prop_value.get("relation", []):
-                        process_item_recursively(relation["id"], path + [current_title] if current_title else path)
-        except Exception:
-            pass
+            # Hasil query sudah berisi objek halaman lengkap -> tidak perlu pages.retrieve lagi
+            self._enqueue(page["id"], path, "page", page)
+
+    async def _process_page(self, page_id: str, path: list, page_obj: Optional[dict]):
+        if page_obj is None:
+            page_obj = await self._call(self.client.pages.retrieve, page_id=page_id)
+        current_title = get_page_title(page_obj)
+        last_edited_time = page_obj.get("last_edited_time")
+
+        # Proses relation
+        for prop_value in page_obj.get("properties", {}).values():
+            if prop_value.get("type") == "relation":
+                for relation in prop_value.get("relation", []):
+                    self._enqueue(relation["id"], path + [current_title] if current_title else path, "page")
 
         new_path = path + [current_title] if current_title else path
 
+        # Halaman (dan path-nya) tidak berubah sejak sync terakhir -> pakai chunk lama, cukup telusuri anak-anaknya
+        previous = self.previous_manifest.get(page_id)
+        if (
+            previous and last_edited_time
+            and previous.get("last_edited_time") == last_edited_time
+            and previous.get("path") == new_path
+        ):
+            self.stats["pages_unchanged"] += 1
+            self._keep_previous(page_id)
+            return
+
+        # Entri manifest disusun terpisah dan baru dipasang setelah blok berhasil diambil & dipotong.
+        # Jika gagal di tengah, _worker memanggil _keep_previous -> chunk & anak dari sync sebelumnya tetap dipakai.
+        entry = {"last_edited_time": last_edited_time, "path": new_path, "chunks": {}, "chunk_tokens": {}, "children": []}
+
         # Tentukan kategori dan subkategori
         category = new_path[0] if len(new_path) > 0 else "Uncategorized"
         subcategory = new_path[1] if len(new_path) > 1 else None
 
-        # Ambil anak-anak blok
-        children = collect_paginated_api(notion.blocks.children.list, block_id=item_id)
-        if not children:
+        blocks = await self._fetch_blocks(page_id)
+        if blocks:
+            print(f"    -> Memproses {len(blocks)} blok anak di dalam '{current_title or page_id[:8]}'")
+        documents = self._build_chunks(entry, page_id, blocks, new_path, current_title, category, subcategory)
+
+        self.manifest[page_id] = entry
+        self.documents.extend(documents)
+        for child_id, kind in entry["children"]:
+            self._enqueue(child_id, new_path, kind)
+        self.stats["pages_crawled"] += 1
+
+    def _keep_previous(self, page_id: str):
+        """Pakai entri manifest sebelumnya untuk halaman ini dan telusuri anak-anak yang tercatat."""
+        previous = self.previous_manifest.get(page_id)
+        if not previous or page_id in self.manifest:
             return
+        self.manifest[page_id] = previous
+        for child_id, kind in previous.get("children", []):
+            self._enqueue(child_id, previous.get("path", []), kind)
+
+    async def _fetch_blocks(self, block_id: str) -> List[dict]:
+        """Ambil blok anak beserta blok bersarang (diambil paralel); halaman/database anak tidak dimasuki."""
+        children = await self._paginate(self.client.blocks.children.list, block_id=block_id)
+        nested = [c for c in children if c.get("has_children") and c.get("type") not in PAGE_BLOCK_TYPES]
+        nested_children = await asyncio.gather(*[self._fetch_blocks(c["id"]) for c in nested])
+        for child, sub_blocks in zip(nested, nested_children):
+            child["_children"] = sub_blocks
+        return children
+
+    # ---------------- Chunking ----------------
+    def _save_chunk(self, entry, page_id, start_block_id, path, title, category, subcategory, content_text, tokens):
+        """
+        Helper untuk simpan chunk dengan path ke page_content. ID chunk stabil: <page_id>:<blok pertama>.
+        Hash & jumlah token dicatat di entry (entri manifest halaman); mengembalikan (page_id, chunk_id, hash, Document).
+        """
+        joined_path = " > ".join(path)
+        doc = Document(
+            page_content=f"Path: {joined_path}\n\n{content_text}",
+            metadata={
+                "source": joined_path,
+                "title": title,
+                "category": category,
+                "subcategory": subcategory
+            }
+        )
+        chunk_id = f"{page_id}:{start_block_id}"
+        chunk_hash = content_hash(doc)
+        entry["chunks"][chunk_id] = chunk_hash
+        entry["chunk_tokens"][chunk_id] = tokens
+        return page_id, chunk_id, chunk_hash, doc
+
+    def _build_chunks(self, entry, page_id, blocks, path, title, category, subcategory) -> List[tuple]:
+        """Catat halaman/database anak di entry; isi halaman dipotong per token (chunking.chunk_blocks)."""
+        entry["children"] = [[child_id, kind] for child_id, kind in find_child_items(blocks)]
+        return [
+            self._save_chunk(entry, page_id, chunk.chunk_id, path, title, category, subcategory, chunk.text, chunk.tokens)
+            for chunk in chunk_blocks(blocks)
+        ]
+
+
+def find_child_items(blocks: List[dict]) -> List[tuple]:
+    """(id, jenis) halaman/database anak, termasuk yang ada di dalam blok bersarang (toggle, kolom, dll.)."""
+    items = []
+    for block in blocks:
+        if block.get("type") in PAGE_BLOCK_TYPES:
+            items.append((block["id"], PAGE_BLOCK_TYPES[block["type"]]))
+        elif block.get("_children"):
+            items.extend(find_child_items(block["_children"]))
+    return items
+
+
+def apply_changes(
+    vector_store,
+    previous_manifest: Dict[str, dict],
+    manifest: Dict[str, dict],
+    documents: List[tuple],
+    progress: Optional[dict] = None,
+):
+    """Terapkan hasil crawl ke vector store (tambah/hapus per ID) lalu simpan. CPU-bound."""
+    progress = progress if progress is not None else {}
+    previous_chunks = {cid: h for entry in previous_manifest.values() for cid, h in entry["chunks"].items()}
+
+    # Chunk baru/berubah yang perlu di-embed; hapus duplikat berdasarkan isi
+    seen_hashes = {
+        h for entry in manifest.values() for cid, h in entry["chunks"].items()
+        if vector_store is not None and previous_chunks.get(cid) == h
+    }
+    new_docs, new_ids = [], []
+    for page_id, chunk_id, chunk_hash, doc in documents:
+        if vector_store is not None and previous_chunks.get(chunk_id) == chunk_hash:
+            continue  # chunk sama persis di halaman yang berubah
+        if chunk_hash in seen_hashes:
+            del manifest[page_id]["chunks"][chunk_id]
+            continue
+        seen_hashes.add(chunk_hash)
+        new_docs.append(doc)
+        new_ids.append(chunk_id)
+
+    current_chunks = {cid: h for entry in manifest.values() for cid, h in entry["chunks"].items()}
+    print(f"\n[INFO] Proses selesai. Total dokumen unik: {len(current_chunks)}")
+    progress.update({"chunks_total": len(current_chunks), "chunks_to_embed": len(new_docs), "chunks_embedded": 0})
+    # Manifest dari versi sebelum chunking berbasis token tidak punya chunk_tokens -> tidak ikut dihitung
+    stats = chunk_size_stats([
+        entry["chunk_tokens"][cid] for entry in manifest.values()
+        for cid in entry["chunks"] if cid in entry.get("chunk_tokens", {})
+    ])
+    progress["chunk_stats"] = stats
+    print(f"[INFO] Statistik ukuran chunk (token): {stats}")
+
+    if not current_chunks:
+        return {"status": "warning", "message": "Tidak ada dokumen untuk di-embed."}
 
-        print(f"    -> Memproses {len(children)} blok anak di dalam '{current_title or item_id[:8]}'")
-
-        current_chunk_texts = []
-        for child in children:
-            child_id = child["id"]
-            child_type = child["type"]
-
-            # Jika ada child page/database
-            if child_type in ["child_database", "child_page"]:
-                save_chunk(new_path, current_title, category, subcategory, current_chunk_texts)
-                current_chunk_texts = []
-                process_item_recursively(child_id, new_path)
-                continue
-
-            # Ambil teks
-            text = get_text_from_block(child).strip()
-            if is_heading(child) and text:
-                save_chunk(new_path, current_title, category, subcategory, current_chunk_texts)
-                current_chunk_texts = [text]
-            elif text:
-                current_chunk_texts.append(text)
-
-            # Jika ada anak tambahan
-            if child.get("has_children"):
-                save_chunk(new_path, current_title, category, subcategory, current_chunk_texts)
-                current_chunk_texts = []
-                process_item_recursively(child_id, new_path)
-
-        # Simpan chunk terakhir
-        save_chunk(new_path, current_title, category, subcategory, current_chunk_texts)
-
-    except Exception:
-        pass
-
-
-def sync_notion_to_vector_store():
-    """Sinkronisasi Notion -> Vector Store FAISS."""
-    global all_documents, processed_ids
-    all_documents, processed_ids = [], set()
-
+    # Embedding dilakukan di tahap terpisah (batch + cache), FAISS hanya menerima vektor jadi
+    new_texts = [doc.page_content for doc in new_docs]
+    new_metadatas = [doc.metadata for doc in new_docs]
+
+    # Jenis index mengikuti ukuran korpus; hanya index flat yang bisa diubah per ID,
+    # index ANN (IVF/HNSW/PQ) dibangun ulang dari vektor (chunk lama diambil dari cache embedding)
+    index_type = choose_index_type(len(current_chunks))
+    deleted = 0
+    if vector_store is not None:
+        existing_ids = set(vector_store.index_to_docstore_id.values())
+        stale_ids = [cid for cid, h in previous_chunks.items() if current_chunks.get(cid) != h and cid in existing_ids]
+        incremental = index_type == "flat" and supports_incremental(vector_store.index)
+        if not stale_ids and not new_docs and index_type == index_type_of(vector_store.index):
+            return {
+                "status": "success",
+                "message": f"Tidak ada perubahan. {len(current_chunks)} dokumen tetap.",
+                "chunk_stats": stats,
+            }
+        deleted = len(stale_ids)
+
+        if not incremental:
+            stale = set(stale_ids)
+            kept = [
+                (doc_id, vector_store.docstore.search(doc_id))
+                for doc_id in vector_store.index_to_docstore_id.values() if doc_id not in stale
+            ]
+            new_ids = [doc_id for doc_id, _ in kept] + new_ids
+            new_texts = [doc.page_content for _, doc in kept] + new_texts
+            new_metadatas = [doc.metadata for _, doc in kept] + new_metadatas
+            progress["chunks_to_embed"] = len(new_texts)
+            vector_store = None
+    else:
+        incremental = False
+
+    build_seconds = None
+    if not incremental:
+        print(f"[INFO] Membuat vector store ({index_type}) dari {len(new_texts)} dokumen...")
+        vectors = embed_texts(new_texts, progress)
+        started = time.perf_counter()
+        vector_store = build_vector_store(new_texts, vectors, new_metadatas, new_ids, embedding_model, index_type)
+        build_seconds = time.perf_counter() - started
+    else:
+        print(f"[INFO] Menerapkan perubahan: {len(new_docs)} chunk baru/berubah, {len(stale_ids)} chunk dihapus...")
+        if stale_ids:
+            vector_store.delete(stale_ids)
+        if new_docs:
+            vectors = embed_texts(new_texts, progress)
+            vector_store.add_embeddings(list(zip(new_texts, vectors.tolist())), metadatas=new_metadatas, ids=new_ids)
+
+    report = index_report(vector_store.index, vectors if build_seconds is not None else None, build_seconds)
+    print(f"[INFO] Index vektor: {report}")
+    save_vector_store(vector_store, extra_files={MANIFEST_FILE: {"pages": manifest}, ANN_INDEX_FILE: report})
+    # Vektor chunk yang sudah tidak ada di store (diubah/dihapus, model lama) tidak akan dipakai lagi
+    prune_embedding_cache(
+        vector_store.docstore.search(doc_id).page_content for doc_id in vector_store.index_to_docstore_id.values()
+    )
+    return {
+        "status": "success",
+        "message": (
+            f"Berhasil sinkron {len(current_chunks)} dokumen "
+            f"({len(new_docs)} di-embed, {deleted} dihapus, index {report['type']})."
+        ),
+        "chunk_stats": stats,
+    }
+
+
+async def sync_notion_to_vector_store_async(full: bool = False, progress: Optional[dict] = None):
+    """
+    Sinkronisasi Notion -> Vector Store FAISS.
+    Default inkremental; full=True (atau belum ada manifest) membangun ulang seluruh index.
+    progress (opsional) diisi statistik crawl/embedding selama sync berjalan.
+    Pemanggil memegang embedding.sync_lock() (sync_jobs, sync_notion_to_vector_store).
+    """
     if not TOP_LEVEL_ID:
         return {"status": "error", "message": "NOTION_PAGE_ID tidak ditemukan di file .env"}
 
-    print("[INFO] Memulai sinkronisasi Notion...")
-    process_item_recursively(TOP_LEVEL_ID, path=[])
-
-    # Hapus duplikat
-    unique_docs = []
-    seen_content = set()
-    for doc in all_documents:
-        if doc.page_content not in seen_content:
-            unique_docs.append(doc)
-            seen_content.add(doc.page_content)
-
-    print(f"\n[INFO] Proses selesai. Total dokumen unik: {len(unique_docs)}")
+    # Store dibaca ulang dari disk (bukan store aktif) supaya query tetap memakai versi lama
+    vector_store = None if full else await asyncio.to_thread(load_vector_store)
+    previous_manifest = ((load_store_file(MANIFEST_FILE) or {}).get("pages", {})) if vector_store is not None else {}
+    if not previous_manifest:
+        vector_store = None
+    print(f"[INFO] Memulai sinkronisasi Notion ({'inkremental' if vector_store is not None else 'penuh'})...")
+
+    started = time.monotonic()
+    async with AsyncClient(auth=os.getenv("NOTION_API_KEY"), base_url=NOTION_BASE_URL) as client:
+        crawler = NotionCrawler(client, previous_manifest, stats=progress)
+        await crawler.crawl(TOP_LEVEL_ID)
+    print(f"[INFO] Crawl selesai dalam {time.monotonic() - started:.1f} detik: {crawler.stats}")
+
+    return await asyncio.to_thread(
+        apply_changes, vector_store, previous_manifest, crawler.manifest, crawler.documents, crawler.stats
+    )
 
-    if not unique_docs:
-        return {"status": "warning", "message": "Tidak ada dokumen untuk di-embed."}
 
-    print("[INFO] Membuat vector store dari dokumen...")
-    vector_store = FAISS.from_documents(unique_docs, embedding_model)
-    save_vector_store(vector_store)
-    return {"status": "success", "message": f"Berhasil sinkron {len(unique_docs)} dokumen."}
+def sync_notion_to_vector_store(full: bool = False):
+    """Versi sinkron untuk skrip/CLI; memegang kunci sync lintas proses selama sync berjalan."""
+    with sync_lock():
+        return asyncio.run(sync_notion_to_vector_store_async(full))
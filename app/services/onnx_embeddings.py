@@ -0,0 +1,83 @@
+# File: app/services/onnx_embeddings.py
+# Deskripsi: Backend embedding ONNX Runtime (opsional, EMBEDDING_BACKEND=onnx) untuk model yang
+#            sama (paraphrase-multilingual-mpnet-base-v2), diekspor & dikuantisasi int8 dinamis oleh
+#            scripts/export_onnx.py. Tidak memuat torch: cukup onnxruntime + tokenizers, sehingga
+#            latensi embedding query dan memori per worker jauh lebih kecil.
+#            Pooling = mean pooling atas attention mask, sama dengan konfigurasi sentence-transformers model ini.
+
+import os
+import json
+from typing import List
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "app/db/onnx_embedding")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model_int8.onnx")  # model_fp32.onnx = tanpa kuantisasi
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = default onnxruntime (semua core)
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+
+CONFIG_FILE = "onnx_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Embedding lewat onnxruntime; keluaran setara HuggingFaceEmbeddings (tanpa normalisasi)."""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, model_file: str = ONNX_MODEL_FILE, threads: int = ONNX_THREADS):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_BACKEND=onnx membutuhkan paket 'onnxruntime' dan 'tokenizers'."
+            ) from e
+
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Model ONNX tidak ditemukan di {model_path}. Jalankan: python scripts/export_onnx.py export"
+            )
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.model_file = model_file
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # Baris baru diganti spasi, sama seperti HuggingFaceEmbeddings
+        encodings = self.tokenizer.encode_batch([text.replace("\n", " ") for text in texts])
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]  # (batch, token, dim)
+
+        mask = attention_mask[..., None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Matriks float32 (len(texts), dim), diproses per ONNX_BATCH_SIZE teks."""
+        if not texts:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        return np.vstack([
+            self._encode(texts[start:start + ONNX_BATCH_SIZE]) for start in range(0, len(texts), ONNX_BATCH_SIZE)
+        ]).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].astype(np.float32).tolist()
@@ -0,0 +1,61 @@
+# File: app/services/rate_limit.py
+# Deskripsi: Token bucket untuk membatasi laju request (mis. Notion API ~3 request/detik,
+#            atau laju pertanyaan per session/IP di admission.py).
+
+import time
+import asyncio
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket async: acquire() menunggu sampai token tersedia.
+    pause() menahan semua request (mis. saat server membalas 429 dengan Retry-After).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        # Lock dipegang selama menunggu -> peminta dilayani berurutan (adil)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def try_acquire(self) -> float:
+        """Ambil satu token tanpa menunggu. 0 jika berhasil, selain itu detik sampai token berikutnya tersedia."""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def refund(self):
+        """Kembalikan satu token yang diambil untuk pekerjaan yang akhirnya tidak dijalankan."""
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float):
+        """Tahan semua request selama `seconds` detik dan kosongkan token."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0
+        self._updated_at = max(self._updated_at, self._blocked_until)
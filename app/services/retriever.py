@@ -1,68 +1,163 @@
 # File: app/services/retriever.py
+import os
+import logging
 from collections import Counter
-from .embedding import load_vector_store
+from typing import List, Optional
+import numpy as np
+import faiss
+from .embedding import get_vector_store, get_store_snapshot
+from .ann_index import restricted_search
+from .doc_store import documents_at
+from .context_packer import pack_context
+from .metrics import CONTEXT_TOKENS, annotate, span
+
+logger = logging.getLogger(__name__)
 
 K_NEIGHBORS = 8    # kandidat awal
 MAX_DOCS = 20      # batas dokumen final per retrieval
 
+# Hybrid search: peringkat vektor & BM25 digabung dengan reciprocal rank fusion (skor = sum 1 / (RRF_K + rank))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def _query_matrix(vector_store, query_vector: List[float]) -> np.ndarray:
+    """Vektor query dalam bentuk yang sama dengan vektor di index (normalisasi jika store memakainya)."""
+    query = np.asarray([query_vector], dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(query)
+    return query
+
+
+def _search_positions(vector_store, query: np.ndarray, k: int, positions: Optional[List[int]] = None):
+    """Cari k posisi terdekat; jika positions diisi, pencarian dibatasi ke posisi tersebut."""
+    with span("faiss_search"):
+        if positions is not None:
+            return restricted_search(vector_store.index, query, k, positions)
+        _, indices = vector_store.index.search(query, k)
+    return [int(i) for i in indices[0] if i != -1]
 
-def search_relevant_context(query: str) -> str:
+
+def _dominant_level(results):
+    """Level metadata paling spesifik yang muncul di hasil awal beserta nilai terbanyaknya."""
+    topics = [doc.metadata.get("topic") for doc in results if doc.metadata.get("topic")]
+    subcategories = [doc.metadata.get("subcategory") for doc in results if doc.metadata.get("subcategory")]
+    categories = [doc.metadata.get("category", "Uncategorized") for doc in results]
+
+    if topics:
+        return "topic", Counter(topics).most_common(1)[0][0]
+    if subcategories:
+        return "subcategory", Counter(subcategories).most_common(1)[0][0]
+    return "category", Counter(categories).most_common(1)[0][0]
+
+
+def probe_similarity(query_vector: List[float]) -> float:
+    """
+    Kemiripan kosinus tertinggi antara query_vector dan K_NEIGHBORS dokumen terdekat.
+    Dipakai untuk memutuskan apakah query mentah sudah cukup baik tanpa HyDE.
+    """
+    vector_store = get_vector_store()
+    if vector_store is None or vector_store.index.ntotal == 0:
+        return 0.0
+
+    query = _query_matrix(vector_store, query_vector)
+    positions = _search_positions(vector_store, query, K_NEIGHBORS)
+    if not positions:
+        return 0.0
+
+    doc_vectors = np.vstack([vector_store.index.reconstruct(i) for i in positions])
+    doc_norms = np.linalg.norm(doc_vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    doc_norms[doc_norms == 0] = 1.0
+    return float(np.max(doc_vectors @ query[0] / doc_norms))
+
+
+def lexical_confidence(question: str) -> float:
+    """Keyakinan kecocokan kata kunci pertanyaan di index BM25 (0..1, lihat BM25Index.confidence)."""
+    bm25_index = get_store_snapshot().bm25_index
+    if bm25_index is None or len(bm25_index) == 0:
+        return 0.0
+    with span("lexical_probe"):
+        return bm25_index.confidence(question)
+
+
+def _fuse(*rankings: List[int]) -> List[int]:
+    """Reciprocal rank fusion beberapa daftar posisi (masing-masing urut dari yang paling relevan)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            scores[position] = scores.get(position, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _hybrid_positions(snapshot, query: np.ndarray, keyword_query: Optional[str], k: int,
+                      positions: Optional[List[int]] = None) -> List[int]:
+    """k posisi teratas: hasil vektor, digabung (RRF) dengan hasil BM25 jika hybrid search aktif."""
+    vector_ranking = _search_positions(snapshot.store, query, k, positions)
+    if not (HYBRID_SEARCH and keyword_query and snapshot.bm25_index is not None):
+        return vector_ranking
+    with span("bm25_search"):
+        lexical_ranking = [position for position, _ in snapshot.bm25_index.search(keyword_query, k, positions)]
+    return _fuse(vector_ranking, lexical_ranking)[:k]
+
+
+def search_relevant_context(
+    query: str, query_vector: Optional[List[float]] = None, keyword_query: Optional[str] = None
+) -> str:
     """
     Cari dokumen relevan dengan fallback:
     1. Topic (paling spesifik)
     2. Subcategory
     3. Category
+
+    Query hanya di-embed sekali (atau tidak sama sekali jika query_vector sudah dihitung pemanggil).
+    Dokumen dalam level dominan diambil dari metadata index lalu diurutkan dengan vektor query yang sama.
+    Peringkat vektor digabung dengan peringkat BM25 atas keyword_query (default: query); saat query
+    berupa dokumen HyDE, keyword_query sebaiknya pertanyaan asli pengguna.
     """
-    vector_store = load_vector_store()
+    snapshot = get_store_snapshot()
+    vector_store = snapshot.store
     if vector_store is None:
-        print("WARNING: Vector store belum tersedia.")
+        logger.warning("Vector store belum tersedia.")
         return ""
 
-    print(f"INFO: Mencari {K_NEIGHBORS} konteks awal untuk query: '{query}'")
-    results = vector_store.similarity_search(query, k=K_NEIGHBORS)
+    logger.debug("Mencari %d konteks awal untuk query: '%s'", K_NEIGHBORS, query)
+    if query_vector is None:
+        with span("query_embedding"):
+            query_vector = vector_store.embedding_function.embed_query(query)
+    query_matrix = _query_matrix(vector_store, query_vector)
+    keyword_query = query if keyword_query is None else keyword_query
+    results = documents_at(vector_store, _hybrid_positions(snapshot, query_matrix, keyword_query, K_NEIGHBORS))
 
     if not results:
-        print("INFO: Tidak ada dokumen yang ditemukan.")
+        logger.debug("Tidak ada dokumen yang ditemukan.")
         return ""
 
-    # --- Step 1: Cari topic dominan ---
-    topics = [doc.metadata.get("topic") for doc in results if doc.metadata.get("topic")]
-    subcategories = [doc.metadata.get("subcategory") for doc in results if doc.metadata.get("subcategory")]
-    categories = [doc.metadata.get("category", "Uncategorized") for doc in results]
-
-    chosen_level = None
-    chosen_value = None
+    # --- Step 1 & 2: Level dominan dan dokumen dalam level tersebut (dari metadata index) ---
+    with span("metadata_filter"):
+        chosen_level, chosen_value = _dominant_level(results)
+        in_scope = snapshot.metadata_index.get(chosen_level, {}).get(chosen_value, [])
+    logger.debug("Level dominan = %s | Value = %s", chosen_level, chosen_value)
 
-    if topics:
-        top_topic, _ = Counter(topics).most_common(1)[0]
-        chosen_level, chosen_value = "topic", top_topic
-    elif subcategories:
-        top_subcat, _ = Counter(subcategories).most_common(1)[0]
-        chosen_level, chosen_value = "subcategory", top_subcat
+    if in_scope:
+        # Urutkan dengan vektor query yang sama (+ BM25), dibatasi ke dokumen dalam scope
+        final_positions = _hybrid_positions(
+            snapshot, query_matrix, keyword_query, min(MAX_DOCS, len(in_scope)), in_scope
+        )
+        final_docs = documents_at(vector_store, final_positions)
     else:
-        top_cat, _ = Counter(categories).most_common(1)[0]
-        chosen_level, chosen_value = "category", top_cat
-
-    print(f"INFO: Level dominan = {chosen_level} | Value = {chosen_value}")
-
-    # --- Step 2: Ambil semua dokumen dalam level dominan ---
-    all_in_scope = vector_store.similarity_search(chosen_value, k=MAX_DOCS * 2)
-    filtered = [
-        doc for doc in all_in_scope
-        if doc.metadata.get(chosen_level) == chosen_value
-    ]
-
-    # Batasi jumlah final
-    final_docs = filtered[:MAX_DOCS]
-
-    # --- Step 3: Format jadi konteks ---
-    context_parts = []
-    print("\nDEBUG: Hasil retrieval final:")
-    for doc in final_docs:
-        source = doc.metadata.get("source", "Tidak diketahui")
-        part = f"[path: {source}]\n{doc.page_content}"
-        context_parts.append(part)
-        print(f"- source: {source}")
-
-    print()
-    return "\n---\n".join(context_parts)
+        final_docs = [doc for doc in results if doc.metadata.get(chosen_level) == chosen_value][:MAX_DOCS]
+
+    # --- Step 3: Susun konteks dalam batas token (dedup, header path sekali per grup) ---
+    with span("context_packing"):
+        packed = pack_context(final_docs)
+    CONTEXT_TOKENS.observe(packed.raw_tokens, kind="raw")
+    CONTEXT_TOKENS.observe(packed.packed_tokens, kind="packed")
+    annotate(context_tokens=packed.packed_tokens, context_tokens_saved=packed.tokens_saved)
+    logger.debug("Hasil retrieval final: %s", [doc.metadata.get("source") for doc in final_docs])
+    logger.debug(
+        "Konteks: %d/%d chunk, %d duplikat, %d di luar budget, token %d -> %d (hemat %d)",
+        packed.chunks_used, packed.chunks_in, packed.duplicates, packed.over_budget,
+        packed.raw_tokens, packed.packed_tokens, packed.tokens_saved,
+    )
+
+    return packed.text
@@ -0,0 +1,245 @@
+# File: app/services/session_store.py
+# Deskripsi: Penyimpanan session chat yang bisa diganti backend-nya.
+#            Session berukuran tetap: ring buffer N pesan terakhir + dedup hash pesan
+#            + (opsional) ringkasan bergulir dari pesan yang sudah keluar dari jendela.
+#            - "memory": OrderedDict terurut menurut waktu aktif -> kedaluwarsa O(1) teramortisasi
+#              + batas jumlah session (LRU) agar memori tidak tumbuh tanpa batas.
+#            - "sqlite": tahan restart dan bisa dipakai bersama oleh beberapa worker uvicorn/dyno.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import List, Optional
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+
+load_dotenv()
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "app/db/sessions.sqlite")
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "50000"))
+SESSION_PURGE_INTERVAL_SECONDS = int(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "60"))
+SESSION_WINDOW_MESSAGES = int(os.getenv("SESSION_WINDOW_MESSAGES", "12"))  # isi ring buffer per session
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "0"))  # 0 = tanpa ringkasan bergulir
+SEEN_HASHES_PER_SESSION = SESSION_WINDOW_MESSAGES * 4
+
+
+def new_session(messages=(), seen=(), summary: str = "", last_active: Optional[float] = None) -> dict:
+    """
+    Struktur data satu session. Ukurannya tetap, tidak tumbuh dengan panjang percakapan:
+    - messages: ring buffer SESSION_WINDOW_MESSAGES pesan terakhir
+    - seen: hash pesan yang pernah dicatat (untuk membuang history duplikat dari client)
+    - summary: ringkasan pertanyaan lama yang sudah keluar dari ring buffer
+    """
+    return {
+        "messages": deque(messages, maxlen=SESSION_WINDOW_MESSAGES),
+        "seen": deque(seen, maxlen=SEEN_HASHES_PER_SESSION),
+        "summary": summary,
+        "last_active": last_active or time.time(),
+    }
+
+
+def copy_session(session: dict) -> dict:
+    """Salinan session (ring buffer & hash baru); pesan sendiri tidak pernah diubah, jadi tidak disalin."""
+    return new_session(session["messages"], session["seen"], session["summary"], session["last_active"])
+
+
+def message_hash(message: BaseMessage) -> str:
+    """Identitas pesan untuk dedup: hash peran + isi."""
+    role = "user" if isinstance(message, HumanMessage) else "assistant"
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True)
+    return hashlib.sha1(f"{role}\0{content}".encode("utf-8")).hexdigest()
+
+
+def history_fingerprint(summary: str, messages) -> str:
+    """
+    Sidik jari bagian session yang masuk prompt jawaban (ringkasan + jendela history).
+    String kosong jika keduanya kosong (pertanyaan pertama / tanpa konteks percakapan).
+    """
+    if not summary and not messages:
+        return ""
+    digest = hashlib.sha1(summary.encode("utf-8"))
+    for message in messages:
+        digest.update(b"\0" + message_hash(message).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _summarize_evicted(session: dict, message: BaseMessage):
+    """Ringkasan ekstraktif murah: pertanyaan pengguna yang keluar dari jendela, dipotong dari depan."""
+    if SESSION_SUMMARY_MAX_CHARS <= 0 or not isinstance(message, HumanMessage) or not isinstance(message.content, str):
+        return
+    summary = f"{session['summary']}\n- {message.content[:160]}".strip()
+    session["summary"] = summary[-SESSION_SUMMARY_MAX_CHARS:]
+
+
+def add_message(session: dict, message: BaseMessage, dedup: bool = False) -> bool:
+    """Tambahkan pesan ke ring buffer. Dengan dedup=True, pesan yang sudah pernah dicatat diabaikan."""
+    key = message_hash(message)
+    if dedup and key in session["seen"]:
+        return False
+    messages = session["messages"]
+    if len(messages) == messages.maxlen:
+        _summarize_evicted(session, messages[0])
+    messages.append(message)
+    session["seen"].append(key)
+    return True
+
+
+class SessionStore(ABC):
+    """Antarmuka penyimpanan session: session_id -> dict dari new_session()."""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        """Ambil session yang masih aktif (None jika tidak ada / sudah kedaluwarsa)."""
+
+    @abstractmethod
+    def save(self, session_id: str, session: dict):
+        """Simpan session dan tandai sebagai aktif sekarang."""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Hapus session tertentu."""
+
+    @abstractmethod
+    def purge_expired(self):
+        """Buang session yang idle lebih lama dari ttl_seconds."""
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Session di memori proses. OrderedDict selalu terurut menurut last_active (save memindahkan
+    session ke ujung), sehingga purge cukup membuang dari depan sampai menemukan session aktif.
+    get/save bekerja dengan salinan (seperti backend SQLite): session yang sedang diubah request di
+    event loop tidak pernah sama dengan yang dibaca thread lain (deque mutated during iteration).
+    """
+
+    def __init__(self, ttl_seconds: int, max_sessions: int = SESSION_MAX_COUNT):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session["last_active"] + self.ttl_seconds < time.time():
+                del self._sessions[session_id]
+                return None
+            return copy_session(session)
+
+    def save(self, session_id: str, session: dict):
+        session["last_active"] = time.time()
+        session = copy_session(session)
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            # Batas memori: buang session yang paling lama tidak aktif
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if oldest["last_active"] >= cutoff:
+                    break
+                self._sessions.popitem(last=False)
+
+
+def _serialize_session(session: dict) -> str:
+    return json.dumps(
+        {
+            "messages": [
+                {"role": "user" if isinstance(m, HumanMessage) else "assistant", "content": m.content}
+                for m in session["messages"]
+            ],
+            "seen": list(session["seen"]),
+            "summary": session["summary"],
+        },
+        ensure_ascii=False,
+    )
+
+
+def _deserialize_session(raw: str, last_active: float) -> dict:
+    data = json.loads(raw)
+    messages: List[BaseMessage] = [
+        HumanMessage(content=m["content"]) if m["role"] == "user" else AIMessage(content=m["content"])
+        for m in data["messages"]
+    ]
+    return new_session(messages, data.get("seen", ()), data.get("summary", ""), last_active)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session di SQLite (mode WAL) sehingga tahan restart dan bisa dibaca bersama oleh beberapa proses.
+    Kedaluwarsa memakai index last_active dan dijalankan paling sering tiap SESSION_PURGE_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: int, path: str = SESSION_DB_PATH):
+        super().__init__(ttl_seconds)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_active REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active)")
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, last_active FROM sessions WHERE session_id = ? AND last_active >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            return None
+        return _deserialize_session(row[0], row[1])
+
+    def save(self, session_id: str, session: dict):
+        session["last_active"] = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, data, last_active) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, last_active = excluded.last_active",
+                (session_id, _serialize_session(session), session["last_active"]),
+            )
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < SESSION_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE last_active < ?", (now - self.ttl_seconds,))
+
+
+def create_session_store(ttl_seconds: int) -> SessionStore:
+    """Buat session store sesuai SESSION_BACKEND ("memory" atau "sqlite")."""
+    if SESSION_BACKEND == "sqlite":
+        print(f"INFO: Session disimpan di SQLite ({SESSION_DB_PATH}).")
+        return SQLiteSessionStore(ttl_seconds)
+    if SESSION_BACKEND == "memory":
+        return InMemorySessionStore(ttl_seconds)
+    raise ValueError("SESSION_BACKEND tidak valid. Pilih 'memory' atau 'sqlite'.")
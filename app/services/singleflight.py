@@ -0,0 +1,128 @@
+# File: app/services/singleflight.py
+# Deskripsi: Penggabungan request identik yang sedang berjalan (single-flight).
+#            Request dengan kunci sama (pertanyaan ternormalisasi + sidik jari history yang masuk
+#            prompt) selama pipeline pertama masih berjalan tidak menjalankan pipeline sendiri:
+#            mereka berlangganan ke eksekusi yang sama dan menerima token yang sudah diproduksi
+#            (replay) lalu token berikutnya secara langsung. Pipeline berjalan sebagai task tersendiri,
+#            jadi tetap selesai untuk pelanggan lain jika pemanggil pertama terputus; task dibatalkan
+#            hanya jika semua pelanggan sudah pergi. Hanya berlaku dalam satu proses/worker.
+
+import os
+import re
+import asyncio
+import hashlib
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+from .metrics import Counter
+
+load_dotenv()
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") == "1"
+
+SINGLEFLIGHT_REQUESTS = Counter(
+    "chatbot_singleflight_requests_total", "Request jawaban menurut perannya di single-flight.", ("role",)
+)
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Huruf kecil, spasi dirapikan, tanda baca di akhir dibuang ('Cara login?' == 'cara  login')."""
+    return _TRAILING_PUNCTUATION.sub("", " ".join(question.lower().split()))
+
+
+def flight_key(question: str, context_parts: Iterable[str]) -> str:
+    """Kunci single-flight: pertanyaan ternormalisasi + semua teks lain yang ikut menentukan prompt."""
+    digest = hashlib.sha1(normalize_question(question).encode("utf-8"))
+    for part in context_parts:
+        digest.update(b"\0" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Flight:
+    """Satu eksekusi pipeline bersama: buffer token + hasil akhir, dibagikan ke semua pelanggan."""
+
+    def __init__(self):
+        self.tokens = []
+        self.result: dict = {}  # diisi pipeline (mis. outcome, answer, record)
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False  # semua pelanggan pergi sebelum selesai -> task dibatalkan, tidak bisa diikuti
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def _notify(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def _run(self, producer: Callable[[dict], AsyncIterator[str]]):
+        try:
+            async for token in producer(self.result):
+                self.tokens.append(token)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Semua token dari awal (replay), lalu token baru saat diproduksi."""
+        self.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(self.tokens):
+                    yield self.tokens[position]
+                    position += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._wakeup.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                # Tidak ada lagi yang menunggu jawaban ini -> hentikan panggilan LLM
+                self.abandoned = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+
+    def join(self, key: str, producer: Callable[[dict], AsyncIterator[str]]):
+        """
+        Kembalikan (flight, leader). leader=True jika flight baru dibuat untuk kunci ini;
+        producer(result) hanya dipanggil oleh flight baru.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done and not flight.abandoned:
+            SINGLEFLIGHT_REQUESTS.inc(role="follower")
+            return flight, False
+
+        flight = Flight()
+        self._flights[key] = flight
+        SINGLEFLIGHT_REQUESTS.inc(role="leader")
+
+        async def run():
+            try:
+                await flight._run(producer)
+            finally:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        flight.task = asyncio.get_running_loop().create_task(run())
+        return flight, True
+
+    def inflight(self) -> int:
+        return len(self._flights)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,116 @@
+# File: app/services/sync_jobs.py
+# Deskripsi: Menjalankan sinkronisasi Notion sebagai job latar belakang.
+#            - Hanya satu sync berjalan pada satu waktu (thread + event loop sendiri, tidak
+#              mengganggu event loop server). Antar proses (worker lain, scripts/sync_notion.py)
+#              dijaga kunci file embedding.sync_lock().
+#            - Trigger saat sync berjalan digabung menjadi satu job antrean berikutnya.
+#            - Progres (halaman, chunk, waktu) bisa dipantau lewat job_id.
+
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from . import notion_sync
+from .embedding import sync_lock
+
+MAX_JOB_HISTORY = 20  # jumlah job terakhir yang statusnya masih bisa ditanyakan
+
+
+class SyncJob:
+    """Status satu kali sinkronisasi."""
+
+    def __init__(self, full: bool = False):
+        self.id = uuid.uuid4().hex
+        self.full = full
+        self.status = "queued"  # queued -> running -> success | warning | error
+        self.message = "Menunggu giliran sinkronisasi."
+        self.progress: Dict[str, object] = {}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ("queued", "running")
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "message": self.message,
+            "progress": dict(self.progress),
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+        }
+
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+_running: Optional[SyncJob] = None
+_queued: Optional[SyncJob] = None
+
+
+def _remember(job: SyncJob):
+    _jobs[job.id] = job
+    while len(_jobs) > MAX_JOB_HISTORY:
+        _jobs.popitem(last=False)
+
+
+def _run(job: SyncJob):
+    """Isi thread job: jalankan sync, lalu mulai job antrean jika ada."""
+    global _running, _queued
+    while job is not None:
+        job.status = "running"
+        job.message = "Sinkronisasi sedang berjalan."
+        job.started_at = time.time()
+        try:
+            def waiting():
+                job.message = "Menunggu sinkronisasi di proses lain selesai."
+
+            with sync_lock(on_wait=waiting):
+                job.message = "Sinkronisasi sedang berjalan."
+                result = asyncio.run(notion_sync.sync_notion_to_vector_store_async(full=job.full, progress=job.progress))
+            job.status, job.message = result["status"], result["message"]
+        except Exception as e:
+            print(f"ERROR saat sinkronisasi Notion (job {job.id[:8]}): {e}")
+            job.status, job.message = "error", "Gagal melakukan sinkronisasi data."
+        job.finished_at = time.time()
+
+        with _lock:
+            job, _queued = _queued, None
+            _running = job
+
+
+def start_sync(full: bool = False) -> Tuple[SyncJob, bool]:
+    """
+    Mulai sync di latar belakang. Mengembalikan (job, coalesced).
+    Jika sync sedang berjalan, trigger dijadikan satu job antrean (atau digabung ke antrean yang ada).
+    """
+    global _running, _queued
+    with _lock:
+        if _running is not None:
+            if _queued is not None:
+                _queued.full = _queued.full or full
+                return _queued, True
+            _queued = SyncJob(full)
+            _remember(_queued)
+            return _queued, True
+
+        _running = SyncJob(full)
+        _remember(_running)
+        job = _running
+
+    threading.Thread(target=_run, args=(job,), name=f"notion-sync-{job.id[:8]}", daemon=True).start()
+    return job, False
+
+
+def get_job(job_id: str) -> Optional[SyncJob]:
+    return _jobs.get(job_id)
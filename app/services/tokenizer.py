@@ -0,0 +1,39 @@
+# File: app/services/tokenizer.py
+# Deskripsi: Hitung token teks dengan tiktoken (encoding diatur TOKENIZER_ENCODING).
+#            Jika tiktoken tidak terpasang atau encoding tidak bisa dimuat (mis. server tanpa
+#            akses internet), dipakai perkiraan ~4 karakter per token.
+
+import os
+import logging
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+CHARS_PER_TOKEN_FALLBACK = 4
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Encoding tiktoken (dimuat sekali), atau None jika tidak tersedia."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken tidak tersedia (%s), jumlah token diperkirakan dari panjang teks.", e)
+        return None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Jumlah token dalam teks."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN_FALLBACK)
+    return len(encoding.encode(text, disallowed_special=()))
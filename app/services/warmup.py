@@ -0,0 +1,118 @@
+# File: app/services/warmup.py
+# Deskripsi: Warmup & readiness. Impor aplikasi sengaja ringan (model embedding, vector store,
+#            SDK & klien LLM dimuat lazy), jadi worker bisa langsung menjawab "/" lalu memanaskan
+#            diri di latar belakang. /ready baru 200 setelah semua tahap warmup selesai.
+#            WARMUP_MODE: "background" (default), "blocking" (startup menunggu warmup), "off".
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from . import embedding, llm_providers
+from .concurrency import run_blocking
+from .llm_router import router
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+
+class WarmupState:
+    """Status warmup proses ini: idle -> running -> ready | error, plus durasi tiap tahap."""
+
+    def __init__(self):
+        self.status = "idle"
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+        return {
+            "status": self.status,
+            "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()},
+            "elapsed_seconds": elapsed,
+            "error": self.error,
+        }
+
+
+state = WarmupState()
+_lock = threading.Lock()
+_task: Optional[asyncio.Task] = None
+
+
+def _timed(name: str, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    state.steps[name] = time.perf_counter() - started
+    return result
+
+
+def preload(inference: bool = True):
+    """
+    Tahap warmup yang blocking (dijalankan di thread, atau langsung di proses induk sebelum fork).
+    inference=False hanya memuat bobot/berkas tanpa menjalankan model, supaya aman sebelum fork.
+    """
+    with _lock:
+        _timed("embedding_model", embedding.get_embedding_model)
+        _timed("vector_store", embedding.get_vector_store)
+        for provider in router.providers:
+            # Di luar event loop: impor SDK, klien HTTP sync bersama, dan impor lazy di dalam SDK
+            _timed(f"llm_sdk_{provider}", llm_providers.get_llm, "answer", provider)
+        if inference:
+            # Inference pertama menginisialisasi thread pool torch & cache tokenizer
+            _timed("embedding_inference", embedding.embedding_model.embed_query, "warmup")
+            from .llm_generator import PIPELINE_MODE
+            if PIPELINE_MODE == "fast":
+                from .intent_classifier import _load_exemplars
+                _timed("intent_exemplars", _load_exemplars)
+
+
+async def _run():
+    state.status, state.error = "running", None
+    state.started_at, state.finished_at = time.time(), None
+    try:
+        await run_blocking(preload)
+        # Klien async LLM terikat ke event loop, jadi dibuat di loop server (SDK sudah diimpor di thread)
+        started = time.perf_counter()
+        for provider in router.providers:
+            for stage in llm_providers.LLM_STAGES:
+                llm_providers.get_llm(stage, provider)
+        state.steps["llm_clients"] = time.perf_counter() - started
+        state.status = "ready"
+        logger.info("Warmup selesai: %s", state.to_dict())
+    except Exception as e:
+        state.status, state.error = "error", str(e)
+        logger.exception("Warmup gagal")
+    finally:
+        state.finished_at = time.time()
+
+
+async def warmup() -> dict:
+    """Jalankan warmup (sekali; pemanggil bersamaan menunggu task yang sama). Mengembalikan status."""
+    global _task
+    if state.status != "ready" and (_task is None or _task.done()):
+        _task = asyncio.get_running_loop().create_task(_run())
+    if _task is not None:
+        await asyncio.shield(_task)
+    return state.to_dict()
+
+
+def start_background_warmup():
+    """Mulai warmup tanpa menunggu (dipanggil dari event startup)."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+def is_ready() -> bool:
+    return state.status == "ready"
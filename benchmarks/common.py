@@ -0,0 +1,134 @@
+# File: benchmarks/common.py
+# Deskripsi: Utilitas bersama benchmark: direktori kerja sementara (agar vector store, cache
+#            embedding, dan session benchmark tidak menimpa data asli di app/db), statistik
+#            latensi, dan penulisan hasil ke JSON yang bisa dibandingkan antar run.
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import subprocess
+import contextlib
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Agar `app` bisa diimpor meskipun direktori kerja dipindah ke folder sementara
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def enter_workdir(prefix: str = "chatbot-bench-") -> str:
+    """
+    Pindah ke direktori kerja sementara berisi struktur app/ minimal. Semua path relatif aplikasi
+    (app/db/..., app/static, app/templates) lalu menunjuk ke sana. Panggil SEBELUM mengimpor `app`.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.makedirs(os.path.join(workdir, "app", "db"))
+    os.makedirs(os.path.join(workdir, "app", "static"))
+    os.symlink(os.path.join(REPO_ROOT, "app", "templates"), os.path.join(workdir, "app", "templates"))
+    os.chdir(workdir)
+    return workdir
+
+
+def bench_environment(**overrides):
+    """
+    Set variabel lingkungan benchmark SEBELUM mengimpor `app` (load_dotenv tidak menimpa nilai
+    yang sudah ada, jadi kunci asli di .env tidak akan dipakai untuk LLM/Notion).
+    """
+    env = {
+        "LLM_PROVIDER": "qwen_api",
+        "LLM_PROVIDERS": "qwen_api",
+        "QWEN_API_KEY": "benchmark",
+        "QWEN_API_MODEL": "benchmark",
+        "NOTION_PAGE_ID": "root",
+        "NOTION_API_KEY": "benchmark",
+        "SESSION_BACKEND": "memory",
+        "LOG_LEVEL": "WARNING",
+    }
+    env.update({key: str(value) for key, value in overrides.items()})
+    os.environ.update(env)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Ringkasan latensi (detik -> milidetik)."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def time_calls(func, repeat: int, warmup: int = 3) -> List[float]:
+    """Jalankan func() berulang dan kembalikan durasi tiap panggilan (detik)."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Redam print() aplikasi (mis. log per halaman saat sync) supaya tidak ikut terukur."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def write_results(name: str, params: dict, results: list, output: Optional[str] = None) -> str:
+    """Simpan hasil sebagai benchmarks/results/<name>-<waktu>.json (atau path `output`)."""
+    payload = {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Hasil benchmark disimpan di {output}")
+    return output
+
+
+def parse_sizes(value: str) -> List[int]:
+    """'1k,10k,100k' -> [1000, 10000, 100000]"""
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if part:
+            sizes.append(int(float(part[:-1]) * 1000) if part.endswith("k") else int(part))
+    return sizes
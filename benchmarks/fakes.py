@@ -0,0 +1,300 @@
+# File: benchmarks/fakes.py
+# Deskripsi: Pengganti deterministik untuk dependensi eksternal saat benchmark:
+#            - FakeEmbeddings: bag-of-words ber-hash (tanpa torch / model HuggingFace)
+#            - FakeChatModel: LLM palsu dengan latensi (dan jitter ber-seed) yang bisa diatur
+#            - Workspace Notion sintetis berisi N chunk + server Notion API palsu (FastAPI)
+
+import math
+import time
+import zlib
+import random
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+EMBEDDING_DIM = 768
+
+WORDS = (
+    "akun pengguna login password laporan toko stok barang transaksi kasir harga diskon promo "
+    "gudang pengiriman faktur pajak karyawan absensi jadwal shift menu pengaturan printer struk "
+    "pelanggan member poin retur pembayaran transfer tunai kartu saldo rekap harian bulanan "
+    "cabang outlet supplier pembelian penjualan kategori produk varian satuan ekspor impor data"
+).split()
+
+
+# ---------------- Embedding ----------------
+class FakeEmbeddings(Embeddings):
+    """Embedding deterministik: tiap kata di-hash (crc32) ke satu dimensi, lalu dinormalisasi."""
+
+    def __init__(self, model_name: Optional[str] = None, **kwargs):
+        self.model_name = model_name
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode("utf-8")) % EMBEDDING_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def install_fake_embeddings():
+    """Ganti HuggingFaceEmbeddings sebelum app.services.embedding diimpor."""
+    import langchain_community.embeddings
+
+    langchain_community.embeddings.HuggingFaceEmbeddings = FakeEmbeddings
+
+
+# ---------------- LLM ----------------
+class FakeChatModel(BaseChatModel):
+    """
+    LLM palsu. Jawaban ditentukan dari isi prompt (klasifikasi -> 'pertanyaan_spesifik',
+    HyDE -> paragraf, selain itu jawaban tetap), latensi = latency (+ jitter) sampai token
+    pertama dan token_delay per token berikutnya.
+    """
+
+    latency: float = 0.2
+    token_delay: float = 0.0
+    jitter: float = 0.0  # simpangan relatif (lognormal), 0 = latensi tetap
+    seed: int = 0
+    answer_tokens: int = 40
+    rng: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _next_latency(self) -> float:
+        if not self.jitter:
+            return self.latency
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        return self.latency * self.rng.lognormvariate(0, self.jitter)
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = " ".join(m.content for m in messages if isinstance(m.content, str))
+        if "Klasifikasikan input pengguna" in prompt:
+            return "pertanyaan_spesifik"
+        if "Tulis paragraf jawaban ideal" in prompt:
+            return "Untuk membuat laporan toko buka menu laporan lalu pilih periode dan cabang."
+        return " ".join(WORDS[i % len(WORDS)] for i in range(self.answer_tokens))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = self._reply(messages)
+        time.sleep(self._next_latency() + self.token_delay * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = self._reply(messages)
+        await asyncio.sleep(self._next_latency() + self.token_delay * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._next_latency())
+        for i, word in enumerate(self._reply(messages).split()):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+def install_fake_llm(latency: float, token_delay: float = 0.0, jitter: float = 0.0, seed: int = 0):
+    """Semua penyedia/tahap di registry LLM memakai FakeChatModel (registry & router tetap dipakai)."""
+    from app.services import llm_providers
+
+    def build(provider: str, stage: str, registry: dict):
+        return FakeChatModel(latency=latency, token_delay=token_delay, jitter=jitter, seed=seed)
+
+    llm_providers._build_llm = build
+
+
+# ---------------- Workspace Notion sintetis ----------------
+EDITED_TIME = "2024-01-01T00:00:00.000Z"
+
+
+class SyntheticWorkspace:
+    """
+    Pohon halaman: root -> kategori -> subkategori -> halaman daun. Tiap halaman daun berisi
+    `sections_per_page` bagian (heading + 2 paragraf) = satu chunk per bagian. Isi dibangkitkan
+    dari seed + id halaman, jadi tidak perlu disimpan di memori.
+    """
+
+    def __init__(self, n_chunks: int, sections_per_page: int = 10, categories: int = 10, seed: int = 0):
+        self.sections_per_page = sections_per_page
+        self.categories = categories
+        self.subcategories = categories
+        leaves = max(1, math.ceil(n_chunks / sections_per_page))
+        self.leaves_per_sub = max(1, math.ceil(leaves / (self.categories * self.subcategories)))
+        self.seed = seed
+        self.revisions: Dict[str, int] = {}  # halaman yang diubah setelah sync pertama
+        self.failing = set()  # id blok yang daftar anaknya dibalas 500 oleh server palsu (uji jalur gagal)
+
+    @property
+    def n_chunks(self) -> int:
+        return self.categories * self.subcategories * self.leaves_per_sub * self.sections_per_page
+
+    def leaf_ids(self) -> List[str]:
+        return [
+            f"page-{c}-{s}-{p}"
+            for c in range(self.categories)
+            for s in range(self.subcategories)
+            for p in range(self.leaves_per_sub)
+        ]
+
+    def touch(self, fraction: float) -> int:
+        """Ubah isi sebagian halaman daun (untuk mengukur sync inkremental). Mengembalikan jumlah halaman."""
+        leaves = self.leaf_ids()
+        rng = random.Random(self.seed + len(self.revisions) + 1)
+        changed = rng.sample(leaves, max(1, int(len(leaves) * fraction)))
+        for page_id in changed:
+            self.revisions[page_id] = self.revisions.get(page_id, 0) + 1
+        return len(changed)
+
+    def title(self, page_id: str) -> str:
+        parts = page_id.split("-")[1:]
+        if page_id == "root":
+            return "Panduan"
+        return {1: "Kategori", 2: "Subkategori", 3: "Halaman"}[len(parts)] + " " + ".".join(parts)
+
+    def edited_time(self, page_id: str) -> str:
+        revision = self.revisions.get(page_id, 0)
+        return EDITED_TIME if not revision else f"2024-01-{1 + revision:02d}T00:00:00.000Z"
+
+    def page(self, page_id: str) -> dict:
+        return {
+            "object": "page",
+            "id": page_id,
+            "last_edited_time": self.edited_time(page_id),
+            "properties": {"title": {"type": "title", "title": [{"plain_text": self.title(page_id)}]}},
+        }
+
+    def children(self, block_id: str) -> List[dict]:
+        if block_id == "root":
+            return [_child_page(f"cat-{c}") for c in range(self.categories)]
+        kind, *parts = block_id.split("-")
+        if kind == "cat":
+            return [_child_page(f"sub-{parts[0]}-{s}") for s in range(self.subcategories)]
+        if kind == "sub":
+            return [_child_page(f"page-{parts[0]}-{parts[1]}-{p}") for p in range(self.leaves_per_sub)]
+        if kind == "page":
+            rng = random.Random(f"{self.seed}:{block_id}:{self.revisions.get(block_id, 0)}")
+            blocks = []
+            for i in range(self.sections_per_page):
+                blocks.append(_text_block(f"{block_id}-h{i}", "heading_2", " ".join(rng.choices(WORDS, k=4))))
+                for j in range(2):
+                    blocks.append(_text_block(f"{block_id}-p{i}-{j}", "paragraph", " ".join(rng.choices(WORDS, k=40))))
+            return blocks
+        return []
+
+
+def synthetic_documents(workspace: SyntheticWorkspace):
+    """Chunk yang sama dengan hasil sync workspace, dibangun langsung tanpa server (untuk benchmark retrieval)."""
+    from langchain_core.documents import Document
+
+    for page_id in workspace.leaf_ids():
+        _, c, s, p = page_id.split("-")
+        path = [workspace.title("root"), workspace.title(f"cat-{c}"), workspace.title(f"sub-{c}-{s}"), workspace.title(page_id)]
+        blocks = workspace.children(page_id)
+        for i in range(0, len(blocks), 3):
+            texts = [block[block["type"]]["rich_text"][0]["plain_text"] for block in blocks[i:i + 3]]
+            joined_path = " > ".join(path)
+            yield f"{page_id}:{blocks[i]['id']}", Document(
+                page_content=f"Path: {joined_path}\n\n" + "\n".join(texts),
+                metadata={"source": joined_path, "title": path[-1], "category": path[0], "subcategory": path[1]},
+            )
+
+
+def _child_page(page_id: str) -> dict:
+    return {"object": "block", "id": page_id, "type": "child_page", "has_children": True, "child_page": {}}
+
+
+def _text_block(block_id: str, block_type: str, text: str) -> dict:
+    return {
+        "object": "block",
+        "id": block_id,
+        "type": block_type,
+        "has_children": False,
+        block_type: {"rich_text": [{"plain_text": text}]},
+    }
+
+
+def make_notion_app(workspace: SyntheticWorkspace, page_size: int = 100, latency: float = 0.0):
+    """Server Notion API palsu (subset endpoint yang dipakai crawler) dengan paginasi."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI()
+    app.state.requests = 0
+
+    def not_found():
+        return JSONResponse(
+            {"object": "error", "status": 404, "code": "object_not_found", "message": "not found"}, status_code=404
+        )
+
+    @app.get("/v1/pages/{page_id}")
+    async def retrieve_page(page_id: str):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if page_id != "root" and page_id.split("-")[0] not in ("cat", "sub", "page"):
+            return not_found()
+        return workspace.page(page_id)
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def list_children(block_id: str, request: Request):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if block_id in workspace.failing:
+            return JSONResponse(
+                {"object": "error", "status": 500, "code": "internal_server_error", "message": "gagal"},
+                status_code=500,
+            )
+        blocks = workspace.children(block_id)
+        start = int(request.query_params.get("start_cursor") or 0)
+        end = start + page_size
+        return {
+            "object": "list",
+            "results": blocks[start:end],
+            "has_more": end < len(blocks),
+            "next_cursor": str(end) if end < len(blocks) else None,
+        }
+
+    @app.post("/v1/databases/{database_id}/query")
+    async def query_database(database_id: str):
+        app.state.requests += 1
+        return not_found()
+
+    return app
+
+
+class BackgroundServer:
+    """Jalankan aplikasi ASGI dengan uvicorn di thread terpisah (127.0.0.1, port bebas)."""
+
+    def __init__(self, app, port: int = 0):
+        import uvicorn
+
+        self.config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
@@ -0,0 +1,144 @@
+# File: benchmarks/load_ask.py
+# Deskripsi: Load generator untuk /api/ask (atau /api/ask/stream). Secara default menjalankan
+#            aplikasi di proses ini (uvicorn, thread terpisah) dengan LLM palsu berlatensi tetap
+#            dan vector store sintetis, lalu mengukur throughput dan p50/p95/p99 pada beberapa
+#            tingkat konkurensi. Dengan --url, server yang sudah berjalan yang diuji.
+#
+# Pemakaian (dari root repo):
+#   python -m benchmarks.load_ask --concurrency 1,8,32,64 --requests 200 --llm-latency 0.2
+#   python -m benchmarks.load_ask --stream --chunks 10k
+#   python -m benchmarks.load_ask --url http://127.0.0.1:8000 --concurrency 4
+
+import time
+import random
+import asyncio
+import argparse
+import contextlib
+from typing import List, Optional
+
+import httpx
+
+from .common import enter_workdir, bench_environment, percentiles, write_results, parse_sizes
+from . import fakes
+
+
+def make_questions(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [f"bagaimana cara {' '.join(rng.choices(fakes.WORDS, k=6))}?" for _ in range(count)]
+
+
+async def _ask(client: httpx.AsyncClient, question: str, session_id: str, stream: bool) -> dict:
+    """Satu request; untuk stream juga dicatat waktu sampai event token pertama."""
+    start = time.perf_counter()
+    body = {"question": question, "session_id": session_id, "history": []}
+    if not stream:
+        response = await client.post("/api/ask", json=body)
+        return {"ok": response.status_code == 200, "status": response.status_code,
+                "seconds": time.perf_counter() - start, "first_token": None}
+
+    first_token: Optional[float] = None
+    ok = False
+    async with client.stream("POST", "/api/ask/stream", json=body) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                if event == "done":
+                    ok = True
+        status = response.status_code
+    return {"ok": ok and status == 200, "status": status, "seconds": time.perf_counter() - start,
+            "first_token": first_token}
+
+
+async def run_level(base_url: str, concurrency: int, total: int, questions: List[str], stream: bool) -> dict:
+    """Kirim `total` request dengan `concurrency` pekerja paralel."""
+    outcomes = []
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker(worker_id: int):
+            for i in counter:
+                try:
+                    outcomes.append(await _ask(client, questions[i % len(questions)], f"bench-{worker_id}", stream))
+                except httpx.HTTPError as e:
+                    outcomes.append({"ok": False, "status": type(e).__name__, "seconds": 0.0, "first_token": None})
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(w) for w in range(concurrency)])
+        wall = time.perf_counter() - start
+
+    succeeded = [o for o in outcomes if o["ok"]]
+    rejected = sum(1 for o in outcomes if o["status"] in (429, 503))
+    result = {
+        "concurrency": concurrency,
+        "requests": len(outcomes),
+        "errors": len(outcomes) - len(succeeded) - rejected,
+        "rejected": rejected,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(succeeded) / wall, 2) if wall else 0.0,
+        "latency": percentiles([o["seconds"] for o in succeeded]),
+    }
+    if stream:
+        result["time_to_first_token"] = percentiles([o["first_token"] for o in succeeded if o["first_token"]])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/ask dengan LLM & Notion palsu.")
+    parser.add_argument("--url", default=None, help="Uji server yang sudah berjalan (tanpa fake in-process)")
+    parser.add_argument("--concurrency", default="1,8,32,64", help="Tingkat konkurensi, mis. 1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="Jumlah request per tingkat konkurensi")
+    parser.add_argument("--chunks", default="10k", help="Ukuran vector store sintetis")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Latensi LLM palsu sampai token pertama")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Jeda per token LLM palsu")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Simpangan lognormal latensi LLM (0 = tetap)")
+    parser.add_argument("--answer-cache", action="store_true", help="Aktifkan cache jawaban semantik")
+    parser.add_argument("--pipeline-mode", default="standard", choices=["standard", "fast"])
+    parser.add_argument("--stream", action="store_true", help="Uji /api/ask/stream (SSE) dan catat TTFT")
+    parser.add_argument("--admission", action="store_true",
+                        help="Aktifkan admission control (rate limit + antrean); default mati agar yang diukur pipeline")
+    parser.add_argument("--questions", type=int, default=1000, help="Jumlah pertanyaan berbeda")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions, args.seed)
+    levels = parse_sizes(args.concurrency)
+
+    server = contextlib.nullcontext(args.url)
+    if args.url is None:
+        enter_workdir()
+        bench_environment(
+            ANSWER_CACHE_ENABLED="1" if args.answer_cache else "0",
+            PIPELINE_MODE=args.pipeline_mode,
+            ADMISSION_ENABLED="1" if args.admission else "0",
+            LLM_MAX_CONCURRENCY=max(levels) * 2,
+        )
+        fakes.install_fake_embeddings()
+        fakes.install_fake_llm(args.llm_latency, args.token_delay, args.jitter, args.seed)
+        from .micro import build_store
+        from app.main import app
+
+        build_store(parse_sizes(args.chunks)[0], args.seed)
+        server = fakes.BackgroundServer(app)
+
+    results = []
+    with server as base_url:
+        for concurrency in levels:
+            result = asyncio.run(run_level(base_url, concurrency, args.requests, questions, args.stream))
+            results.append(result)
+            print(
+                f"[INFO] konkurensi {concurrency}: {result['throughput_rps']} req/detik, "
+                f"p50 {result['latency'].get('p50_ms')} ms, p99 {result['latency'].get('p99_ms')} ms, "
+                f"error {result['errors']}, ditolak {result['rejected']}"
+            )
+
+    write_results("load_ask", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# File: benchmarks/micro.py
+# Deskripsi: Microbenchmark jalur panas pada beberapa ukuran korpus (default 1k/10k/100k chunk):
+#            - search_relevant_context (dengan vektor query jadi dan dengan embedding query)
+#              dan probe keyakinan leksikal BM25 (penentu HyDE dilewati)
+#            - normalize_history (panjang history = ukuran yang sama)
+#            - sync_notion_to_vector_store terhadap server Notion palsu: sync penuh (cache embedding
+#              dingin), sync inkremental tanpa perubahan, dan setelah 1% halaman diubah
+#
+# Pemakaian (dari root repo):
+#   python -m benchmarks.micro --sizes 1k,10k --benchmarks search,history,sync
+#   python -m benchmarks.micro --sizes 100k --benchmarks search --index-type hnsw
+#   python -m benchmarks.micro --output hasil.json
+
+import os
+import time
+import random
+import argparse
+
+import numpy as np
+
+from .common import (
+    enter_workdir, bench_environment, percentiles, time_calls, quiet, write_results, parse_sizes,
+)
+from . import fakes
+
+
+def build_store(n_chunks: int, seed: int):
+    """Bangun dan aktifkan vector store sintetis berisi ~n_chunks chunk. Mengembalikan (store, detik, vektor)."""
+    from app.services import embedding, ann_index
+
+    workspace = fakes.SyntheticWorkspace(n_chunks, seed=seed)
+    ids, docs = zip(*fakes.synthetic_documents(workspace))
+    texts = [doc.page_content for doc in docs]
+    start = time.perf_counter()
+    vectors = np.asarray(embedding.embedding_model.embed_documents(texts), dtype=np.float32)
+    store = ann_index.build_vector_store(
+        texts, vectors, [d.metadata for d in docs], list(ids), embedding.embedding_model
+    )
+    with quiet():
+        embedding.save_vector_store(store)
+    return store, time.perf_counter() - start, vectors
+
+
+def bench_search(n_chunks: int, repeat: int, seed: int) -> dict:
+    from app.services import embedding, ann_index
+    from app.services.retriever import search_relevant_context, lexical_confidence
+
+    store, build_seconds, corpus_vectors = build_store(n_chunks, seed)
+    rng = random.Random(seed)
+    queries = [" ".join(rng.choices(fakes.WORDS, k=8)) for _ in range(64)]
+    vectors = [embedding.embedding_model.embed_query(q) for q in queries]
+
+    position = {"i": 0}
+
+    def with_vector():
+        i = position["i"] = (position["i"] + 1) % len(queries)
+        search_relevant_context(queries[i], vectors[i])
+
+    def with_embedding():
+        i = position["i"] = (position["i"] + 1) % len(queries)
+        search_relevant_context(queries[i])
+
+    def lexical_probe():
+        i = position["i"] = (position["i"] + 1) % len(queries)
+        lexical_confidence(queries[i])
+
+    return {
+        "benchmark": "search_relevant_context",
+        "chunks": store.index.ntotal,
+        "build_seconds": round(build_seconds, 3),
+        "index": ann_index.index_report(store.index, corpus_vectors),
+        "with_query_vector": percentiles(time_calls(with_vector, repeat)),
+        "with_query_embedding": percentiles(time_calls(with_embedding, repeat)),
+        "lexical_confidence": percentiles(time_calls(lexical_probe, repeat)),
+    }
+
+
+def bench_history(n_messages: int, repeat: int, seed: int) -> dict:
+    from app.services.llm_generator import normalize_history
+
+    rng = random.Random(seed)
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": " ".join(rng.choices(fakes.WORDS, k=20))}
+        for i in range(n_messages)
+    ]
+    return {
+        "benchmark": "normalize_history",
+        "messages": n_messages,
+        "latency": percentiles(time_calls(lambda: normalize_history(history), repeat)),
+    }
+
+
+def bench_sync(n_chunks: int, seed: int, notion_concurrency: int, notion_latency: float) -> dict:
+    from app.services import notion_sync, embedding_pipeline
+
+    workspace = fakes.SyntheticWorkspace(n_chunks, seed=seed)
+    notion_app = fakes.make_notion_app(workspace, latency=notion_latency)
+    # Batas laju Notion asli (3 req/detik) tidak relevan untuk server lokal
+    notion_sync.NOTION_RATE_LIMIT = notion_sync.NOTION_RATE_BURST = 1_000_000
+    notion_sync.NOTION_MAX_CONCURRENCY = notion_concurrency
+    if os.path.exists(embedding_pipeline.EMBED_CACHE_PATH):
+        os.remove(embedding_pipeline.EMBED_CACHE_PATH)
+
+    runs = []
+    with fakes.BackgroundServer(notion_app) as base_url:
+        notion_sync.NOTION_BASE_URL = base_url
+        for label, full, touch in (("full_cold", True, 0.0), ("incremental_unchanged", False, 0.0),
+                                   ("incremental_1pct_changed", False, 0.01)):
+            pages_changed = workspace.touch(touch) if touch else 0
+            requests_before = notion_app.state.requests
+            start = time.perf_counter()
+            with quiet():
+                result = notion_sync.sync_notion_to_vector_store(full=full)
+            runs.append({
+                "run": label,
+                "seconds": round(time.perf_counter() - start, 3),
+                "notion_requests": notion_app.state.requests - requests_before,
+                "pages_changed": pages_changed,
+                "status": result["status"],
+                "message": result["message"],
+                "chunk_stats": result.get("chunk_stats"),
+            })
+    return {"benchmark": "sync_notion_to_vector_store", "chunks": workspace.n_chunks, "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark retrieval, history, dan sync.")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="Ukuran korpus, mis. 1k,10k,100k")
+    parser.add_argument("--benchmarks", default="search,history,sync")
+    parser.add_argument("--repeat", type=int, default=200, help="Jumlah panggilan per pengukuran")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--notion-concurrency", type=int, default=16)
+    parser.add_argument("--notion-latency", type=float, default=0.0, help="Latensi simulasi server Notion (detik)")
+    parser.add_argument("--index-type", default=None, help="ANN_INDEX_TYPE: auto|flat|ivf_flat|hnsw|ivf_pq")
+    parser.add_argument("--real-embeddings", action="store_true", help="Pakai model HuggingFace asli")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    enter_workdir()
+    bench_environment(**({"ANN_INDEX_TYPE": args.index_type} if args.index_type else {}))
+    if not args.real_embeddings:
+        fakes.install_fake_embeddings()
+
+    selected = {name.strip() for name in args.benchmarks.split(",")}
+    results = []
+    for size in parse_sizes(args.sizes):
+        if "search" in selected:
+            results.append(bench_search(size, args.repeat, args.seed))
+            print(f"[INFO] search_relevant_context {size}: {results[-1]['with_query_vector']}")
+        if "history" in selected:
+            results.append(bench_history(size, args.repeat, args.seed))
+            print(f"[INFO] normalize_history {size}: {results[-1]['latency']}")
+        if "sync" in selected:
+            results.append(bench_sync(size, args.seed, args.notion_concurrency, args.notion_latency))
+            print(f"[INFO] sync {size}: {[(r['run'], r['seconds']) for r in results[-1]['runs']]}")
+
+    write_results("micro", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
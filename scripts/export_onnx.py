@@ -0,0 +1,175 @@
+# File: scripts/export_onnx.py
+# Deskripsi: Ekspor model embedding (paraphrase-multilingual-mpnet-base-v2) ke ONNX + kuantisasi
+#            int8 dinamis untuk EMBEDDING_BACKEND=onnx, lalu verifikasi terhadap model torch:
+#            - drift kosinus vektor (rata-rata / p5 / minimum) pada sampel dokumen vector store
+#            - perubahan recall@k: top-k index yang ada dengan query torch vs query ONNX
+#            - latensi embed_query per backend
+#
+# Pemakaian (butuh torch + sentence-transformers + onnxruntime, cukup di mesin build):
+#   python scripts/export_onnx.py export
+#   python scripts/export_onnx.py verify --samples 500 --k 10 --json verifikasi.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Menambahkan path root proyek agar bisa mengimpor dari 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embedding import MODEL_NAME, load_vector_store
+from app.services.doc_store import documents_at
+from app.services.onnx_embeddings import OnnxEmbeddings, ONNX_MODEL_DIR, CONFIG_FILE, TOKENIZER_FILE
+
+FP32_FILE = "model_fp32.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def export(output_dir: str, opset: int, quantize: bool):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    max_length = model.max_seq_length
+
+    sample = tokenizer(["contoh kalimat untuk ekspor"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    print(f"[INFO] Mengekspor {MODEL_NAME} ke {fp32_path} (opset {opset})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "token"},
+                "attention_mask": {0: "batch", 1: "token"},
+                "last_hidden_state": {0: "batch", 1: "token"},
+            },
+            opset_version=opset,
+        )
+
+    tokenizer.save_pretrained(output_dir)  # menulis tokenizer.json (tokenizer cepat)
+    config = {
+        "model_name": MODEL_NAME,
+        "max_length": max_length,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+        "dim": model.get_sentence_embedding_dimension(),
+        "pooling": "mean",
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    if not os.path.exists(os.path.join(output_dir, TOKENIZER_FILE)):
+        raise RuntimeError("tokenizer.json tidak ditulis; model ini butuh tokenizer 'fast'.")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, INT8_FILE)
+        print(f"[INFO] Kuantisasi int8 dinamis -> {int8_path}...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    for filename in (FP32_FILE, INT8_FILE):
+        path = os.path.join(output_dir, filename)
+        if os.path.exists(path):
+            print(f"[INFO] {filename}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+def _median_ms(func, inputs) -> float:
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - start)
+    return round(float(np.median(samples)) * 1000, 3)
+
+
+def verify(model_dir: str, model_file: str, samples: int, k: int, seed: int) -> dict:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    vector_store = load_vector_store()
+    if vector_store is None or vector_store.index.ntotal == 0:
+        raise RuntimeError("Vector store kosong; jalankan sync dulu agar verifikasi memakai index yang ada.")
+
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(vector_store.index.ntotal, min(samples, vector_store.index.ntotal), replace=False)
+    texts = [doc.page_content for doc in documents_at(vector_store, [int(p) for p in positions])]
+    # Query realistis lebih pendek dari chunk: pakai kalimat pertama setelah header Path
+    queries = [(text.split("\n\n", 1)[-1].split(".")[0] or text)[:200] for text in texts]
+
+    torch_model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    onnx_model = OnnxEmbeddings(model_dir, model_file)
+
+    torch_vectors = np.asarray(torch_model.embed_documents(texts), dtype=np.float32)
+    onnx_vectors = onnx_model.encode(texts)
+    cosine = (torch_vectors * onnx_vectors).sum(axis=1) / (
+        np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1)
+    )
+
+    torch_queries = np.asarray(torch_model.embed_documents(queries), dtype=np.float32)
+    onnx_queries = onnx_model.encode(queries)
+    _, torch_top = vector_store.index.search(torch_queries, k)
+    _, onnx_top = vector_store.index.search(onnx_queries, k)
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(torch_top, onnx_top)]
+    # Recall terhadap dokumen asal query (posisi yang disampel) untuk kedua backend
+    torch_hit = float(np.mean([p in row for p, row in zip(positions, torch_top)]))
+    onnx_hit = float(np.mean([p in row for p, row in zip(positions, onnx_top)]))
+
+    latency_inputs = queries[:100]
+    return {
+        "model_file": model_file,
+        "samples": len(texts),
+        "cosine_drift": {
+            "mean": round(float(1 - cosine.mean()), 6),
+            "p95": round(float(1 - np.percentile(cosine, 5)), 6),
+            "max": round(float(1 - cosine.min()), 6),
+        },
+        f"top{k}_overlap_vs_torch": round(float(np.mean(overlap)), 4),
+        f"recall_at_{k}": {"torch": round(torch_hit, 4), "onnx": round(onnx_hit, 4),
+                           "delta": round(onnx_hit - torch_hit, 4)},
+        "embed_query_p50_ms": {
+            "torch": _median_ms(torch_model.embed_query, latency_inputs),
+            "onnx": _median_ms(onnx_model.embed_query, latency_inputs),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekspor & verifikasi backend embedding ONNX int8.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Ekspor model ke ONNX (+ int8)")
+    export_parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    export_parser.add_argument("--opset", type=int, default=14)
+    export_parser.add_argument("--no-quantize", action="store_true")
+
+    verify_parser = sub.add_parser("verify", help="Bandingkan ONNX dengan model torch pada index yang ada")
+    verify_parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    verify_parser.add_argument("--model-file", default=INT8_FILE)
+    verify_parser.add_argument("--samples", type=int, default=500)
+    verify_parser.add_argument("--k", type=int, default=10)
+    verify_parser.add_argument("--seed", type=int, default=0)
+    verify_parser.add_argument("--json", default=None, help="Simpan laporan ke file JSON")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.output, args.opset, not args.no_quantize)
+        return
+
+    report = verify(args.model_dir, args.model_file, args.samples, args.k, args.seed)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Laporan disimpan di {args.json}")
+
+
+if __name__ == "__main__":
+    main()
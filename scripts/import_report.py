@@ -0,0 +1,94 @@
+# File: scripts/import_report.py
+# Deskripsi: Laporan biaya startup: waktu impor per modul (python -X importtime saat mengimpor
+#            app.main di proses terpisah) dan, dengan --warmup, durasi tiap tahap warmup
+#            (model embedding, vector store, SDK & klien LLM).
+#
+# Pemakaian:
+#   python scripts/import_report.py --top 25
+#   python scripts/import_report.py --warmup --json laporan.json
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+
+def measure_imports(module: str) -> list:
+    """Jalankan `python -X importtime -c "import <module>"` dan parse hasilnya (mikrodetik)."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Gagal mengimpor {module}:\n{completed.stderr[-2000:]}")
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return rows
+
+
+def summarize(rows: list, top: int) -> dict:
+    by_package = defaultdict(float)
+    for row in rows:
+        by_package[row["module"].split(".")[0]] += row["self_ms"]
+    return {
+        "total_ms": round(sum(row["self_ms"] for row in rows), 1),
+        "top_modules": sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top],
+        "top_packages": sorted(
+            ({"package": name, "self_ms": round(ms, 1)} for name, ms in by_package.items()),
+            key=lambda item: item["self_ms"], reverse=True,
+        )[:top],
+    }
+
+
+def measure_warmup() -> dict:
+    started = time.perf_counter()
+    import app.main  # noqa: F401
+    from app.services import warmup
+
+    import_seconds = time.perf_counter() - started
+    result = asyncio.run(warmup.warmup())
+    return {"import_seconds": round(import_seconds, 3), **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Laporan biaya impor & warmup aplikasi.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--warmup", action="store_true", help="Ukur juga tahap warmup di proses ini")
+    parser.add_argument("--json", default=None, help="Simpan laporan lengkap ke file JSON")
+    args = parser.parse_args()
+
+    report = {"imports": summarize(measure_imports(args.module), args.top)}
+    print(f"Total waktu impor {args.module}: {report['imports']['total_ms']} ms\n")
+    print(f"{'kumulatif (ms)':>15} {'sendiri (ms)':>13}  modul")
+    for row in report["imports"]["top_modules"]:
+        print(f"{row['cumulative_ms']:>15.1f} {row['self_ms']:>13.1f}  {row['module']}")
+    print(f"\n{'sendiri (ms)':>15}  paket")
+    for item in report["imports"]["top_packages"]:
+        print(f"{item['self_ms']:>15.1f}  {item['package']}")
+
+    if args.warmup:
+        report["warmup"] = measure_warmup()
+        print(f"\nWarmup ({report['warmup']['status']}), impor aplikasi {report['warmup']['import_seconds']} detik:")
+        for name, seconds in report["warmup"]["steps"].items():
+            print(f"{seconds * 1000:>15.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n[INFO] Laporan disimpan di {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# File: scripts/serve_prefork.py
+# Deskripsi: Menjalankan beberapa worker uvicorn dengan pola preload-then-fork. Proses induk
+#            mengimpor aplikasi dan memuat bobot model embedding + vector store SATU kali, lalu
+#            fork N worker yang berbagi halaman memori tersebut secara copy-on-write (tidak ada
+#            salinan model per worker, dan worker baru siap tanpa memuat ulang model).
+#
+#            Inference pertama (thread pool torch) sengaja tidak dijalankan di induk: thread tidak
+#            ikut terbawa fork, jadi tahap itu dijalankan tiap worker lewat warmup latar belakang.
+#
+# Pemakaian (pengganti `uvicorn app.main:app --workers N`, hanya Linux/macOS):
+#   python scripts/serve_prefork.py --workers 4 --port 8000
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+
+# Menambahkan path root proyek agar bisa mengimpor dari 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def spawn_worker(app, sock: socket.socket, args) -> int:
+    """Fork satu worker; anak menjalankan uvicorn di atas socket bersama dan tidak pernah kembali."""
+    pid = os.fork()
+    if pid:
+        return pid
+
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preload model lalu fork worker uvicorn.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    from app.main import app
+    from app.services import warmup
+
+    print(f"[INFO] Aplikasi diimpor dalam {time.perf_counter() - started:.1f} detik, memuat model sebelum fork...")
+    warmup.preload(inference=False)
+    print(f"[INFO] Preload selesai: {warmup.state.to_dict()['steps']}")
+
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn_worker(app, sock, args) for _ in range(args.workers)}
+    print(f"[INFO] {len(workers)} worker berjalan di http://{args.host}:{args.port} (pid {sorted(workers)})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Awasi worker: yang mati tanpa diminta diganti dengan fork baru dari induk yang sudah preload
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"[WARNING] Worker {pid} berhenti (status {status}), membuat worker pengganti...")
+            workers.add(spawn_worker(app, sock, args))
+    print("[INFO] Semua worker berhenti.")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,8 @@ def run_sync():
     print("="*50)
     
     load_dotenv()
-    result = sync_notion_to_vector_store()
+    # --full: abaikan manifest dan bangun ulang seluruh index
+    result = sync_notion_to_vector_store(full="--full" in sys.argv)
     
     print("\n--- HASIL SINKRONISASI ---")
     print(f"Status: {result['status']}")
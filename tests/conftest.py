@@ -0,0 +1,51 @@
+# File: tests/conftest.py
+# Deskripsi: Persiapan bersama test. Sama seperti benchmark: direktori kerja sementara (vector store,
+#            cache embedding, session tidak menyentuh app/db asli), environment palsu, embedding dan
+#            LLM palsu dari benchmarks/fakes.py. Semua ini harus terjadi SEBELUM `app` diimpor.
+#
+# Pemakaian (dari root repo):
+#   python -m pytest tests
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.common import enter_workdir, bench_environment  # noqa: E402
+from benchmarks import fakes  # noqa: E402
+
+WORKDIR = enter_workdir(prefix="chatbot-test-")
+bench_environment(
+    PIPELINE_MODE="standard",
+    ANSWER_CACHE_ENABLED="1",
+    VECTOR_STORE_CHECK_INTERVAL="-1",
+)
+fakes.install_fake_embeddings()
+fakes.install_fake_llm(latency=0.0)
+
+
+@pytest.fixture(scope="session")
+def _synthetic_store():
+    from benchmarks.micro import build_store
+
+    store, _, _ = build_store(100, seed=0)
+    return store
+
+
+@pytest.fixture
+def vector_store(_synthetic_store):
+    """Vector store sintetis kecil, diaktifkan ulang jika test lain (mis. sync) sudah menggantinya."""
+    from app.services import embedding
+
+    if embedding.get_vector_store() is not _synthetic_store:
+        embedding.activate_vector_store(_synthetic_store)
+    return _synthetic_store
+
+
+def run(coro):
+    return asyncio.run(coro)
@@ -0,0 +1,229 @@
+# File: tests/test_admission.py
+# Deskripsi: Admission control: antrean penuh / melewati SLO ditolak 503 + Retry-After, laju per
+#            session/IP ditolak 429, token laju dikembalikan untuk request yang ditolak, antrean
+#            mengikuti prioritas, perkiraan waktu tunggu memakai sisa kerja slot aktif (penyedia lambat
+#            tidak membuat semua antrean ditolak), dan tahap dalam pipeline (retrieval, llm) menunggu.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import run
+from app.services import admission
+from app.services.admission import (
+    KeyedRateLimiter, Rejected, StageLimiter, PRIORITY_LIKELY_CACHED, PRIORITY_SHORT, PRIORITY_NORMAL,
+)
+
+
+def fake_request(ip="10.0.0.1"):
+    return SimpleNamespace(headers={}, client=SimpleNamespace(host=ip))
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    """Limiter baru per test: burst session 1, burst IP 100, tahap "answer" 1 slot tanpa antrean."""
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission, "session_limiter", KeyedRateLimiter(0.001, 1))
+    monkeypatch.setattr(admission, "ip_limiter", KeyedRateLimiter(0.001, 100))
+    monkeypatch.setattr(admission, "_stages", {"answer": StageLimiter("answer", 1, max_queue=0, queue_slo=10)})
+    monkeypatch.setattr(admission, "_inflight_questions", {})
+    return admission._stages["answer"]
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario():
+        limiter = StageLimiter("t", 1, max_queue=1, queue_slo=10)
+        ticket = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await limiter.acquire()
+        ticket.release()
+        (await waiter).release()
+        return rejected.value
+
+    rejected = run(scenario())
+    assert (rejected.status_code, rejected.reason) == (503, "queue_full")
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+
+def test_wait_over_slo_rejects_immediately():
+    async def scenario():
+        limiter = StageLimiter("t", 1, max_queue=10, queue_slo=1)
+        limiter.service_seconds = 3.0
+        ticket = await limiter.acquire()
+        try:
+            await limiter.acquire()
+        finally:
+            ticket.release()
+
+    with pytest.raises(Rejected) as rejected:
+        run(scenario())
+    assert rejected.value.reason == "over_slo"
+    assert rejected.value.retry_after == 3
+
+
+def test_slow_service_still_queues_when_a_slot_is_about_to_free():
+    async def scenario():
+        # EWMA penyedia lambat (5 detik) jauh di atas SLO antrean (1 detik)
+        limiter = StageLimiter("llm", 1, max_queue=10, queue_slo=1)
+        limiter.service_seconds = 5.0
+        ticket = await limiter.acquire()
+        ticket._started -= 4.5  # slot aktif sudah hampir selesai
+        estimate = limiter.estimated_wait(PRIORITY_NORMAL)
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()  # mengantre, tidak langsung 503
+        ticket.release()
+        (await waiter).release()
+        return estimate
+
+    assert run(scenario()) == pytest.approx(0.5, abs=0.1)
+
+
+def test_slow_service_waiter_times_out_at_slo():
+    async def scenario():
+        limiter = StageLimiter("llm", 1, max_queue=10, queue_slo=0.05)
+        limiter.service_seconds = 5.0
+        ticket = await limiter.acquire()
+        ticket._started -= 10  # sudah melewati EWMA: perkiraan 0, batas tunggu tetap queue_slo
+        try:
+            await limiter.acquire()
+        finally:
+            ticket.release()
+
+    with pytest.raises(Rejected) as rejected:
+        run(scenario())
+    assert rejected.value.reason == "queue_timeout"
+
+
+def test_estimate_counts_remaining_work_and_queue_position():
+    async def scenario():
+        limiter = StageLimiter("t", 2, max_queue=10, queue_slo=10)
+        limiter.service_seconds = 2.0
+        almost_done, fresh = await limiter.acquire(), await limiter.acquire()
+        almost_done._started -= 1.5
+        first = limiter.estimated_wait(PRIORITY_NORMAL)
+        waiter = asyncio.ensure_future(limiter.acquire(PRIORITY_SHORT))
+        await asyncio.sleep(0)
+        # Penunggu di depan mengambil slot yang kosong 0.5 detik lagi -> berikutnya menunggu slot `fresh`
+        second = limiter.estimated_wait(PRIORITY_NORMAL)
+        behind_nobody = limiter.estimated_wait(PRIORITY_LIKELY_CACHED)
+        almost_done.release()
+        (await waiter).release()
+        fresh.release()
+        return first, second, behind_nobody
+
+    first, second, behind_nobody = run(scenario())
+    assert first == pytest.approx(0.5, abs=0.1)
+    assert second == pytest.approx(2.0, abs=0.1)
+    assert behind_nobody == pytest.approx(0.5, abs=0.1)
+
+
+def test_queue_follows_priority_and_skips_cancelled():
+    async def scenario():
+        limiter = StageLimiter("t", 1, max_queue=10, queue_slo=10)
+        ticket = await limiter.acquire()
+        order = []
+
+        async def wait(name, priority):
+            granted = await limiter.acquire(priority)
+            order.append(name)
+            granted.release()
+
+        tasks = [
+            asyncio.ensure_future(wait("normal", PRIORITY_NORMAL)),
+            asyncio.ensure_future(wait("short", PRIORITY_SHORT)),
+            asyncio.ensure_future(wait("cached", PRIORITY_LIKELY_CACHED)),
+        ]
+        await asyncio.sleep(0)
+        tasks[2].cancel()  # klien pergi saat menunggu
+        await asyncio.sleep(0)
+        ticket.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return order, limiter.active, limiter.queued
+
+    order, active, queued = run(scenario())
+    assert order == ["short", "normal"]
+    assert (active, queued) == (0, 0)
+
+
+def test_inner_stage_waits_instead_of_rejecting():
+    async def scenario():
+        limiter = StageLimiter("llm", 1, max_queue=0, queue_slo=0.01)
+        ticket = await limiter.acquire(reject=False)
+        waiter = asyncio.ensure_future(limiter.acquire(reject=False))
+        await asyncio.sleep(0.05)  # melewati queue_slo, tetap menunggu
+        assert not waiter.done()
+        ticket.release()
+        (await waiter).release()
+        return limiter.active
+
+    assert run(scenario()) == 0
+
+
+def test_stage_slot_uses_request_priority(limits, monkeypatch):
+    monkeypatch.setitem(admission._stages, "retrieval", StageLimiter("retrieval", 1, max_queue=0, queue_slo=0))
+
+    async def scenario():
+        order = []
+
+        async def step(name, priority):
+            admission._request_priority.set(priority)
+            async with admission.stage_slot("retrieval"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.ensure_future(step("first", PRIORITY_NORMAL))
+        await asyncio.sleep(0)
+        rest = [
+            asyncio.ensure_future(step("normal", PRIORITY_NORMAL)),
+            asyncio.ensure_future(step("cached", PRIORITY_LIKELY_CACHED)),
+        ]
+        await asyncio.gather(first, *rest)
+        return order
+
+    assert run(scenario()) == ["first", "cached", "normal"]
+
+
+def test_session_rate_limit_rejects_429(limits):
+    async def scenario():
+        first = await admission.admit(fake_request(), "s1", "apa itu ioss")
+        first.release(answered=True)
+        await admission.admit(fake_request(), "s1", "apa itu ioss")
+
+    with pytest.raises(Rejected) as rejected:
+        run(scenario())
+    assert (rejected.value.status_code, rejected.value.reason) == (429, "rate_limited_session")
+    assert "Retry-After" in rejected.value.headers
+
+
+def test_rejected_request_refunds_rate_tokens(limits):
+    async def scenario():
+        busy = await admission.admit(fake_request("10.0.0.2"), "other", "pertanyaan lain")
+        with pytest.raises(Rejected) as rejected:
+            await admission.admit(fake_request(), "s1", "apa itu ioss")
+        assert rejected.value.status_code == 503
+        busy.release()
+        # Token session s1 dikembalikan: percobaan ulang tidak kena 429
+        retry = await admission.admit(fake_request(), "s1", "apa itu ioss")
+        retry.release()
+
+    run(scenario())
+    assert limits.active == 0
+
+
+def test_ip_rejection_refunds_session_token(limits, monkeypatch):
+    monkeypatch.setattr(admission, "session_limiter", KeyedRateLimiter(0.001, 1))
+    monkeypatch.setattr(admission, "ip_limiter", KeyedRateLimiter(0.001, 1))
+
+    async def scenario():
+        (await admission.admit(fake_request(), "s1", "halo")).release()
+        with pytest.raises(Rejected) as rejected:
+            await admission.admit(fake_request(), "s2", "halo")
+        assert rejected.value.reason == "rate_limited_ip"
+        # s2 tidak kehilangan token karena ditolak di bucket IP
+        (await admission.admit(fake_request("10.0.0.9"), "s2", "halo")).release()
+
+    run(scenario())
@@ -0,0 +1,89 @@
+# File: tests/test_ann_index.py
+# Deskripsi: Index FAISS untuk sync: pemilihan jenis index menurut ukuran korpus, build tiap jenis
+#            (termasuk fallback ivf_pq -> ivf_flat untuk korpus kecil), dan pencarian terbatas ke subset
+#            posisi (IDSelector / hitung eksak) yang hanya mengembalikan posisi yang diizinkan.
+
+import numpy as np
+import pytest
+
+from app.services import ann_index
+from app.services.ann_index import build_index, choose_index_type, index_type_of, recall_at_k, restricted_search
+
+DIM = 32
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(0).normal(size=(2000, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def small_pq(monkeypatch):
+    # Codebook 4 bit: cukup ~624 vektor latih, jadi ivf_pq bisa diuji dengan matriks kecil
+    monkeypatch.setattr(ann_index, "ANN_PQ_NBITS", 4)
+    monkeypatch.setattr(ann_index, "ANN_PQ_M", 8)
+
+
+def exact_neighbours(vectors, query, positions, k):
+    scope = np.asarray(positions)
+    distances = ((vectors[scope] - query[0]) ** 2).sum(axis=1)
+    return [int(scope[i]) for i in np.argsort(distances)[:k]]
+
+
+def test_auto_selection_by_corpus_size(monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_INDEX_TYPE", "auto")
+    monkeypatch.setattr(ann_index, "ANN_FLAT_MAX", 100)
+    monkeypatch.setattr(ann_index, "ANN_PQ_MIN", 1000)
+
+    assert choose_index_type(0) == "flat"
+    assert choose_index_type(99) == "flat"
+    assert choose_index_type(100) == "hnsw"
+    assert choose_index_type(999) == "hnsw"
+    assert choose_index_type(1000) == "ivf_pq"
+
+
+def test_configured_type_overrides_auto(monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_INDEX_TYPE", "ivf_flat")
+    assert choose_index_type(10) == "ivf_flat"
+
+    monkeypatch.setattr(ann_index, "ANN_INDEX_TYPE", "annoy")
+    with pytest.raises(ValueError):
+        choose_index_type(10)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat", "ivf_pq"])
+def test_build_each_type(vectors, small_pq, index_type):
+    index = build_index(vectors, index_type)
+
+    assert index_type_of(index) == index_type
+    assert index.ntotal == len(vectors)
+    assert ann_index.supports_incremental(index) == (index_type == "flat")
+    if index_type == "flat":
+        assert recall_at_k(index, vectors) == 1.0
+    elif index_type != "ivf_pq":
+        assert recall_at_k(index, vectors) > 0.8
+
+
+def test_small_corpus_falls_back_from_ivf_pq(vectors):
+    index = build_index(vectors[:500], "ivf_pq")
+    assert index_type_of(index) == "ivf_flat"
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat", "ivf_pq"])
+@pytest.mark.parametrize("exact_scope_max", [4096, 0])
+def test_restricted_search_returns_only_allowed_positions(vectors, small_pq, monkeypatch, index_type,
+                                                          exact_scope_max):
+    monkeypatch.setattr(ann_index, "ANN_EXACT_SCOPE_MAX", exact_scope_max)
+    index = build_index(vectors, index_type)
+    allowed = list(range(3, len(vectors), 7))
+    query = vectors[11:12] + 0.01  # posisi 11 tidak diizinkan
+
+    found = restricted_search(index, query, 5, allowed)
+
+    assert found and len(found) <= 5
+    assert set(found) <= set(allowed)
+    assert 11 not in found
+    if index_type == "flat" or (exact_scope_max and index_type != "ivf_pq"):
+        # IDSelector pada index flat dan jalur eksak: hasil sama dengan brute force atas subset
+        # (ivf_pq merekonstruksi vektor terkuantisasi, jadi jaraknya hanya perkiraan)
+        assert found == exact_neighbours(vectors, query, allowed, 5)
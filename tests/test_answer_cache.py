@@ -0,0 +1,99 @@
+# File: tests/test_answer_cache.py
+# Deskripsi: Kunci cache jawaban semantik: jawaban hanya dipakai ulang dalam konteks percakapan
+#            (ringkasan + history yang masuk prompt) yang sama dan versi vector store yang sama.
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from conftest import run
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.session_store import history_fingerprint
+
+VECTOR = [1.0, 0.0, 0.0, 0.0]
+
+
+def make_cache():
+    return SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=10)
+
+
+def test_lookup_requires_same_context_key():
+    cache = make_cache()
+    cache.store(VECTOR, "jawaban A", store_version=1, context_key="a")
+
+    assert cache.lookup(VECTOR, 1, context_key="a") == "jawaban A"
+    assert cache.lookup(VECTOR, 1, context_key="b") is None
+    assert cache.lookup(VECTOR, 1) is None
+
+
+def test_store_version_change_clears_cache():
+    cache = make_cache()
+    cache.store(VECTOR, "lama", store_version=1)
+
+    assert cache.lookup(VECTOR, 2) is None
+    assert cache.lookup(VECTOR, 1) is None
+
+
+def test_eviction_removes_entry_from_its_context_index():
+    cache = SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=1)
+    cache.store(VECTOR, "konteks a", 1, context_key="a")
+    cache.store(VECTOR, "konteks b", 1, context_key="b")
+
+    assert cache.lookup(VECTOR, 1, context_key="a") is None
+    assert cache.lookup(VECTOR, 1, context_key="b") == "konteks b"
+
+
+def test_history_fingerprint():
+    history = [HumanMessage(content="cara cetak struk"), AIMessage(content="buka menu printer")]
+
+    assert history_fingerprint("", []) == ""
+    assert history_fingerprint("", history) == history_fingerprint("", list(history))
+    assert history_fingerprint("", history) != history_fingerprint("", history[:1])
+    assert history_fingerprint("ringkasan", history) != history_fingerprint("", history)
+
+
+def test_follow_up_with_history_is_not_served_from_other_session(vector_store):
+    from app.services import llm_generator
+    from app.services.answer_cache import answer_cache
+
+    question = "bagaimana cara membuat laporan penjualan harian per cabang"
+    answer_cache.clear()
+    hits = answer_cache.hits
+
+    async def ask(session_id, history=None):
+        return "".join([t async for t in llm_generator.stream_answer(question, session_id, history or [])])
+
+    run(ask("cache-a"))
+    # Sesi lain dengan history berbeda: pertanyaan sama tetapi prompt berbeda -> tidak boleh kena cache
+    run(ask("cache-b", [{"role": "user", "content": "apa itu retur"}, {"role": "assistant", "content": "retur barang"}]))
+    assert answer_cache.hits == hits
+
+    # Sesi baru tanpa history -> konteks sama dengan sesi pertama -> kena cache
+    run(ask("cache-c"))
+    assert answer_cache.hits == hits + 1
+
+
+def test_store_version_is_read_off_the_event_loop(vector_store, monkeypatch):
+    import threading
+    from app.services import llm_generator
+
+    threads = []
+
+    def recording_version():
+        threads.append(threading.current_thread())
+        return 1
+
+    monkeypatch.setattr(llm_generator, "get_store_version", recording_version)
+
+    async def ask():
+        loop_thread = threading.current_thread()
+        async for _ in llm_generator.stream_answer("cara reset password akun kasir", "version-thread", []):
+            pass
+        return loop_thread
+
+    loop_thread = run(ask())
+    assert threads and loop_thread not in threads
+
+    # Tanpa cache jawaban versi store tidak dibutuhkan sama sekali
+    monkeypatch.setattr(llm_generator, "ANSWER_CACHE_ENABLED", False)
+    threads.clear()
+    run(ask())
+    assert threads == []
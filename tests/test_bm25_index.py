@@ -0,0 +1,121 @@
+# File: tests/test_bm25_index.py
+# Deskripsi: Index BM25 atas korpus kecil yang deterministik: skor CSR sama dengan rumus Okapi BM25
+#            yang dihitung langsung, pembatasan posisi, simpan/muat, urutan penggabungan RRF, dan
+#            gerbang keyakinan leksikal yang menentukan apakah HyDE dilewati.
+
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fakes import FakeEmbeddings
+from app.services import retriever
+from app.services.bm25_index import (
+    BM25_B, BM25_K1, build_bm25_index, load_bm25_index, save_bm25_index, tokenize,
+)
+from app.services.llm_generator import HYDE_SKIP_LEXICAL
+
+CORPUS = [
+    "cara login akun kasir dengan password",
+    "laporan penjualan harian dan rekap per cabang",
+    "cetak struk di printer kasir dan cek kertas",
+    "menu pengaturan printer struk thermal dan ukuran kertas",
+    "retur barang ke supplier dan faktur pembelian",
+    "kasir kasir kasir transaksi tunai",
+]
+
+
+@pytest.fixture(scope="module")
+def store():
+    return FAISS.from_texts(CORPUS, FakeEmbeddings())
+
+
+@pytest.fixture(scope="module")
+def index(store):
+    return build_bm25_index(store)
+
+
+def reference_scores(query):
+    """Okapi BM25 langsung dari teks (tanpa posting list) sebagai pembanding."""
+    docs = [tokenize(text) for text in CORPUS]
+    avg_length = sum(len(doc) for doc in docs) / len(docs)
+    scores = {}
+    for position, doc in enumerate(docs):
+        score = 0.0
+        for term in dict.fromkeys(tokenize(query)):
+            df = sum(term in other for other in docs)
+            tf = doc.count(term)
+            if not tf:
+                continue
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_length))
+        if score:
+            scores[position] = score
+    return scores
+
+
+@pytest.mark.parametrize("query", ["printer struk kasir", "kasir", "faktur supplier retur", "tidak ada"])
+def test_scores_match_okapi_bm25(index, query):
+    positions, totals = index.scores(query)
+    expected = reference_scores(query)
+
+    assert sorted(positions.tolist()) == sorted(expected)
+    for position, total in zip(positions, totals):
+        assert total == pytest.approx(expected[int(position)], rel=1e-5)
+
+
+def test_search_orders_by_score_and_respects_positions(index):
+    expected = reference_scores("printer struk kasir")
+    ranked = index.search("printer struk kasir", k=3)
+    assert [position for position, _ in ranked] == sorted(expected, key=expected.get, reverse=True)[:3]
+    assert ranked[0][0] == 2  # satu-satunya dokumen dengan ketiga kata
+    assert all(a[1] >= b[1] for a, b in zip(ranked, ranked[1:]))
+
+    restricted = index.search("printer struk kasir", k=3, positions=[0, 5])
+    assert [position for position, _ in restricted] == [5, 0]
+
+
+def test_save_and_load_roundtrip(index, store, tmp_path):
+    save_bm25_index(index, str(tmp_path))
+    loaded = load_bm25_index(str(tmp_path), store)
+
+    assert loaded.terms == index.terms
+    for query in ("printer struk kasir", "laporan cabang"):
+        np.testing.assert_array_equal(loaded.scores(query)[0], index.scores(query)[0])
+        np.testing.assert_allclose(loaded.scores(query)[1], index.scores(query)[1])
+
+
+def test_confidence_gate(index):
+    # Semua kata langka ada di satu dokumen -> HyDE dilewati
+    assert index.confidence("printer thermal") == pytest.approx(1.0)
+    assert index.confidence("printer thermal") >= HYDE_SKIP_LEXICAL
+    # Kata langka yang tidak ada di korpus menurunkan keyakinan di bawah ambang
+    assert index.confidence("printer bluetooth") < HYDE_SKIP_LEXICAL
+    # Kata langka tersebar di dokumen berbeda -> tidak ada satu dokumen yang cocok penuh
+    assert index.confidence("thermal faktur") < HYDE_SKIP_LEXICAL
+    # Hanya kata umum (df > BM25_COMMON_DF) -> 0
+    assert index.confidence("dan") == 0.0
+    # Kata umum tidak mengurangi keyakinan kata langka
+    assert index.confidence("pengaturan printer dan") == pytest.approx(1.0)
+
+
+def test_rrf_fusion_order():
+    # 3 muncul di kedua peringkat; skor seri (2 dan 4) mengikuti urutan pertama kali muncul
+    assert retriever._fuse([1, 2, 3], [3, 4]) == [3, 1, 2, 4]
+    assert retriever._fuse([5, 6]) == [5, 6]
+
+
+def test_hybrid_search_adds_keyword_match(index, store, monkeypatch):
+    snapshot = SimpleNamespace(store=store, bm25_index=index)
+    query = retriever._query_matrix(store, FakeEmbeddings().embed_query("laporan penjualan"))
+
+    vector_only = retriever._hybrid_positions(snapshot, query, None, k=2)
+    hybrid = retriever._hybrid_positions(snapshot, query, "retur supplier", k=2)
+
+    assert vector_only[0] == 1
+    assert 4 not in vector_only
+    assert 4 in hybrid
+    monkeypatch.setattr(retriever, "HYBRID_SEARCH", False)
+    assert retriever._hybrid_positions(snapshot, query, "retur supplier", k=2) == vector_only
@@ -0,0 +1,118 @@
+# File: tests/test_chunking.py
+# Deskripsi: Chunking blok Notion: setiap chunk <= CHUNK_MAX_TOKENS (termasuk heading, paragraf, list
+#            dan tabel yang sendirian terlalu besar), bagian kecil digabung, potongan lanjutan diawali
+#            heading, dan ID chunk stabil antar sync selama blok awalnya tidak berubah.
+
+import random
+
+import pytest
+
+from benchmarks.fakes import WORDS, _text_block
+from app.services.chunking import (
+    CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS, CHUNK_TARGET_TOKENS, chunk_blocks,
+)
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def text(rng, sentences):
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+
+def list_block(block_id, items):
+    block = _text_block(block_id, "bulleted_list_item", items[0])
+    block["_children"] = [_text_block(f"{block_id}-{i}", "bulleted_list_item", item) for i, item in enumerate(items[1:])]
+    return block
+
+
+def table_block(block_id, rows):
+    return {
+        "id": block_id,
+        "type": "table",
+        "_children": [
+            {"id": f"{block_id}-r{i}", "type": "table_row",
+             "table_row": {"cells": [[{"plain_text": cell}] for cell in row]}}
+            for i, row in enumerate(rows)
+        ],
+    }
+
+
+def random_page(seed, blocks=40):
+    rng = random.Random(seed)
+    page = []
+    for i in range(blocks):
+        kind = rng.random()
+        if kind < 0.2:
+            # Sesekali heading yang sangat panjang (judul tempelan / paragraf yang diberi gaya heading)
+            length = rng.choice([1, 1, 1, 80])
+            page.append(_text_block(f"b{i}", rng.choice(["heading_1", "heading_2", "heading_3"]), text(rng, length)))
+        elif kind < 0.6:
+            page.append(_text_block(f"b{i}", "paragraph", text(rng, rng.choice([1, 3, 10, 60]))))
+        elif kind < 0.8:
+            page.append(list_block(f"b{i}", [sentence(rng, rng.choice([5, 40])) for _ in range(rng.randint(1, 30))]))
+        else:
+            rows = [[" ".join(rng.choices(WORDS, k=3)) for _ in range(4)] for _ in range(rng.randint(2, 80))]
+            page.append(table_block(f"b{i}", rows))
+    return page
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_never_exceed_max_tokens(seed):
+    chunks = chunk_blocks(random_page(seed))
+
+    assert chunks
+    assert max(chunk.tokens for chunk in chunks) <= CHUNK_MAX_TOKENS
+    assert len({chunk.chunk_id for chunk in chunks}) == len(chunks)
+
+
+def test_oversized_heading_is_split():
+    rng = random.Random(1)
+    heading = text(rng, 120)
+    blocks = [_text_block("h", "heading_2", heading), _text_block("p", "paragraph", text(rng, 3))]
+
+    chunks = chunk_blocks(blocks)
+
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= CHUNK_MAX_TOKENS for chunk in chunks)
+    assert chunks[0].chunk_id == "h"
+    # Seluruh isi heading tetap ada, dan tidak diulang di setiap potongan
+    assert sum(chunk.text.count(heading.split(".")[0]) for chunk in chunks) == 1
+
+
+def test_long_section_repeats_short_heading():
+    rng = random.Random(2)
+    blocks = [_text_block("h", "heading_2", "Pengaturan printer struk")]
+    blocks += [_text_block(f"p{i}", "paragraph", text(rng, 6)) for i in range(20)]
+
+    chunks = chunk_blocks(blocks)
+
+    assert len(chunks) > 1
+    assert all(chunk.text.startswith("Pengaturan printer struk\n") for chunk in chunks)
+    assert all(chunk.tokens <= CHUNK_MAX_TOKENS for chunk in chunks)
+    assert all(chunk.tokens <= CHUNK_TARGET_TOKENS + 100 for chunk in chunks[:-1])
+
+
+def test_small_sections_are_merged():
+    blocks = []
+    for i in range(3):
+        blocks.append(_text_block(f"h{i}", "heading_3", f"Langkah {i}"))
+        blocks.append(_text_block(f"p{i}", "paragraph", "Klik tombol simpan."))
+
+    chunks = chunk_blocks(blocks)
+
+    assert [chunk.chunk_id for chunk in chunks] == ["h0"]
+    assert chunks[0].tokens < CHUNK_MIN_TOKENS
+
+
+def test_chunk_ids_are_stable_across_resyncs():
+    page = random_page(3)
+    first = chunk_blocks(page)
+    assert chunk_blocks(random_page(3)) == first
+
+    # Paragraf baru di akhir halaman tidak mengubah ID (maupun isi) chunk sebelumnya
+    extended = page + [_text_block("baru", "heading_1", "Bagian baru"), _text_block("baru-p", "paragraph", "Isi.")]
+    second = chunk_blocks(extended)
+    assert second[:len(first) - 1] == first[:-1]
+    assert {chunk.chunk_id for chunk in first} <= {chunk.chunk_id for chunk in second}
@@ -0,0 +1,76 @@
+# File: tests/test_context_packer.py
+# Deskripsi: Packing konteks prompt: batas token dipatuhi (chunk yang tidak muat dilewati, chunk
+#            pertama dipotong), chunk yang hampir sama dibuang, urutan relevansi dipertahankan, dan
+#            header path / prefix path bersama hanya ditulis sekali.
+
+from langchain_core.documents import Document
+
+from benchmarks.fakes import WORDS
+from app.services.context_packer import pack_context
+from app.services.tokenizer import count_tokens
+
+
+def doc(body, source="Panduan > Kasir > Login"):
+    return Document(page_content=f"Path: {source}\n{body}", metadata={"source": source})
+
+
+def words(start, count):
+    return " ".join(WORDS[(start + i) % len(WORDS)] + str(i) for i in range(count))
+
+
+def test_budget_skips_chunks_that_do_not_fit():
+    docs = [doc(words(0, 60)), doc(words(7, 400)), doc(words(13, 30)), doc(words(21, 30))]
+    budget = count_tokens(docs[0].page_content) + count_tokens(docs[2].page_content) + 20
+
+    packed = pack_context(docs, budget=budget)
+
+    assert packed.packed_tokens <= budget
+    assert packed.over_budget >= 1
+    # Chunk besar dilewati, chunk kecil sesudahnya masih masuk
+    assert words(7, 400) not in packed.text
+    assert words(13, 30) in packed.text
+    assert packed.chunks_used == packed.chunks_in - packed.over_budget
+
+
+def test_first_chunk_is_truncated_to_budget():
+    packed = pack_context([doc(words(0, 500)), doc(words(3, 20))], budget=40)
+
+    assert 0 < packed.packed_tokens <= 40
+    assert packed.chunks_used == 1
+    assert packed.text.startswith("[path: Panduan > Kasir > Login]\n")
+
+
+def test_near_duplicates_are_dropped():
+    original = words(0, 80)
+    near_copy = " ".join("ubah" if i == 40 else word for i, word in enumerate(original.split()))  # satu kata berbeda
+    other = words(40, 80)
+
+    packed = pack_context([doc(original), doc(near_copy, "Panduan > Kasir > Struk"), doc(other)], budget=0)
+
+    assert packed.duplicates == 1
+    assert packed.chunks_used == 2
+    assert near_copy not in packed.text
+    assert packed.tokens_saved > 0
+
+
+def test_relevance_order_and_grouping_by_path():
+    login_a, login_b = words(0, 10), words(20, 10)
+    struk = words(40, 10)
+    docs = [doc(login_a), doc(struk, "Panduan > Kasir > Struk"), doc(login_b)]
+
+    text = pack_context(docs, budget=0).text
+
+    # Grup mengikuti chunk paling relevan; di dalam grup urutan relevansi tetap
+    assert text.index(login_a) < text.index(login_b) < text.index(struk)
+    # "Path:" dari chunking dibuang, prefix bersama hanya sekali
+    assert "Path: " not in text
+    assert text.count("Panduan > Kasir") == 1
+    assert text.startswith("[path dasar: Panduan > Kasir]")
+    assert "[path: ... > Login]" in text and "[path: ... > Struk]" in text
+
+
+def test_single_group_has_no_shared_prefix_header():
+    text = pack_context([doc(words(0, 10)), doc(words(30, 10))], budget=0).text
+
+    assert text.count("[path: Panduan > Kasir > Login]") == 1
+    assert "[path dasar" not in text
@@ -0,0 +1,115 @@
+# File: tests/test_doc_store.py
+# Deskripsi: Docstore mmap (docstore.jsonl + tabel offset): tulis, buka ulang, baca per posisi / ID,
+#            overlay add/delete dari sync inkremental lewat langchain FAISS, lalu simpan lagi dan
+#            pastikan isi file baru sama dengan store di memori.
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fakes import FakeEmbeddings
+from app.services.doc_store import (
+    DocIdMap, MmapDocstore, documents_at, has_docstore, open_docstore, write_docstore,
+)
+
+TEXTS = ["cara login akun kasir", "laporan penjualan harian", "cetak struk — printer ✓", "retur barang"]
+IDS = [f"page-{i}:block-{i}" for i in range(len(TEXTS))]
+
+
+def make_store():
+    metadatas = [{"source": f"Panduan > Bagian {i}", "category": "Kasir", "order": i} for i in range(len(TEXTS))]
+    return FAISS.from_texts(TEXTS, FakeEmbeddings(), metadatas=metadatas, ids=IDS)
+
+
+def reopen(vector_store, folder):
+    """Tulis vector_store ke folder lalu pasang docstore mmap dari file tersebut (seperti save_vector_store)."""
+    folder.mkdir(exist_ok=True)
+    write_docstore(vector_store, str(folder))
+    vector_store.docstore, vector_store.index_to_docstore_id = open_docstore(str(folder))
+    return vector_store
+
+
+def contents(vector_store):
+    return [
+        (doc.id, doc.page_content, doc.metadata)
+        for doc in documents_at(vector_store, range(vector_store.index.ntotal))
+    ]
+
+
+def test_roundtrip_by_position_and_id(tmp_path):
+    original = make_store()
+    store = reopen(make_store(), tmp_path / "v1")
+
+    assert has_docstore(str(tmp_path / "v1"))
+    assert isinstance(store.docstore, MmapDocstore) and isinstance(store.index_to_docstore_id, DocIdMap)
+    assert store.index_to_docstore_id.positional
+    assert len(store.docstore) == len(TEXTS)
+    assert list(store.index_to_docstore_id.items()) == list(original.index_to_docstore_id.items())
+    for position, doc_id in enumerate(IDS):
+        doc = store.docstore.search(doc_id)
+        assert (doc.page_content, doc.metadata) == (TEXTS[position], original.docstore.search(doc_id).metadata)
+        assert store.docstore.document_at(position).id == doc_id
+    assert store.docstore.search("tidak-ada") == "ID tidak-ada not found."
+    with pytest.raises(KeyError):
+        store.docstore.document_at(len(TEXTS))
+
+    # Pencarian vektor tetap mengembalikan dokumen dari file
+    hits = store.similarity_search("laporan penjualan harian", k=1)
+    assert hits[0].page_content == TEXTS[1]
+
+
+def test_overlay_add_delete_then_save_again(tmp_path):
+    store = reopen(make_store(), tmp_path / "v1")
+
+    store.delete([IDS[1]])
+    store.add_texts(["stok gudang baru"], metadatas=[{"source": "Panduan > Gudang"}], ids=["page-9:block-9"])
+
+    # langchain FAISS.delete mengganti peta posisi -> ID dengan dict biasa; documents_at membaca per ID
+    id_map = store.index_to_docstore_id
+    assert not (isinstance(id_map, DocIdMap) and id_map.positional)
+    assert store.docstore.search(IDS[1]) == f"ID {IDS[1]} not found."
+    assert store.docstore.search("page-9:block-9").page_content == "stok gudang baru"
+    with pytest.raises(ValueError):
+        store.docstore.add({IDS[0]: store.docstore.search(IDS[0])})
+    expected = contents(store)
+    assert [doc_id for doc_id, _, _ in expected] == [IDS[0], IDS[2], IDS[3], "page-9:block-9"]
+
+    # File lama tidak diubah oleh overlay
+    assert len(MmapDocstore(str(tmp_path / "v1"))) == len(TEXTS)
+
+    store = reopen(store, tmp_path / "v2")
+    assert store.index_to_docstore_id.positional
+    assert contents(store) == expected
+    assert store.similarity_search("stok gudang baru", k=1)[0].page_content == "stok gudang baru"
+
+
+def test_deleted_then_re_added_id(tmp_path):
+    store = reopen(make_store(), tmp_path / "v1")
+    docstore = store.docstore
+    doc = docstore.search(IDS[0])
+
+    docstore.delete([IDS[0]])
+    docstore.add({IDS[0]: doc})
+
+    assert docstore.search(IDS[0]).page_content == TEXTS[0]
+
+
+def test_empty_store(tmp_path):
+    store = make_store()
+    store.delete(IDS)
+    store = reopen(store, tmp_path / "empty")
+
+    assert len(store.docstore) == 0
+    assert len(store.index_to_docstore_id) == 0
+    assert np.load(str(tmp_path / "empty" / "docstore.offsets.npy")).tolist() == [0]
+
+
+def test_add_only_materializes_id_map(tmp_path):
+    store = reopen(make_store(), tmp_path / "v1")
+
+    store.add_texts(["promo diskon member"], ids=["page-5:block-5"])
+
+    id_map = store.index_to_docstore_id
+    assert isinstance(id_map, DocIdMap) and not id_map.positional
+    assert [id_map[i] for i in range(len(id_map))] == IDS + ["page-5:block-5"]
+    assert documents_at(store, [4])[0].page_content == "promo diskon member"
@@ -0,0 +1,55 @@
+# File: tests/test_embedding_pipeline.py
+# Deskripsi: Tahap embedding sync: jalur proses utama dan jalur worker (EMBED_WORKERS > 1) menghasilkan
+#            vektor yang sama untuk teks yang sama, sehingga cache embedding tidak bergantung pada
+#            jumlah worker yang dipakai saat teks itu pertama kali di-encode.
+
+from typing import List
+
+import numpy as np
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings, EMBEDDING_DIM
+from app.services import embedding, embedding_pipeline
+
+TEXTS = [
+    "Cara login:\nbuka menu akun\nlalu isi password",
+    "Laporan stok\n\nper cabang",
+    "tanpa baris baru",
+]
+
+
+class NewlineSensitiveEmbeddings(FakeEmbeddings):
+    """Seperti HuggingFaceEmbeddings: embed_documents mengganti baris baru, model di bawahnya peka baris baru."""
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for word in text.split(" "):
+            vector[hash(word) % EMBEDDING_DIM] += 1.0
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return super().embed_documents([text.replace("\n", " ") for text in texts])
+
+
+@pytest.fixture
+def model(monkeypatch, tmp_path):
+    fake = NewlineSensitiveEmbeddings()
+    monkeypatch.setattr(embedding, "_model", fake)
+    monkeypatch.setattr(embedding_pipeline, "_worker_model", fake)
+    monkeypatch.setattr(embedding_pipeline, "EMBED_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(embedding_pipeline, "EMBED_WORKERS", 1)
+    return fake
+
+
+def test_worker_and_in_process_vectors_match(model):
+    in_process = embedding_pipeline.embed_texts(TEXTS)
+    in_worker = embedding_pipeline._encode_in_worker(TEXTS)
+    np.testing.assert_array_equal(in_process, in_worker)
+
+
+def test_cached_vectors_match_fresh_encode(model):
+    embedding_pipeline.embed_texts(TEXTS)
+    progress = {}
+    cached = embedding_pipeline.embed_texts(TEXTS, progress)
+    assert progress["chunks_embedded"] == len(TEXTS)
+    np.testing.assert_array_equal(cached, embedding_pipeline._encode_documents(model, TEXTS))
@@ -0,0 +1,214 @@
+# File: tests/test_llm_router.py
+# Deskripsi: Router LLM dengan penyedia palsu (FakeChatModel dari benchmarks/fakes.py): hedged request
+#            setelah p95, fallback saat penyedia gagal, transisi circuit breaker closed -> open ->
+#            half-open -> closed/open, dan deadline per tahap (termasuk untuk streaming).
+
+import asyncio
+import time
+from collections import Counter
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from conftest import run
+from benchmarks.fakes import FakeChatModel
+from app.services import llm_providers, llm_router
+from app.services.llm_router import CircuitBreaker, LLMRouter, LLMUnavailableError
+
+PRIMARY, SECONDARY = "mistral_api", "qwen_api"
+PAYLOAD = [HumanMessage(content="halo")]
+
+
+class ScriptedModel(FakeChatModel):
+    """FakeChatModel yang mencatat pemanggilan per penyedia dan bisa dibuat gagal."""
+
+    provider: str = ""
+    fail: bool = False
+    calls: Any = None
+
+    async def _start(self):
+        self.calls[self.provider] += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError(f"{self.provider} gagal")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self._start()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"jawaban dari {self.provider}"))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await self._start()
+        for word in ("jawaban", "dari", self.provider):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """providers[nama] = {"latency": detik, "fail": bool}; ubah sebelum run() untuk mengatur perilaku."""
+    config = {PRIMARY: {"latency": 0.0, "fail": False}, SECONDARY: {"latency": 0.0, "fail": False}}
+    calls = Counter()
+
+    def build(provider, stage, registry):
+        return ScriptedModel(provider=provider, calls=calls, **config[provider])
+
+    monkeypatch.setattr(llm_providers, "_build_llm", build)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    config["calls"] = calls
+    return config
+
+
+def invoke(router, stage="classifier"):
+    async def call():
+        started = time.monotonic()
+        message = await router.ainvoke(stage, lambda llm: llm, PAYLOAD)
+        return message, time.monotonic() - started
+
+    return run(call())
+
+
+def stream(router, stage="answer"):
+    async def call():
+        return "".join([chunk.content async for chunk in router.astream(stage, lambda llm: llm, PAYLOAD)])
+
+    return run(call())
+
+
+def test_hedge_delay_uses_p95_after_enough_samples(monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DEFAULT_DELAY", 2.0)
+    router = LLMRouter([PRIMARY, SECONDARY])
+
+    assert router.hedge_delay(PRIMARY, "answer") == 2.0
+    router._stats(PRIMARY, "answer").record(0.2)
+    assert router.hedge_delay(PRIMARY, "answer") == pytest.approx(0.4)  # 2 x EWMA sebelum sampel cukup
+
+    for i in range(100):
+        router._stats(PRIMARY, "answer").record(0.1 + i / 1000)
+    assert router.hedge_delay(PRIMARY, "answer") == pytest.approx(0.195, abs=0.002)
+
+
+def test_slow_primary_is_hedged(providers):
+    providers[PRIMARY]["latency"] = 1.0
+    router = LLMRouter([PRIMARY, SECONDARY])
+
+    message, elapsed = invoke(router)
+
+    assert elapsed < 0.5
+    assert message.content == f"jawaban dari {SECONDARY}"
+    assert providers["calls"] == {PRIMARY: 1, SECONDARY: 1}
+    # Penyedia yang kalah hedge dipenalti, jadi panggilan berikutnya mulai dari pemenang
+    assert router.ranked("classifier") == [SECONDARY, PRIMARY]
+    assert router.breakers[PRIMARY].state == "closed"
+
+
+def test_fast_primary_is_not_hedged(providers):
+    router = LLMRouter([PRIMARY, SECONDARY])
+    for _ in range(llm_router.MIN_PERCENTILE_SAMPLES):
+        router._stats(PRIMARY, "classifier").record(0.2)
+        router._stats(SECONDARY, "classifier").record(0.5)
+
+    invoke(router)  # penyedia pertama menjawab jauh sebelum p95-nya
+
+    assert providers["calls"] == {PRIMARY: 1}
+
+
+def test_failure_falls_back_to_next_provider(providers):
+    providers[PRIMARY]["fail"] = True
+    router = LLMRouter([PRIMARY, SECONDARY])
+
+    message, _ = invoke(router)
+
+    assert message.content == f"jawaban dari {SECONDARY}"
+    assert providers["calls"] == {PRIMARY: 1, SECONDARY: 1}
+    assert router.breakers[PRIMARY].failures == 1
+
+
+def test_all_providers_failing_raises(providers):
+    providers[PRIMARY]["fail"] = providers[SECONDARY]["fail"] = True
+
+    with pytest.raises(LLMUnavailableError):
+        invoke(LLMRouter([PRIMARY, SECONDARY]))
+
+
+def test_circuit_breaker_transitions(monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_RESET_SECONDS", 0.05)
+    breaker = CircuitBreaker()
+
+    breaker.on_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.on_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.on_start()
+    assert not breaker.allow()  # hanya satu panggilan percobaan
+    breaker.on_failure()
+    assert breaker.state == "open"  # percobaan gagal -> langsung terbuka lagi
+
+    time.sleep(0.06)
+    breaker.on_start()
+    breaker.on_abandon()  # percobaan kalah hedge -> boleh dicoba lagi
+    assert breaker.allow()
+    breaker.on_start()
+    breaker.on_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_open_breaker_skips_provider_until_half_open(providers, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_RESET_SECONDS", 0.2)
+    providers[PRIMARY]["fail"] = True
+    router = LLMRouter([PRIMARY])
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            invoke(router)
+    with pytest.raises(LLMUnavailableError, match="circuit breaker"):
+        invoke(router)
+    assert providers["calls"][PRIMARY] == 2  # panggilan ketiga tidak sampai ke penyedia
+
+    time.sleep(0.21)
+    providers[PRIMARY]["fail"] = False
+    invoke(router)  # half-open -> satu percobaan, sukses menutup breaker
+    assert router.breakers[PRIMARY].state == "closed"
+
+
+def test_deadline_cancels_slow_calls(providers, monkeypatch):
+    monkeypatch.setitem(llm_router.STAGE_DEADLINE_SECONDS, "classifier", 0.15)
+    providers[PRIMARY]["latency"] = providers[SECONDARY]["latency"] = 2.0
+    router = LLMRouter([PRIMARY, SECONDARY])
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError, match="Deadline"):
+        invoke(router)
+
+    assert time.monotonic() - started < 1.0
+    # Kedua penyedia sempat ditembak (hedge) dan keduanya dihitung gagal karena melewati deadline
+    assert providers["calls"] == {PRIMARY: 1, SECONDARY: 1}
+    assert router.breakers[PRIMARY].failures == router.breakers[SECONDARY].failures == 1
+
+
+def test_stream_hedges_until_first_token(providers, monkeypatch):
+    providers[PRIMARY]["latency"] = 1.0
+    router = LLMRouter([PRIMARY, SECONDARY])
+
+    started = time.monotonic()
+    text = stream(router)
+
+    assert time.monotonic() - started < 0.5
+    assert text == f"jawaban dari {SECONDARY} "
+
+
+def test_stream_deadline_to_first_token(providers, monkeypatch):
+    monkeypatch.setitem(llm_router.STAGE_DEADLINE_SECONDS, "answer", 0.1)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_ENABLED", False)
+    providers[PRIMARY]["latency"] = 2.0
+
+    with pytest.raises(LLMUnavailableError):
+        stream(LLMRouter([PRIMARY, SECONDARY]))
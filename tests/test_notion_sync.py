@@ -0,0 +1,120 @@
+# File: tests/test_notion_sync.py
+# Deskripsi: Sync Notion inkremental (crawler konkuren + manifest) terhadap server Notion palsu,
+#            termasuk jalur gagal: halaman yang gagal diambil harus tetap memakai chunk dan anak
+#            dari sync sebelumnya, bukan dihapus dari index.
+
+import pytest
+
+from benchmarks import fakes
+from app.services import embedding, notion_sync
+
+
+@pytest.fixture
+def notion(monkeypatch):
+    """Workspace sintetis kecil (2 kategori x 2 subkategori x 2 halaman daun) + server Notion palsu."""
+    workspace = fakes.SyntheticWorkspace(40, sections_per_page=5, categories=2)
+    app = fakes.make_notion_app(workspace)
+    monkeypatch.setattr(notion_sync, "NOTION_RATE_LIMIT", 1_000_000)
+    monkeypatch.setattr(notion_sync, "NOTION_RATE_BURST", 1_000_000)
+    monkeypatch.setattr(notion_sync, "NOTION_MAX_CONCURRENCY", 4)
+    with fakes.BackgroundServer(app) as base_url:
+        monkeypatch.setattr(notion_sync, "NOTION_BASE_URL", base_url)
+        yield workspace, app
+
+
+def indexed_chunks() -> dict:
+    """chunk_id -> page_content di store aktif."""
+    store = embedding.get_vector_store()
+    return {doc_id: store.docstore.search(doc_id).page_content for doc_id in store.index_to_docstore_id.values()}
+
+
+def manifest_pages() -> dict:
+    return embedding.load_store_file(notion_sync.MANIFEST_FILE)["pages"]
+
+
+def chunks_of(chunks: dict, page_id: str) -> dict:
+    return {cid: text for cid, text in chunks.items() if cid.startswith(page_id + ":")}
+
+
+def test_full_then_unchanged_incremental_sync(notion):
+    workspace, app = notion
+    assert notion_sync.sync_notion_to_vector_store(full=True)["status"] == "success"
+    chunks = indexed_chunks()
+    assert {cid.split(":")[0] for cid in chunks} == set(workspace.leaf_ids())
+
+    requests_before = app.state.requests
+    result = notion_sync.sync_notion_to_vector_store()
+    assert result["status"] == "success"
+    assert result["message"].startswith("Tidak ada perubahan")
+    assert indexed_chunks() == chunks
+    # Halaman tidak berubah: cukup pages.retrieve, isi blok tidak diambil ulang
+    assert app.state.requests - requests_before < len(chunks)
+
+
+def test_incremental_sync_reembeds_only_changed_page(notion):
+    workspace, _ = notion
+    notion_sync.sync_notion_to_vector_store(full=True)
+    before = indexed_chunks()
+
+    changed = "page-1-0-1"
+    workspace.revisions[changed] = 1
+    result = notion_sync.sync_notion_to_vector_store()
+
+    after = indexed_chunks()
+    assert result["status"] == "success"
+    assert chunks_of(after, changed) != chunks_of(before, changed)
+    assert {cid: t for cid, t in after.items() if not cid.startswith(changed)} == \
+        {cid: t for cid, t in before.items() if not cid.startswith(changed)}
+    assert manifest_pages()[changed]["last_edited_time"] == workspace.edited_time(changed)
+
+
+def test_failed_block_fetch_keeps_previous_chunks(notion):
+    workspace, _ = notion
+    notion_sync.sync_notion_to_vector_store(full=True)
+    before = indexed_chunks()
+    previous_entry = manifest_pages()["page-0-1-0"]
+
+    # Halaman berubah tetapi daftar bloknya gagal diambil
+    workspace.revisions["page-0-1-0"] = 1
+    workspace.failing.add("page-0-1-0")
+    result = notion_sync.sync_notion_to_vector_store()
+
+    assert result["status"] == "success"
+    assert indexed_chunks() == before
+    assert manifest_pages()["page-0-1-0"] == previous_entry
+
+
+def test_failed_parent_keeps_subtree(notion):
+    workspace, _ = notion
+    notion_sync.sync_notion_to_vector_store(full=True)
+    before = indexed_chunks()
+
+    # Subkategori (tanpa isi teks, hanya halaman anak) berubah lalu gagal -> anak-anaknya tetap ditelusuri
+    workspace.revisions["sub-1-1"] = 1
+    workspace.failing.add("sub-1-1")
+    result = notion_sync.sync_notion_to_vector_store()
+
+    assert result["status"] == "success"
+    assert indexed_chunks() == before
+    pages = manifest_pages()
+    assert all(page_id in pages for page_id in ("page-1-1-0", "page-1-1-1"))
+
+    # Setelah pulih, perubahan di bawah subkategori itu kembali terambil
+    workspace.failing.clear()
+    workspace.revisions["page-1-1-0"] = 1
+    notion_sync.sync_notion_to_vector_store()
+    assert chunks_of(indexed_chunks(), "page-1-1-0") != chunks_of(before, "page-1-1-0")
+
+
+def test_embedding_cache_keeps_only_current_chunks(notion):
+    import sqlite3
+    from app.services import embedding_pipeline
+
+    workspace, _ = notion
+    notion_sync.sync_notion_to_vector_store(full=True)
+    workspace.revisions["page-0-0-1"] = workspace.revisions.get("page-0-0-1", 0) + 1
+    notion_sync.sync_notion_to_vector_store()
+
+    with sqlite3.connect(embedding_pipeline.EMBED_CACHE_PATH) as conn:
+        cached = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+    assert cached == len(set(indexed_chunks().values()))
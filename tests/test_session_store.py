@@ -0,0 +1,47 @@
+# File: tests/test_session_store.py
+# Deskripsi: Session store: backend memori dan SQLite sama-sama bekerja dengan salinan session, jadi
+#            history yang dibaca di thread lain tidak ikut berubah saat request lain menambah pesan.
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.session_store import InMemorySessionStore, SQLiteSessionStore, add_message, new_session
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore(ttl_seconds=60)
+    return SQLiteSessionStore(ttl_seconds=60, path=str(tmp_path / "sessions.sqlite"))
+
+
+def test_get_returns_a_copy(store):
+    session = new_session()
+    add_message(session, HumanMessage(content="cara login"))
+    store.save("s1", session)
+
+    add_message(session, AIMessage(content="setelah save"))  # pemanggil masih memegang dict-nya
+    loaded = store.get("s1")
+    add_message(loaded, AIMessage(content="belum disimpan"))
+
+    assert [m.content for m in store.get("s1")["messages"]] == ["cara login"]
+    store.save("s1", loaded)
+    assert [m.content for m in store.get("s1")["messages"]] == ["cara login", "belum disimpan"]
+
+
+def test_history_iteration_survives_concurrent_request(store):
+    session = new_session()
+    for i in range(3):
+        add_message(session, HumanMessage(content=f"pesan {i}"))
+    store.save("s1", session)
+
+    # Request A sedang membaca history (mis. _session_history di thread pool) ...
+    history = iter(store.get("s1")["messages"])
+    next(history)
+    # ... saat request B pada session yang sama menambah pesan
+    other = store.get("s1")
+    add_message(other, AIMessage(content="jawaban B"))
+    store.save("s1", other)
+
+    assert [m.content for m in history] == ["pesan 1", "pesan 2"]
+    assert len(store.get("s1")["messages"]) == 4
@@ -0,0 +1,149 @@
+# File: tests/test_singleflight.py
+# Deskripsi: Single-flight: request identik berbagi satu eksekusi pipeline, pelanggan yang pergi
+#            tidak membatalkan jawaban untuk pelanggan lain, dan eksekusi baru dibatalkan hanya
+#            jika semua pelanggan sudah pergi.
+
+import asyncio
+
+import pytest
+
+from conftest import run
+from app.services.singleflight import SingleFlight, flight_key, normalize_question
+
+
+class Producer:
+    """Producer palsu: menghasilkan token satu per satu dengan jeda, mencatat berapa kali dijalankan."""
+
+    def __init__(self, tokens=("a ", "b ", "c "), delay=0.01, fail=False):
+        self.tokens = tokens
+        self.delay = delay
+        self.fail = fail
+        self.runs = 0
+        self.cancelled = 0
+
+    async def __call__(self, result):
+        self.runs += 1
+        try:
+            for token in self.tokens:
+                await asyncio.sleep(self.delay)
+                yield token
+            if self.fail:
+                raise RuntimeError("pipeline gagal")
+            result["answer"] = "".join(self.tokens)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+async def collect(flight, limit=None):
+    """Ambil token dari flight; dengan limit, berhenti lebih awal dan tutup langganan (klien memutus koneksi)."""
+    tokens = []
+    subscription = flight.subscribe()
+    try:
+        async for token in subscription:
+            tokens.append(token)
+            if limit is not None and len(tokens) >= limit:
+                break
+    finally:
+        await subscription.aclose()
+    return tokens
+
+
+def test_key_normalization():
+    assert normalize_question("  Cara LOGIN?? ") == normalize_question("cara login")
+    assert flight_key("cara login", ["x"]) == flight_key("Cara login?", ["x"])
+    assert flight_key("cara login", ["x"]) != flight_key("cara login", ["y"])
+
+
+def test_identical_requests_share_one_run():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer()
+        leader, is_leader = flights.join("k", producer)
+        follower, is_follower_leader = flights.join("k", producer)
+        results = await asyncio.gather(collect(leader), collect(follower))
+        return producer, is_leader, is_follower_leader, results, leader, flights
+
+    producer, is_leader, is_follower_leader, results, flight, flights = run(scenario())
+    assert (is_leader, is_follower_leader) == (True, False)
+    assert producer.runs == 1
+    assert results == [["a ", "b ", "c "]] * 2
+    assert flight.result["answer"] == "a b c "
+    assert flights.inflight() == 0
+
+
+def test_late_follower_gets_replay():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer()
+        flight, _ = flights.join("k", producer)
+        first = asyncio.ensure_future(collect(flight))
+        await asyncio.sleep(0.025)  # dua token sudah diproduksi
+        late, leader = flights.join("k", producer)
+        return leader, await collect(late), await first, producer
+
+    leader, late_tokens, first_tokens, producer = run(scenario())
+    assert not leader
+    assert late_tokens == first_tokens == ["a ", "b ", "c "]
+    assert producer.runs == 1
+
+
+def test_leader_disconnect_does_not_cancel_for_follower():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer()
+        flight, _ = flights.join("k", producer)
+        follower_tokens = asyncio.ensure_future(collect(flight))
+        leader_tokens = await collect(flight, limit=1)  # pemanggil pertama memutus koneksi
+        return leader_tokens, await follower_tokens, producer, flight
+
+    leader_tokens, follower_tokens, producer, flight = run(scenario())
+    assert leader_tokens == ["a "]
+    assert follower_tokens == ["a ", "b ", "c "]
+    assert producer.cancelled == 0
+    assert not flight.abandoned
+
+
+def test_last_subscriber_leaving_cancels_and_next_join_starts_fresh():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer()
+        flight, _ = flights.join("k", producer)
+        await collect(flight, limit=1)
+        await asyncio.sleep(0)  # beri kesempatan task menerima pembatalan
+        abandoned = flight.abandoned
+        with pytest.raises(asyncio.CancelledError):
+            await flight.task
+        fresh, leader = flights.join("k", producer)
+        tokens = await collect(fresh)
+        return abandoned, producer, leader, tokens, fresh is flight
+
+    abandoned, producer, leader, tokens, same = run(scenario())
+    assert abandoned
+    assert producer.cancelled == 1
+    assert leader and not same
+    assert producer.runs == 2
+    assert tokens == ["a ", "b ", "c "]
+
+
+def test_error_reaches_every_subscriber():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer(fail=True)
+        flight, _ = flights.join("k", producer)
+        return await asyncio.gather(collect(flight), collect(flight), return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_request_task_leaves_flight_running_for_others():
+    async def scenario():
+        flights, producer = SingleFlight(), Producer()
+        flight, _ = flights.join("k", producer)
+        leader_task = asyncio.ensure_future(collect(flight))
+        follower_task = asyncio.ensure_future(collect(flight))
+        await asyncio.sleep(0.015)
+        leader_task.cancel()  # seperti Starlette membatalkan task respons saat klien pergi
+        await asyncio.gather(leader_task, return_exceptions=True)
+        return await follower_task, producer, flight.subscribers
+
+    follower_tokens, producer, subscribers = run(scenario())
+    assert follower_tokens == ["a ", "b ", "c "]
+    assert producer.runs == 1 and producer.cancelled == 0
+    assert subscribers == 0
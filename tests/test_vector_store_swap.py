@@ -0,0 +1,88 @@
+# File: tests/test_vector_store_swap.py
+# Deskripsi: Pemuatan vector store saat proses lain sedang menukar direktori (save_vector_store):
+#            di antara current -> previous dan staging -> current, pemuatan pertama memakai previous
+#            (bukan mengaktifkan store kosong), lalu pindah ke current setelah penukaran selesai;
+#            direktori yang ditukar di tengah pemuatan membuat pemuatan diulang.
+
+import os
+import shutil
+
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.fakes import FakeEmbeddings
+from app.services import embedding
+
+
+def make_store(texts):
+    metadatas = [{"source": f"Panduan > Bagian {i}", "category": "Kasir"} for i in range(len(texts))]
+    return FAISS.from_texts(texts, FakeEmbeddings(), metadatas=metadatas, ids=[f"p{i}:b{i}" for i in range(len(texts))])
+
+
+def texts_of(store):
+    return sorted(store.docstore.search(doc_id).page_content for doc_id in store.index_to_docstore_id.values())
+
+
+@pytest.fixture
+def saved_stores():
+    """Dua versi store di disk: OLD di PREVIOUS_PATH, NEW di VECTOR_STORE_PATH."""
+    old, new = ["cara login akun kasir", "retur barang"], ["laporan penjualan harian", "cetak struk"]
+    embedding.save_vector_store(make_store(old))
+    embedding.save_vector_store(make_store(new))
+    yield old, new
+    shutil.rmtree(embedding.STAGING_PATH, ignore_errors=True)
+
+
+def test_first_load_during_swap_uses_previous(saved_stores):
+    old, new = saved_stores
+    # Proses lain berhenti di antara dua os.replace: current sudah jadi previous, staging belum dipasang
+    shutil.rmtree(embedding.PREVIOUS_PATH)
+    os.replace(embedding.VECTOR_STORE_PATH, embedding.PREVIOUS_PATH)
+
+    embedding.reload_vector_store()
+
+    snapshot = embedding.get_store_snapshot()
+    assert snapshot.store is not None
+    assert texts_of(snapshot.store) == sorted(new)
+    assert snapshot.bm25_index is not None
+    assert embedding.load_vector_store() is not None
+
+    # Penukaran selesai -> penanda current berbeda dari store aktif, pengecekan berikutnya memuat ulang
+    shutil.copytree(embedding.PREVIOUS_PATH, embedding.STAGING_PATH)
+    os.replace(embedding.STAGING_PATH, embedding.VECTOR_STORE_PATH)
+    assert embedding._store_marker() != embedding._active_marker
+    embedding.reload_vector_store()
+    assert embedding._store_marker() == embedding._active_marker
+
+
+def test_no_store_on_disk(saved_stores, monkeypatch):
+    monkeypatch.setattr(embedding, "VECTOR_STORE_PATH", embedding.VECTOR_STORE_PATH + ".missing")
+    monkeypatch.setattr(embedding, "PREVIOUS_PATH", embedding.PREVIOUS_PATH + ".missing")
+
+    assert embedding.load_vector_store() is None
+    embedding.reload_vector_store()
+    assert embedding.get_store_snapshot().store is None
+
+
+def test_swap_during_load_is_retried(saved_stores, monkeypatch):
+    old, new = saved_stores
+    read_store = embedding._read_store
+    calls = []
+
+    def swapping_read(path):
+        calls.append(path)
+        store = read_store(path)
+        if len(calls) == 1:
+            # Sync lain menukar direktori setelah index dibaca: current diganti versi lain
+            shutil.copytree(embedding.PREVIOUS_PATH, embedding.STAGING_PATH)
+            shutil.rmtree(embedding.PREVIOUS_PATH)
+            os.replace(embedding.VECTOR_STORE_PATH, embedding.PREVIOUS_PATH)
+            os.replace(embedding.STAGING_PATH, embedding.VECTOR_STORE_PATH)
+        return store
+
+    monkeypatch.setattr(embedding, "_read_store", swapping_read)
+
+    store = embedding.load_vector_store()
+
+    assert len(calls) == 2
+    assert texts_of(store) == sorted(old)